@@ -0,0 +1,140 @@
+from forecast import LINEAR, forecast_income
+
+
+# Горизонт (в месяцах) и режим прогноза дохода
+FORECAST_HORIZON = 3
+FORECAST_MODE = LINEAR
+
+# Распределение запасов: количество крупнейших позиций на графике,
+# остальные объединяются в одну позицию "Прочее"
+STOCK_TOP_N = 10
+STOCK_OTHER_LABEL = "Прочее"
+NO_PACKAGE_LABEL = "Без упаковки"
+
+# Группировка запасов: по продуктам или по виду упаковки
+STOCK_BY_PRODUCT = 'product'
+STOCK_BY_PACKAGE = 'package'
+
+
+def calculate_income_trend(cursor):
+    """Доход по месяцам из итогов журнала движения товаров"""
+    cursor.execute('''
+        SELECT month, income
+        FROM monthly_income
+        ORDER BY month
+    ''')
+    return cursor.fetchall()
+
+
+def predict_future_income(data, months=FORECAST_HORIZON, mode=FORECAST_MODE):
+    """Прогнозирование дохода на следующие месяцы по тренду дохода"""
+    return forecast_income(data, horizon=months, mode=mode)
+
+
+def top_products(cursor, limit=5):
+    """Самые продаваемые продукты"""
+    cursor.execute('''
+        SELECT name, sales_volume
+        FROM products
+        ORDER BY sales_volume DESC
+        LIMIT ?
+    ''', (limit,))
+    return cursor.fetchall()
+
+
+def _stock_items(group_by):
+    # Позиции распределения запасов: key - уникальный ключ, label - подпись
+    if group_by == STOCK_BY_PACKAGE:
+        # Внутренняя группировка читает только индекс (package, stock);
+        # затем пустая упаковка и NULL объединяются в одну позицию
+        return f'''
+            SELECT COALESCE(NULLIF(package, ''), '{NO_PACKAGE_LABEL}') AS key,
+                   COALESCE(NULLIF(package, ''), '{NO_PACKAGE_LABEL}') AS label,
+                   SUM(stock) AS stock
+            FROM (
+                SELECT package, SUM(stock) AS stock
+                FROM products
+                WHERE stock > 0
+                GROUP BY package
+            )
+            GROUP BY key
+        '''
+    return "SELECT id AS key, name AS label, stock FROM products WHERE stock > 0"
+
+
+def stock_page(cursor, after=None, limit=100, group_by=STOCK_BY_PRODUCT):
+    """Позиции распределения запасов по убыванию остатка: (key, label, stock)
+
+    after - (stock, key) последней позиции предыдущей страницы; страница
+    начинается сразу после нее (по индексу, без пропуска строк через OFFSET).
+    """
+    condition, params = "1", ()
+    if after is not None:
+        condition, params = "(stock, key) < (?, ?)", tuple(after)
+    cursor.execute(f'''
+        SELECT key, label, stock FROM ({_stock_items(group_by)})
+        WHERE {condition}
+        ORDER BY stock DESC, key DESC
+        LIMIT ?
+    ''', params + (limit,))
+    return cursor.fetchall()
+
+
+def stock_distribution(cursor, limit=STOCK_TOP_N, group_by=STOCK_BY_PRODUCT):
+    """Остатки на складе: limit крупнейших позиций и сумма остальных
+
+    Остальные позиции возвращаются одной строкой "Прочее (количество)", поэтому
+    размер результата не зависит от количества продуктов.
+    """
+    top = [(label, stock) for _, label, stock in stock_page(cursor, limit=limit, group_by=group_by)]
+    return with_other(top, *stock_totals(cursor, group_by))
+
+
+def stock_totals(cursor, group_by=STOCK_BY_PRODUCT):
+    """Количество позиций распределения запасов и сумма их остатков"""
+    cursor.execute(f"SELECT COUNT(*), SUM(stock) FROM ({_stock_items(group_by)})")
+    return cursor.fetchone()
+
+
+def with_other(top, count, total):
+    """Крупнейшие позиции top и позиция "Прочее" с остальными из count (сумма total)"""
+    if count > len(top):
+        other = total - sum(stock for _, stock in top)
+        top = top + [(f"{STOCK_OTHER_LABEL} ({count - len(top)})", other)]
+    return top
+
+
+def stock_item_count(cursor, group_by=STOCK_BY_PRODUCT):
+    """Количество позиций распределения запасов"""
+    cursor.execute(f"SELECT COUNT(*) FROM ({_stock_items(group_by)})")
+    return cursor.fetchone()[0]
+
+
+class Cancelled(Exception):
+    """Расчет отменен, так как запущен более новый"""
+
+
+def collect_series(conn, is_cancelled=lambda: False, stock_group=STOCK_BY_PRODUCT,
+                   snapshot=None):
+    """Расчет всех рядов данных для вкладки "Аналитика"
+
+    Между шагами проверяется is_cancelled(); при отмене выбрасывается Cancelled.
+    Если задан снимок каталога (catalog_snapshot.CatalogSnapshot), самые
+    продаваемые продукты и остатки считаются по нему, а не запросами.
+    """
+    cursor = conn.cursor()
+    series = {}
+
+    source = snapshot.top_products if snapshot is not None else top_products
+    distribution = snapshot.stock_distribution if snapshot is not None else stock_distribution
+    steps = [
+        ('income', lambda: calculate_income_trend(cursor)),
+        ('forecast', lambda: predict_future_income(series['income'])),
+        ('top', lambda: source(cursor)),
+        ('stock', lambda: distribution(cursor, group_by=stock_group)),
+    ]
+    for name, step in steps:
+        if is_cancelled():
+            raise Cancelled()
+        series[name] = step()
+    return series
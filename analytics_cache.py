@@ -0,0 +1,59 @@
+"""Кэш данных графиков вкладки "Аналитика" на диске
+
+Рассчитанные ряды (доход, прогноз, самые продаваемые продукты и запасы)
+сохраняются в файл рядом с базой данных вместе с номером последнего
+изменения продуктов (sync.current_seq) на момент расчета. При первом
+открытии вкладки графики строятся из кэша сразу; если номер изменения с тех
+пор не изменился, пересчет не нужен, иначе данные пересчитываются в фоне и
+графики обновляются, только если данные действительно изменились.
+"""
+import json
+import os
+
+
+# Версия формата файла: кэш другой версии не используется
+CACHE_VERSION = 1
+
+# Ряды данных графиков (как в analytics.collect_series)
+SERIES = ('income', 'forecast', 'top', 'stock')
+
+
+def cache_path(db_path):
+    """Файл кэша для базы данных db_path"""
+    return db_path + '.analytics.json'
+
+
+def load_series(path, stock_group):
+    """Ряды из кэша для группировки запасов stock_group
+
+    Возвращает (номер изменения, ряды) или None, если кэша нет, он
+    поврежден или рассчитан для другой группировки.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data['version'] != CACHE_VERSION or data['stock_group'] != stock_group:
+            return None
+        series = {name: [tuple(row) for row in data['series'][name]] for name in SERIES}
+        return data['seq'], series
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_series(path, seq, stock_group, series):
+    """Сохранение рядов; файл заменяется целиком, поэтому не бывает записан частично"""
+    data = {
+        'version': CACHE_VERSION,
+        'seq': seq,
+        'stock_group': stock_group,
+        'series': {name: series[name] for name in SERIES},
+    }
+    part_path = path + '.part'
+    try:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(part_path, path)
+    except OSError:
+        # Без кэша графики просто пересчитываются при следующем запуске
+        return False
+    return True
@@ -0,0 +1,328 @@
+"""HTTP API магазина (JSON) без графического интерфейса
+
+    python api_server.py [--db store.db] [--host 127.0.0.1] [--port 8080]
+
+GET    /api/products?page=0&page_size=100&sort=id&order=asc&q=текст
+GET    /api/products/{id}
+POST   /api/products            (объект с полями продукта)
+PUT    /api/products/{id}       (с row_version из ответа GET - 409, если продукт
+                                 с тех пор изменили)
+DELETE /api/products/{id}
+GET    /api/discounts?page=0&page_size=100
+GET    /api/income?months=3
+GET    /api/analytics?stock_group=product|package
+
+Сводные данные нескольких магазинов (federation.py, только чтение):
+
+    python api_server.py --store магазин1=путь/store.db --store путь2/store.db ...
+
+GET    /api/stores
+GET    /api/products, /api/discounts, /api/income, /api/analytics
+       (те же параметры и stores=имя1,имя2 - фильтр магазинов; строки
+        содержат поле store)
+
+Ответы GET содержат ETag; при совпадении с If-None-Match возвращается 304
+без тела. Запросы к базе данных выполняются в пуле потоков размером с пул
+соединений чтения, запись - в одном отдельном потоке.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+try:
+    from aiohttp import web
+except ImportError:
+    raise ImportError("Для HTTP API установите пакет aiohttp")
+
+from analytics import FORECAST_HORIZON, STOCK_BY_PRODUCT
+from database import Database
+from federation import FederatedService, parse_stores
+from service import PAGE_SIZE, ConflictError, NotFoundError, StoreService, ValidationError
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8080
+
+# Наибольший горизонт прогноза, месяцев
+MAX_FORECAST_MONTHS = 24
+
+SERVICE = web.AppKey('service', StoreService)
+FEDERATION = web.AppKey('federation', FederatedService)
+READERS = web.AppKey('readers', ThreadPoolExecutor)
+WRITER = web.AppKey('writer', ThreadPoolExecutor)
+
+
+async def run_read(request, func, *args, **kwargs):
+    """Выполнение чтения в пуле потоков чтения"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app[READERS], partial(func, *args, **kwargs))
+
+
+async def run_write(request, func, *args):
+    """Выполнение записи в потоке записи"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app[WRITER], partial(func, *args))
+
+
+def json_body(data):
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def cached_response(request, data):
+    """Ответ JSON с ETag по содержимому; 304, если у клиента та же версия"""
+    body = json_body(data)
+    etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+    headers = {'Cache-Control': 'no-cache'}
+    if any(tag.value in (etag, '*') for tag in request.if_none_match or ()):
+        response = web.Response(status=304, headers=headers)
+    else:
+        response = web.Response(body=body, content_type='application/json',
+                                charset='utf-8', headers=headers)
+    response.etag = etag
+    return response
+
+
+def json_response(data, status=200):
+    return web.Response(body=json_body(data), status=status,
+                        content_type='application/json', charset='utf-8')
+
+
+def int_param(request, name, default, low=0, high=None):
+    value = request.query.get(name)
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValidationError(f"Параметр {name}: ожидалось целое число")
+    if number < low or (high is not None and number > high):
+        raise ValidationError(f"Параметр {name} вне допустимого диапазона")
+    return number
+
+
+def product_id(request):
+    try:
+        return int(request.match_info['product_id'])
+    except ValueError:
+        raise NotFoundError(f"Продукт {request.match_info['product_id']} не найден")
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise ValidationError("Тело запроса должно быть JSON")
+
+
+@web.middleware
+async def errors(request, handler):
+    """Ошибки в виде {"error": текст} с кодом HTTP"""
+    try:
+        return await handler(request)
+    except NotFoundError as e:
+        return json_response({'error': str(e)}, 404)
+    except ValidationError as e:
+        return json_response({'error': str(e)}, 400)
+    except ConflictError as e:
+        return json_response({'error': str(e)}, 409)
+    except sqlite3.Error as e:
+        return json_response({'error': f"Ошибка базы данных: {e}"}, 503)
+
+
+async def list_products(request):
+    order = request.query.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValidationError("Параметр order: asc или desc")
+    data = await run_read(
+        request, request.app[SERVICE].list_products,
+        page=int_param(request, 'page', 0),
+        page_size=int_param(request, 'page_size', PAGE_SIZE, low=1),
+        sort=request.query.get('sort', 'id'),
+        descending=order == 'desc',
+        query=request.query.get('q'),
+    )
+    return cached_response(request, data)
+
+
+async def get_product(request):
+    data = await run_read(request, request.app[SERVICE].get_product, product_id(request))
+    return cached_response(request, data)
+
+
+async def add_product(request):
+    values = await read_json(request)
+    service = request.app[SERVICE]
+    new_id = await run_write(request, service.add_product, values)
+    data = await run_read(request, service.get_product, new_id)
+    return json_response(data, 201)
+
+
+async def update_product(request):
+    values = await read_json(request)
+    service = request.app[SERVICE]
+    row_version = values.get('row_version') if isinstance(values, dict) else None
+    updated_id = await run_write(request, service.update_product, product_id(request),
+                                 values, row_version)
+    return json_response(await run_read(request, service.get_product, updated_id))
+
+
+async def delete_product(request):
+    await run_write(request, request.app[SERVICE].delete_product, product_id(request))
+    return web.Response(status=204)
+
+
+async def discounts(request):
+    data = await run_read(
+        request, request.app[SERVICE].discounts,
+        page=int_param(request, 'page', 0),
+        page_size=int_param(request, 'page_size', PAGE_SIZE, low=1),
+    )
+    return cached_response(request, data)
+
+
+async def income(request):
+    months = int_param(request, 'months', FORECAST_HORIZON, low=1, high=MAX_FORECAST_MONTHS)
+    data = await run_read(request, request.app[SERVICE].forecast, months)
+    return cached_response(request, data)
+
+
+async def analytics(request):
+    stock_group = request.query.get('stock_group', STOCK_BY_PRODUCT)
+    data = await run_read(request, request.app[SERVICE].analytics, stock_group)
+    return cached_response(request, data)
+
+
+def stores_param(request):
+    """Фильтр магазинов stores=имя1,имя2 (None - все магазины)"""
+    value = request.query.get('stores')
+    if value is None or value == '':
+        return None
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+async def federated_stores(request):
+    return cached_response(request, {'stores': request.app[FEDERATION].names})
+
+
+async def federated_products(request):
+    order = request.query.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValidationError("Параметр order: asc или desc")
+    data = await run_read(
+        request, request.app[FEDERATION].list_products,
+        page=int_param(request, 'page', 0),
+        page_size=int_param(request, 'page_size', PAGE_SIZE, low=1),
+        sort=request.query.get('sort', 'id'),
+        descending=order == 'desc',
+        query=request.query.get('q'),
+        stores=stores_param(request),
+    )
+    return cached_response(request, data)
+
+
+async def federated_discounts(request):
+    data = await run_read(
+        request, request.app[FEDERATION].discounts,
+        page=int_param(request, 'page', 0),
+        page_size=int_param(request, 'page_size', PAGE_SIZE, low=1),
+        stores=stores_param(request),
+    )
+    return cached_response(request, data)
+
+
+async def federated_income(request):
+    months = int_param(request, 'months', FORECAST_HORIZON, low=1, high=MAX_FORECAST_MONTHS)
+    data = await run_read(request, request.app[FEDERATION].forecast, months,
+                          stores=stores_param(request))
+    return cached_response(request, data)
+
+
+async def federated_analytics(request):
+    stock_group = request.query.get('stock_group', STOCK_BY_PRODUCT)
+    data = await run_read(request, request.app[FEDERATION].analytics, stock_group,
+                          stores=stores_param(request))
+    return cached_response(request, data)
+
+
+def create_app(database):
+    """Приложение aiohttp для базы данных database"""
+    app = web.Application(middlewares=[errors])
+    app[SERVICE] = StoreService(database)
+    # Потоков чтения не больше, чем соединений в пуле: лишние ждали бы соединения
+    app[READERS] = ThreadPoolExecutor(database.pool_size, thread_name_prefix='api-read')
+    app[WRITER] = ThreadPoolExecutor(1, thread_name_prefix='api-write')
+
+    app.router.add_get('/api/products', list_products)
+    app.router.add_post('/api/products', add_product)
+    app.router.add_get('/api/products/{product_id}', get_product)
+    app.router.add_put('/api/products/{product_id}', update_product)
+    app.router.add_delete('/api/products/{product_id}', delete_product)
+    app.router.add_get('/api/discounts', discounts)
+    app.router.add_get('/api/income', income)
+    app.router.add_get('/api/analytics', analytics)
+
+    async def close(app):
+        app[READERS].shutdown()
+        app[WRITER].shutdown()
+        app[SERVICE].close()
+
+    app.on_cleanup.append(close)
+    return app
+
+
+def create_federation_app(federation):
+    """Приложение aiohttp со сводными данными магазинов federation (только чтение)"""
+    app = web.Application(middlewares=[errors])
+    app[FEDERATION] = federation
+    # Каждый запрос сам читает магазины параллельно (пул federation.py)
+    app[READERS] = ThreadPoolExecutor(len(federation.names) + 1, thread_name_prefix='api-read')
+
+    app.router.add_get('/api/stores', federated_stores)
+    app.router.add_get('/api/products', federated_products)
+    app.router.add_get('/api/discounts', federated_discounts)
+    app.router.add_get('/api/income', federated_income)
+    app.router.add_get('/api/analytics', federated_analytics)
+
+    async def close(app):
+        app[READERS].shutdown()
+        app[FEDERATION].close()
+
+    app.on_cleanup.append(close)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP API магазина (JSON)")
+    parser.add_argument('--db', help="файл базы данных (по умолчанию store.db в директории приложения)")
+    parser.add_argument('--store', action='append', metavar='[ИМЯ=]ПУТЬ',
+                        help="база данных магазина для сводных данных (можно указать несколько "
+                             "раз); имя по умолчанию - директория файла store.db")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"адрес (по умолчанию {DEFAULT_HOST})")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f"порт (по умолчанию {DEFAULT_PORT})")
+    args = parser.parse_args()
+
+    if args.store:
+        try:
+            federation = FederatedService(parse_stores(args.store))
+        except (OSError, ValidationError, sqlite3.Error) as e:
+            print(f"Ошибка открытия магазинов: {e}", file=sys.stderr)
+            return 1
+        web.run_app(create_federation_app(federation), host=args.host, port=args.port)
+        return 0
+
+    database = Database(args.db)
+    try:
+        web.run_app(create_app(database), host=args.host, port=args.port)
+    finally:
+        database.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
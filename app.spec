@@ -9,12 +9,12 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('venv/lib/site-packages/PySide6', 'PySide6')],
-    hiddenimports=['PySide6.QtSql', 'scipy._lib.array_api_compat.numpy.fft', 'numpy'],
+    hiddenimports=['numpy'],
+    excludes=['sklearn', 'scipy'],
     noarchive=True,
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
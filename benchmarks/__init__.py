@@ -0,0 +1 @@
+"""Бенчмарки и синтетические данные для нагрузки магазина"""
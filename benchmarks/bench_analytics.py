@@ -0,0 +1,133 @@
+"""Расчеты без интерфейса: скидки, доход, прогноз, поиск, распределение запасов"""
+from datetime import date
+
+import pytest
+
+import forecast
+from analytics import (
+    calculate_income_trend, predict_future_income, stock_distribution,
+    collect_series, STOCK_BY_PACKAGE
+)
+from catalog_snapshot import CatalogSnapshot
+from demand import CHUNK_SIZE, forecast_range, group_rates, id_ranges
+from discounts import calculate_discounts
+from discount_schedule import DiscountSchedule
+from federation import FederatedService
+from search import search_ids
+
+
+# Количество магазинов в бенчмарках сводных данных (один файл под разными именами)
+FEDERATION_STORES = 3
+
+# Запросы поиска: префикс, два слова, "ё" в названии производителя
+SEARCH_QUERIES = ['мол', 'сыр луговое', 'березка', 'кофе 250']
+
+
+@pytest.fixture(scope='module')
+def snapshot(database):
+    """Снимок каталога, загруженный один раз для бенчмарков расчетов по нему"""
+    snapshot = CatalogSnapshot()
+    with database.reader() as conn:
+        snapshot.load(conn.cursor())
+    return snapshot
+
+
+@pytest.fixture(scope='module')
+def federation(database):
+    """Сводные данные FEDERATION_STORES магазинов с каталогом database"""
+    federation = FederatedService({
+        f'store{number}': database.path for number in range(1, FEDERATION_STORES + 1)
+    })
+    yield federation
+    federation.close()
+
+
+def bench_calculate_discounts(benchmark, database):
+    with database.reader() as conn:
+        benchmark(calculate_discounts, conn.cursor())
+
+
+def bench_snapshot_discounts(benchmark, snapshot):
+    benchmark(snapshot.discounts)
+
+
+def bench_discount_schedule_build(benchmark, database):
+    with database.reader() as conn:
+        benchmark(DiscountSchedule().build, conn.cursor())
+
+
+def bench_calculate_income_trend(benchmark, database):
+    with database.reader() as conn:
+        benchmark(calculate_income_trend, conn.cursor())
+
+
+def bench_predict_future_income(benchmark, database):
+    with database.reader() as conn:
+        income = calculate_income_trend(conn.cursor())
+    # Каждый замер обучает модель заново (без кэша обученных моделей)
+    benchmark.pedantic(predict_future_income, (income,), setup=forecast.clear_cache,
+                       rounds=50, iterations=1)
+
+
+def bench_predict_future_income_cached(benchmark, database):
+    with database.reader() as conn:
+        income = calculate_income_trend(conn.cursor())
+    benchmark(predict_future_income, income)
+
+
+@pytest.mark.parametrize('text', SEARCH_QUERIES)
+def bench_search(benchmark, database, text):
+    with database.reader() as conn:
+        benchmark(search_ids, conn.cursor(), text)
+
+
+def bench_stock_distribution(benchmark, database):
+    with database.reader() as conn:
+        benchmark(stock_distribution, conn.cursor())
+
+
+def bench_stock_distribution_by_package(benchmark, database):
+    with database.reader() as conn:
+        benchmark(stock_distribution, conn.cursor(), group_by=STOCK_BY_PACKAGE)
+
+
+def bench_collect_series(benchmark, database):
+    with database.reader() as conn:
+        benchmark(collect_series, conn)
+
+
+def bench_snapshot_load(benchmark, database):
+    with database.reader() as conn:
+        benchmark(CatalogSnapshot().load, conn.cursor())
+
+
+def bench_snapshot_stock_distribution(benchmark, database, snapshot):
+    with database.reader() as conn:
+        benchmark(snapshot.stock_distribution, conn.cursor())
+
+
+def bench_snapshot_stock_distribution_by_package(benchmark, database, snapshot):
+    with database.reader() as conn:
+        benchmark(snapshot.stock_distribution, conn.cursor(), group_by=STOCK_BY_PACKAGE)
+
+
+def bench_collect_series_snapshot(benchmark, database, snapshot):
+    with database.reader() as conn:
+        benchmark(collect_series, conn, snapshot=snapshot)
+
+
+def bench_forecast_chunk(benchmark, database):
+    """Одно задание пула прогноза спроса (CHUNK_SIZE продуктов) в текущем процессе"""
+    today = date.today()
+    with database.reader() as conn:
+        rates = group_rates(conn.cursor(), today)
+        first, last = id_ranges(conn.cursor(), CHUNK_SIZE)[0]
+    benchmark(forecast_range, database.path, first, last, rates, today.isoformat())
+
+
+def bench_federation_analytics(benchmark, federation):
+    benchmark(federation.analytics)
+
+
+def bench_federation_products_page(benchmark, federation):
+    benchmark(federation.list_products, page=5, sort='price', descending=True)
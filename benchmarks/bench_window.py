@@ -0,0 +1,91 @@
+"""Операции главного окна без дисплея (QT_QPA_PLATFORM=offscreen)"""
+import pytest
+
+from analytics import collect_series
+from search import search_ids
+
+
+SEARCH_QUERIES = ['мол', 'сыр луговое']
+
+# Количество строк в групповой операции
+BULK_ROWS = 200
+
+
+def bench_update_table(benchmark, window):
+    def update_table():
+        window.update_table()
+        # Первая страница, которую таблица показывает после обновления
+        window.model.index(0, 1).data()
+
+    benchmark(update_table)
+
+
+@pytest.mark.parametrize('text', SEARCH_QUERIES)
+def bench_search_product(benchmark, window, text):
+    # Поиск в фоновом потоке и применение результата в таблице, без задержки ввода
+    def search_product():
+        with window.database.reader() as conn:
+            ids = search_ids(conn.cursor(), text)
+        window.on_search_ready(window.search_job_id, ids)
+        window.model.index(0, 1).data()
+
+    benchmark(search_product)
+    window.show_all_products()
+
+
+def charts(window):
+    if not window.charts_ready:
+        window.init_analytics_ui()
+    return [
+        (window.income_chart, window.canvas1),
+        (window.top_chart, window.canvas2),
+        (window.stock_chart, window.canvas3),
+    ]
+
+
+def bench_update_charts(benchmark, window):
+    # Расчет данных (в программе - в фоновом потоке) и полная отрисовка всех графиков
+    chart_list = charts(window)
+
+    def invalidate():
+        for chart, _ in chart_list:
+            chart.invalidate()
+
+    def update_charts():
+        with window.database.reader() as conn:
+            series = collect_series(conn, stock_group=window.stock_group)
+        window.draw_charts(series)
+        for _, canvas in chart_list:
+            canvas.draw()
+
+    benchmark.pedantic(update_charts, setup=invalidate, rounds=10, iterations=1)
+
+
+def bench_redraw_unchanged_charts(benchmark, window):
+    # Повторное открытие вкладки "Аналитика" с теми же данными
+    chart_list = charts(window)
+    with window.database.reader() as conn:
+        series = collect_series(conn, stock_group=window.stock_group)
+    window.draw_charts(series)
+    for _, canvas in chart_list:
+        canvas.draw()
+
+    benchmark(window.draw_charts, series)
+
+
+def bench_bulk_price_change(benchmark, window):
+    # Групповое изменение цены выбранных строк и его отмена (данные не меняются)
+    from bulk_edit import UpdateProductsCommand
+
+    window.update_table()
+    ids = [window.model.product_id(row) for row in range(min(BULK_ROWS, window.model.rowCount()))]
+
+    def change_and_undo():
+        values, versions = window.service.new_prices(ids, percent=-10)
+        window.undo_stack.push(UpdateProductsCommand(
+            window.service, 'price', values, versions, "Изменение цены", lambda *args: None
+        ))
+        window.undo_stack.undo()
+
+    benchmark(change_and_undo)
+    window.undo_stack.clear()
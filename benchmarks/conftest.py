@@ -0,0 +1,71 @@
+"""Общие фикстуры бенчмарков
+
+Базы данных создаются один раз для каждого размера и сохраняются в
+benchmarks/.data, чтобы повторные запуски не тратили время на генерацию.
+"""
+import os
+
+# Окно программы создается без дисплея; до импорта PySide6
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import pytest
+
+from database import Database
+from migrations import LATEST_VERSION
+from benchmarks.synthetic import make_database
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '.data')
+DEFAULT_SIZES = '1000,100000'
+SEED = 0
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--sizes', default=os.environ.get('STORE_BENCH_SIZES', DEFAULT_SIZES),
+        help="размеры каталога через запятую (например 1000,100000,1000000)"
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if 'size' in metafunc.fixturenames:
+        sizes = [int(size) for size in metafunc.config.getoption('sizes').split(',')]
+        metafunc.parametrize('size', sizes, ids=[f'{size}' for size in sizes], scope='session')
+
+
+def database_path(size):
+    """Файл базы данных с size продуктами (создается при первом обращении)"""
+    path = os.path.join(DATA_DIR, f'store-{size}-seed{SEED}-v{LATEST_VERSION}.db')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        part_path = path + '.part'
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        conn = make_database(size, SEED, part_path)
+        conn.execute("ANALYZE")
+        conn.close()
+        os.replace(part_path, path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def database(size):
+    """Database с синтетическим каталогом из size продуктов"""
+    database = Database(database_path(size))
+    yield database
+    database.close()
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    from PySide6.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture(scope='session')
+def window(qapp, database):
+    """Главное окно программы, подключенное к синтетической базе данных"""
+    from main_window import MainWindow
+    window = MainWindow(database)
+    yield window
+    window.close()
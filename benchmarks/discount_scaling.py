@@ -0,0 +1,50 @@
+"""Регрессионный бенчмарк расчета скидок
+
+Проверяет, что время calculate_discounts растет линейно с числом продуктов.
+Запуск из корня проекта:
+
+    python -m benchmarks.discount_scaling
+"""
+import sys
+import time
+
+from discounts import calculate_discounts
+from benchmarks.synthetic import make_database
+
+
+SIZES = [1_000, 10_000, 100_000]
+# Допустимый рост времени на один продукт между наименьшим и наибольшим размером
+MAX_PER_ROW_GROWTH = 3.0
+
+
+def measure(conn, repeat=3):
+    """Лучшее время одного расчета скидок"""
+    cursor = conn.cursor()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calculate_discounts(cursor)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    per_row = []
+    print(f"{'продуктов':>10} {'время, мс':>10} {'мкс/продукт':>12}")
+    for size in SIZES:
+        conn = make_database(size)
+        elapsed = measure(conn)
+        conn.close()
+        per_row.append(elapsed / size)
+        print(f"{size:>10} {elapsed * 1000:>10.1f} {elapsed / size * 1e6:>12.2f}")
+
+    growth = per_row[-1] / per_row[0]
+    print(f"Рост времени на продукт: x{growth:.2f}")
+    if growth > MAX_PER_ROW_GROWTH:
+        print("Ошибка: расчет скидок масштабируется хуже линейного")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Планы и время горячих запросов до и после миграций схемы
+
+Создает синтетическую базу данных исходной схемы (версия 1), выполняет
+запросы, затем обновляет схему до последней версии и повторяет замеры.
+Запуск из корня проекта:
+
+    python -m benchmarks.index_plans [количество продуктов]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+from migrations import LATEST_VERSION, migrate
+from benchmarks.synthetic import make_database
+
+
+DEFAULT_SIZE = 1_000_000
+
+# Запросы до миграций (версия 1) и после (последняя версия)
+QUERIES = [
+    (
+        "Топ-5 продаж",
+        "SELECT name, sales_volume FROM products ORDER BY sales_volume DESC LIMIT 5",
+        "SELECT name, sales_volume FROM products ORDER BY sales_volume DESC LIMIT 5",
+    ),
+    (
+        "Крупнейшие остатки",
+        "SELECT name, purchase_volume - sales_volume AS s FROM products "
+        "WHERE purchase_volume - sales_volume > 0 ORDER BY s DESC LIMIT 10",
+        "SELECT name, stock FROM products WHERE stock > 0 ORDER BY stock DESC LIMIT 10",
+    ),
+    (
+        "Запасы по упаковке",
+        "SELECT package, SUM(purchase_volume - sales_volume) FROM products "
+        "WHERE purchase_volume - sales_volume > 0 GROUP BY package",
+        "SELECT package, SUM(stock) FROM products WHERE stock > 0 GROUP BY package",
+    ),
+    (
+        "Поступления за месяц",
+        "SELECT COUNT(*), SUM(sales_volume * price) FROM products "
+        "WHERE strftime('%Y-%m', receipt_date) = :month",
+        "SELECT COUNT(*), SUM(sales_volume * price) FROM products "
+        "WHERE receipt_date >= :month || '-01' AND receipt_date < date(:month || '-01', '+1 month')",
+    ),
+    (
+        "Истекает в ближайшую неделю",
+        "SELECT COUNT(*) FROM products WHERE "
+        "julianday(receipt_date) + storage_days BETWEEN julianday(:today) AND julianday(:today) + 7",
+        "SELECT COUNT(*) FROM products WHERE "
+        "expiry_date BETWEEN :today AND date(:today, '+7 days')",
+    ),
+]
+
+
+def run_queries(conn, version_index):
+    """Вывод плана и лучшего из трех времен выполнения для каждого запроса"""
+    params = {'today': date.today().isoformat(), 'month': date.today().strftime('%Y-%m')}
+    for title, *sql in QUERIES:
+        query = sql[version_index]
+        plan = '; '.join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            conn.execute(query, params).fetchall()
+            best = min(best, time.perf_counter() - start)
+        print(f"  {title}: {best * 1000:.1f} мс")
+        print(f"    план: {plan}")
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'store.db')
+        print(f"Создание базы данных: {size} продуктов...")
+        conn = make_database(size, path=path, schema_version=1)
+
+        print("До миграций (версия схемы 1):")
+        run_queries(conn, 0)
+
+        start = time.perf_counter()
+        migrate(conn)
+        conn.execute("ANALYZE")
+        print(f"Миграция до версии {LATEST_VERSION}: {time.perf_counter() - start:.1f} с")
+
+        print(f"После миграций (версия схемы {LATEST_VERSION}):")
+        run_queries(conn, 1)
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
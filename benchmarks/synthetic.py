@@ -0,0 +1,131 @@
+"""Синтетические базы данных магазина для бенчмарков
+
+Продукты похожи на ассортимент продуктового магазина: названия из категории,
+производителя и фасовки, упаковка и срок хранения по категории, даты
+поступления преимущественно за последние месяцы, объемы с логнормальным
+распределением. Создание файла базы данных из командной строки:
+
+    python -m benchmarks.synthetic store.db --size 100000 [--seed 0]
+"""
+import argparse
+import itertools
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from migrations import LATEST_VERSION, migrate
+
+
+# Количество строк, вставляемых за один вызов executemany
+BATCH_SIZE = 10_000
+
+# Категории: название, виды упаковки, фасовки, диапазон цены (руб.)
+# и диапазон срока хранения (дней)
+CATEGORIES = [
+    ("Молоко", ["Пакет", "Бутылка", "Тетрапак"], ["0,9 л", "1 л", "1,5 л"], (60, 150), (5, 14)),
+    ("Кефир", ["Пакет", "Бутылка"], ["0,5 л", "0,9 л"], (55, 130), (5, 10)),
+    ("Йогурт", ["Стакан", "Бутылка"], ["125 г", "270 г", "0,5 л"], (40, 120), (7, 30)),
+    ("Сыр", ["Вакуумная упаковка", "Весовой"], ["200 г", "400 г", "1 кг"], (400, 1500), (30, 120)),
+    ("Масло сливочное", ["Пачка", "Фольга"], ["180 г", "200 г"], (150, 400), (20, 60)),
+    ("Хлеб", ["Пакет", "Без упаковки"], ["300 г", "500 г"], (30, 90), (2, 5)),
+    ("Яблоки", ["Ящик", "Сетка", "Весовой"], ["1 кг", "2 кг", "10 кг"], (80, 250), (30, 120)),
+    ("Картофель", ["Сетка", "Мешок"], ["2 кг", "5 кг", "25 кг"], (30, 80), (60, 180)),
+    ("Гречка", ["Пакет", "Коробка"], ["800 г", "900 г"], (70, 150), (180, 365)),
+    ("Макароны", ["Пакет", "Коробка"], ["400 г", "450 г", "1 кг"], (50, 200), (180, 365)),
+    ("Кофе", ["Банка", "Пакет", "Коробка"], ["95 г", "250 г", "1 кг"], (300, 1500), (180, 365)),
+    ("Чай", ["Коробка", "Пачка"], ["25 пакетиков", "100 г", "200 г"], (100, 600), (180, 365)),
+    ("Сок", ["Тетрапак", "Бутылка"], ["0,2 л", "1 л", "2 л"], (90, 200), (60, 365)),
+    ("Курица", ["Лоток", "Вакуумная упаковка"], ["1 кг", "500 г"], (200, 500), (3, 10)),
+    ("Рыба", ["Лоток", "Весовой"], ["300 г", "1 кг"], (300, 1200), (2, 7)),
+    ("Творог", ["Пачка", "Стакан"], ["180 г", "500 г"], (80, 250), (5, 14)),
+]
+
+# Производители (вымышленные)
+BRANDS = [
+    "Луговое", "Северное", "Фермерское", "Золотой колос", "Родные просторы",
+    "Вкусная долина", "Берёзка", "Солнечное", "Заречье", "Хозяюшка",
+    "Зелёный край", "Утренняя роса", "Дары полей", "Сытый дом", "Пятый сезон",
+]
+
+# Средний возраст поставки (дней) и самая старая поставка
+MEAN_AGE_DAYS = 90
+MAX_AGE_DAYS = 730
+
+
+def product_rows(size, seed=0, today=None):
+    """Генератор строк products (без id) в порядке DATA_FIELDS"""
+    rnd = random.Random(seed)
+    today = today or date.today()
+    for i in range(size):
+        category, packages, variants, (low_price, high_price), (low_days, high_days) = \
+            rnd.choice(CATEGORIES)
+        name = f"{category} {rnd.choice(BRANDS)} {rnd.choice(variants)}"
+        # Номер партии различает одинаковые позиции разных поставок
+        if rnd.random() < 0.5:
+            name += f" №{i}"
+
+        age = min(MAX_AGE_DAYS, int(rnd.expovariate(1 / MEAN_AGE_DAYS)))
+        purchase = round(min(1_000_000, rnd.lognormvariate(4, 1)), 1)
+        yield (
+            name,
+            rnd.choice(packages),
+            (today - timedelta(days=age)).isoformat(),
+            rnd.randint(low_days, high_days),
+            purchase,
+            round(purchase * rnd.betavariate(2, 2), 1),
+            round(rnd.uniform(low_price, high_price), 2),
+        )
+
+
+def make_database(size, seed=0, path=':memory:', schema_version=LATEST_VERSION):
+    """Создание базы данных с size случайными продуктами
+
+    schema_version позволяет получить базу данных старой версии схемы,
+    например, чтобы сравнить запросы до и после миграций.
+    """
+    conn = sqlite3.connect(path)
+    # Продукты вставляются в исходную схему, а полнотекстовый индекс и журнал
+    # движения заполняются миграциями одним запросом, а не триггерами на каждую строку
+    migrate(conn, min(1, schema_version))
+
+    rows = product_rows(size, seed)
+    for _ in range(0, size, BATCH_SIZE):
+        conn.executemany('''
+            INSERT INTO products (
+                name, package, receipt_date, storage_days,
+                purchase_volume, sales_volume, price
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', list(itertools.islice(rows, BATCH_SIZE)))
+    conn.commit()
+
+    migrate(conn, schema_version)
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Создание базы данных магазина со случайными продуктами")
+    parser.add_argument('path', help="файл базы данных")
+    parser.add_argument('--size', type=int, default=100_000, help="количество продуктов")
+    parser.add_argument('--seed', type=int, default=0, help="начальное значение генератора")
+    parser.add_argument('--force', action='store_true', help="перезаписать существующий файл")
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        if not args.force:
+            print(f"Файл {args.path} уже существует (--force для перезаписи)", file=sys.stderr)
+            return 1
+        os.remove(args.path)
+
+    start = time.perf_counter()
+    conn = make_database(args.size, args.seed, args.path)
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"{args.path}: {args.size} продуктов за {time.perf_counter() - start:.1f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
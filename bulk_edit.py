@@ -0,0 +1,137 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+    QComboBox, QDoubleSpinBox, QPushButton
+)
+from PySide6.QtGui import QUndoCommand
+
+from products import FIELDS, PRICE_RANGE, STORAGE_DAYS_RANGE
+
+
+# Действия групповой правки
+CHANGE_PRICE_PERCENT = 'price_percent'
+SET_PRICE = 'price'
+SET_STORAGE_DAYS = 'storage_days'
+
+# Изменение цены в процентах: от -99% до +1000%
+PERCENT_RANGE = (-99, 1000)
+
+
+class BulkEditDialog(QDialog):
+    """Групповая правка выбранных продуктов: цена или срок хранения"""
+
+    def __init__(self, count, parent=None):
+        super().__init__(parent)
+
+        self.setWindowTitle("Групповая правка")
+        self.setModal(True)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        layout.addWidget(QLabel(f"Выбрано продуктов: {count}"))
+
+        self.action_box = QComboBox()
+        self.action_box.addItem("Изменить цену на процент", CHANGE_PRICE_PERCENT)
+        self.action_box.addItem("Установить цену", SET_PRICE)
+        self.action_box.addItem("Установить срок хранения", SET_STORAGE_DAYS)
+        self.action_box.currentIndexChanged.connect(self.on_action_changed)
+        layout.addWidget(self.action_box)
+
+        self.value = QDoubleSpinBox()
+        layout.addWidget(self.value)
+
+        button_layout = QHBoxLayout()
+        self.ok_btn = QPushButton("OK")
+        self.ok_btn.clicked.connect(self.accept)
+        self.cancel_btn = QPushButton("Отмена")
+        self.cancel_btn.clicked.connect(self.reject)
+        button_layout.addWidget(self.ok_btn)
+        button_layout.addWidget(self.cancel_btn)
+        layout.addLayout(button_layout)
+
+        self.on_action_changed()
+
+    def on_action_changed(self):
+        """Диапазон и единицы значения для выбранного действия"""
+        action = self.action_box.currentData()
+        if action == CHANGE_PRICE_PERCENT:
+            self.value.setDecimals(1)
+            self.value.setRange(*PERCENT_RANGE)
+            self.value.setPrefix("")
+            self.value.setSuffix(" %")
+            self.value.setValue(-10)
+        elif action == SET_PRICE:
+            self.value.setDecimals(2)
+            self.value.setRange(*PRICE_RANGE)
+            self.value.setPrefix("₽: ")
+            self.value.setSuffix("")
+            self.value.setValue(0)
+        else:
+            self.value.setDecimals(0)
+            self.value.setRange(*STORAGE_DAYS_RANGE)
+            self.value.setPrefix("")
+            self.value.setSuffix(" дн.")
+            self.value.setValue(30)
+
+    def get_action(self):
+        """Выбранное действие и значение"""
+        action = self.action_box.currentData()
+        value = self.value.value()
+        return action, int(value) if action == SET_STORAGE_DAYS else value
+
+
+class UpdateProductsCommand(QUndoCommand):
+    """Изменение поля нескольких продуктов с возможностью отмены
+
+    Отмена и повтор изменяют только продукты, которые с тех пор не изменили
+    на другом рабочем месте (проверка row_version). report(text) сообщает итог.
+    """
+
+    def __init__(self, service, field, values, row_versions, text, report):
+        super().__init__(text)
+        self.service = service
+        self.field = field
+        self.values = values
+        self.row_versions = row_versions
+        self.old_values = None
+        self.report = report
+
+    def redo(self):
+        requested = len(self.row_versions)
+        self.row_versions, old_rows = self.service.update_products(
+            self.field, {product_id: self.values[product_id] for product_id in self.row_versions},
+            self.row_versions
+        )
+        if self.old_values is None:
+            column = FIELDS.index(self.field)
+            self.old_values = {product_id: row[column] for product_id, row in old_rows.items()}
+        self.report(self.text(), len(self.row_versions), requested)
+
+    def undo(self):
+        requested = len(self.row_versions)
+        self.row_versions, _ = self.service.update_products(
+            self.field, {product_id: self.old_values[product_id] for product_id in self.row_versions},
+            self.row_versions
+        )
+        self.report(f"Отмена: {self.text()}", len(self.row_versions), requested)
+
+
+class DeleteProductsCommand(QUndoCommand):
+    """Удаление нескольких продуктов; отмена восстанавливает их с прежними id"""
+
+    def __init__(self, service, ids, text, report):
+        super().__init__(text)
+        self.service = service
+        self.ids = ids
+        self.rows = []
+        # Движения запасов и прогнозы удаленных продуктов
+        self.related = None
+        self.report = report
+
+    def redo(self):
+        self.rows, self.related = self.service.delete_products(self.ids)
+        self.report(self.text(), len(self.rows), len(self.ids))
+
+    def undo(self):
+        self.service.restore_products(self.rows, self.related)
+        self.report(f"Отмена: {self.text()}", len(self.rows), len(self.rows))
@@ -0,0 +1,223 @@
+"""Снимок каталога в массивах NumPy для расчетов по всем продуктам
+
+Числовые поля продуктов хранятся по столбцам: id (по возрастанию), дата
+поступления (номер дня от 1970-01-01), срок хранения, объемы закупки и
+продажи, цена и код вида упаковки. Снимок загружается из базы данных один
+раз и затем обновляется только для измененных продуктов (update), поэтому
+скидки, остатки и крупнейшие позиции всего каталога считаются векторными
+операциями без SQL-запроса и цикла по строкам.
+
+Названия продуктов в снимке не хранятся: подписи нескольких позиций графика
+читаются из базы данных по id.
+
+Обновление не изменяет массивы на месте, а заменяет набор столбцов целиком,
+поэтому снимок можно читать из фонового потока, пока главный поток его
+обновляет: расчет использует тот набор, который был текущим в его начале.
+"""
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from analytics import (
+    NO_PACKAGE_LABEL, STOCK_BY_PACKAGE, STOCK_BY_PRODUCT, STOCK_OTHER_LABEL, STOCK_TOP_N
+)
+from discounts import MAX_DISCOUNT_PERCENT, MIN_DISCOUNT_PERCENT
+from instrumentation import timed
+
+
+# Количество строк, читаемых из базы данных за один раз при загрузке
+LOAD_BATCH = 100000
+
+# Количество продуктов, перечитываемых одним запросом при обновлении
+QUERY_BATCH = 500
+
+# День поступления продукта без корректной даты
+NO_DATE = np.iinfo(np.int32).min
+
+# Номер дня 1970-01-01 в григорианском календаре (date.toordinal)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Дата поступления - целое число дней от 1970-01-01 (юлианский день эпохи 2440587.5);
+# NULL в сроке хранения считается нулем, как в discount_percent
+_SELECT = f'''
+    SELECT id,
+           COALESCE(CAST(julianday(receipt_date) - 2440587.5 AS INTEGER), {NO_DATE}),
+           COALESCE(storage_days, 0), purchase_volume, sales_volume, price, package
+    FROM products
+'''
+
+Columns = namedtuple(
+    'Columns', 'ids receipt_day storage_days purchase sales price package'
+)
+
+_DTYPES = Columns(np.int64, np.int32, np.int32, np.float64, np.float64, np.float64, np.int32)
+
+
+def epoch_day(day):
+    """Номер дня от 1970-01-01 для даты day"""
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def _top(values, limit):
+    """Номера limit наибольших значений по убыванию (при равенстве - больший номер)
+
+    argpartition отбирает limit наибольших значений без полной сортировки;
+    сортируются только они и равные наименьшему из них.
+    """
+    if len(values) > limit:
+        kth = values[np.argpartition(values, len(values) - limit)[len(values) - limit:]].min()
+        candidates = np.flatnonzero(values >= kth)
+    else:
+        candidates = np.arange(len(values))
+    order = np.lexsort((-candidates, -values[candidates]))
+    return candidates[order[:limit]]
+
+
+def _names(cursor, ids):
+    """Названия продуктов ids: {id: название}"""
+    ids = [int(product_id) for product_id in ids]
+    if not ids:
+        return {}
+    cursor.execute(
+        f"SELECT id, name FROM products WHERE id IN ({', '.join('?' * len(ids))})", ids
+    )
+    return dict(cursor.fetchall())
+
+
+class CatalogSnapshot:
+    """Столбцы всех продуктов каталога (columns) и расчеты по ним"""
+
+    def __init__(self):
+        self.columns = Columns(*(np.empty(0, dtype) for dtype in _DTYPES))
+        # Подписи видов упаковки по коду; пустая упаковка и NULL - одна позиция,
+        # как в распределении запасов analytics.stock_distribution. Коды только
+        # добавляются, поэтому прежний набор столбцов остается верным
+        self.packages = []
+        self._package_codes = {}
+
+    def __len__(self):
+        return len(self.columns.ids)
+
+    @timed('catalog_snapshot.load')
+    def load(self, cursor):
+        """Загрузка всех продуктов из базы данных"""
+        cursor.execute(f"{_SELECT} ORDER BY id")
+        parts = []
+        while True:
+            rows = cursor.fetchmany(LOAD_BATCH)
+            if not rows:
+                break
+            parts.append(self._arrays(rows))
+        if not parts:
+            parts.append(self._arrays([]))
+        self.columns = Columns(*(np.concatenate(column) for column in zip(*parts)))
+
+    @timed('catalog_snapshot.update')
+    def update(self, cursor, ids):
+        """Перечитывание продуктов ids после их изменения, добавления или удаления"""
+        ids = sorted(set(ids))
+        if not ids:
+            return
+        rows = []
+        for start in range(0, len(ids), QUERY_BATCH):
+            batch = ids[start:start + QUERY_BATCH]
+            cursor.execute(f"{_SELECT} WHERE id IN ({', '.join('?' * len(batch))})", batch)
+            rows.extend(cursor.fetchall())
+        rows.sort()
+
+        columns = self.columns
+        kept = ~np.isin(columns.ids, ids)
+        new = self._arrays(rows)
+        # Строки вставляются на свои места, чтобы id оставались по возрастанию
+        positions = np.searchsorted(columns.ids[kept], new.ids)
+        self.columns = Columns(*(
+            np.insert(column[kept], positions, new_column)
+            for column, new_column in zip(columns, new)
+        ))
+
+    def discount_percents(self, today=None):
+        """Процент скидки каждого продукта (та же формула, что и в discount_percent)"""
+        columns = self.columns
+        days = epoch_day(today or date.today()) - columns.receipt_day.astype(np.int64)
+        half = columns.storage_days / 2
+        discounted = (
+            (columns.purchase > columns.sales) & (columns.storage_days > 0)
+            & (columns.receipt_day != NO_DATE) & (days > half)
+        )
+        # Для продуктов без скидки (в том числе без срока хранения) значение
+        # не используется, поэтому деление на ноль не важно
+        with np.errstate(divide='ignore', invalid='ignore'):
+            progress = np.minimum(1.0, (days - half) / half)
+            percent = np.minimum(MAX_DISCOUNT_PERCENT, (
+                MIN_DISCOUNT_PERCENT + progress * (MAX_DISCOUNT_PERCENT - MIN_DISCOUNT_PERCENT)
+            ).astype(np.int64))
+        return np.where(discounted, percent, 0)
+
+    def discounts(self, today=None):
+        """Продукты со скидкой: массивы id, процента скидки и цены со скидкой"""
+        columns = self.columns
+        percent = self.discount_percents(today)
+        discounted = np.flatnonzero(percent)
+        percent = percent[discounted]
+        return (columns.ids[discounted], percent,
+                columns.price[discounted] * (1 - percent / 100))
+
+    def top_products(self, cursor, limit=5):
+        """Самые продаваемые продукты (как analytics.top_products)"""
+        columns = self.columns
+        known = np.flatnonzero(~np.isnan(columns.sales))
+        top = known[_top(columns.sales[known], limit)]
+        names = _names(cursor, columns.ids[top])
+        return [(names.get(int(product_id)), float(sales))
+                for product_id, sales in zip(columns.ids[top], columns.sales[top])]
+
+    def stock_distribution(self, cursor, limit=STOCK_TOP_N, group_by=STOCK_BY_PRODUCT):
+        """Остатки на складе: limit крупнейших позиций и сумма остальных
+
+        Результат тот же, что и у analytics.stock_distribution.
+        """
+        columns = self.columns
+        stock = columns.purchase - columns.sales
+        positive = np.flatnonzero(stock > 0)
+
+        if group_by == STOCK_BY_PACKAGE:
+            # Суммы остатков по кодам упаковки; равные суммы - по убыванию подписи
+            counts = np.bincount(columns.package[positive], minlength=len(self.packages))
+            totals = np.bincount(columns.package[positive], weights=stock[positive],
+                                 minlength=len(self.packages))
+            items = sorted(((float(totals[code]), self.packages[code])
+                            for code in np.flatnonzero(counts)), reverse=True)
+            top = [(label, total) for total, label in items[:limit]]
+            count = len(items)
+        else:
+            chosen = positive[_top(stock[positive], limit)]
+            names = _names(cursor, columns.ids[chosen])
+            top = [(names.get(int(product_id)), float(value))
+                   for product_id, value in zip(columns.ids[chosen], stock[chosen])]
+            count = len(positive)
+
+        if count > len(top):
+            other = float(stock[positive].sum()) - sum(value for _, value in top)
+            top.append((f"{STOCK_OTHER_LABEL} ({count - len(top)})", other))
+        return top
+
+    def _arrays(self, rows):
+        """Столбцы из строк запроса _SELECT"""
+        ids, receipt_day, storage_days, purchase, sales, price, package = zip(*rows) if rows else [()] * 7
+        codes = self._package_codes
+        package_codes = []
+        for value in package:
+            label = value or NO_PACKAGE_LABEL
+            code = codes.get(label)
+            if code is None:
+                code = codes[label] = len(self.packages)
+                self.packages.append(label)
+            package_codes.append(code)
+        # None в объемах и цене становится NaN
+        return Columns(*(
+            np.array(values, dtype=dtype)
+            for values, dtype in zip(
+                (ids, receipt_day, storage_days, purchase, sales, price, package_codes), _DTYPES
+            )
+        ))
@@ -0,0 +1,220 @@
+import math
+
+from matplotlib import rcParams
+from matplotlib.patches import Wedge
+from matplotlib.ticker import FuncFormatter
+
+
+# Цвета темной темы вкладки "Аналитика"
+AXES_COLOR = '#2D2D2D'
+LEGEND_COLOR = '#3A3A3A'
+TEXT_COLOR = 'white'
+LINE_COLOR = '#1f77b4'
+
+# Не более стольких подписей месяцев на оси X графика дохода
+MAX_MONTH_LABELS = 24
+
+# Виды графика распределения запасов и цвет позиции "Прочее"
+STOCK_PIE = 'pie'
+STOCK_BAR = 'bar'
+OTHER_COLOR = '#808080'
+
+# Длина подписи позиции на графике и наименьшая доля сектора с подписью
+MAX_LABEL_LENGTH = 24
+MIN_LABEL_SHARE = 0.01
+
+
+def series_key(*series):
+    """Отпечаток входных данных графика для пропуска повторной отрисовки"""
+    return hash(tuple(tuple(map(tuple, rows)) for rows in series))
+
+
+def short_label(text):
+    """Подпись, укороченная до MAX_LABEL_LENGTH символов"""
+    text = str(text)
+    if len(text) <= MAX_LABEL_LENGTH:
+        return text
+    return text[:MAX_LABEL_LENGTH - 1] + '…'
+
+
+class Chart:
+    """График с постоянными объектами matplotlib
+
+    Оси и элементы графика создаются один раз; update() только меняет их данные
+    и возвращает False, если входные данные не изменились с прошлого вызова
+    (перерисовывать холст не нужно).
+    """
+
+    def __init__(self, figure, title):
+        self.figure = figure
+        self.ax = figure.add_subplot(111)
+        self.ax.set_facecolor(AXES_COLOR)
+        self.ax.set_title(title, color=TEXT_COLOR, pad=20)
+        self.ax.tick_params(colors=TEXT_COLOR)
+        for spine in self.ax.spines.values():
+            spine.set_color(TEXT_COLOR)
+        self._key = None
+
+    def update(self, *series):
+        key = series_key(*series)
+        if key == self._key:
+            return False
+        self._key = key
+        self.set_data(*series)
+        return True
+
+    def invalidate(self):
+        """Следующий update() обновит график даже при тех же данных"""
+        self._key = None
+
+    def set_data(self, *series):
+        raise NotImplementedError
+
+
+class IncomeChart(Chart):
+    """Доход по месяцам и прогноз"""
+
+    def __init__(self, figure):
+        super().__init__(figure, "Тренд дохода по месяцам")
+        figure.subplots_adjust(left=0.15, bottom=0.35, right=0.95, top=0.85)
+        self.ax.set_ylabel("Доход", color=TEXT_COLOR)
+
+        # Месяцы откладываются по оси X номерами, подписи задаются отдельно
+        self.income_line, = self.ax.plot([], [], marker='o', color=LINE_COLOR)
+        self.forecast_line, = self.ax.plot([], [], 'r--', marker='o', label='Прогноз')
+        self.legend = self.ax.legend(facecolor=LEGEND_COLOR, edgecolor=TEXT_COLOR,
+                                     labelcolor=TEXT_COLOR)
+        self.legend.set_visible(False)
+
+    def set_data(self, income, forecast):
+        months = [row[0] for row in income] + [row[0] for row in forecast]
+        self.income_line.set_data(range(len(income)), [row[1] for row in income])
+        self.forecast_line.set_data(range(len(income), len(months)),
+                                    [row[1] for row in forecast])
+        self.legend.set_visible(bool(income and forecast))
+
+        step = max(1, math.ceil(len(months) / MAX_MONTH_LABELS))
+        ticks = range(0, len(months), step)
+        self.ax.set_xticks(ticks)
+        self.ax.set_xticklabels([months[i] for i in ticks], rotation=45, ha='right')
+
+        self.ax.relim()
+        self.ax.autoscale_view()
+
+
+class TopProductsChart(Chart):
+    """Самые продаваемые продукты"""
+
+    def __init__(self, figure, limit=5):
+        super().__init__(figure, f"Топ {limit} продаваемых продуктов")
+        figure.subplots_adjust(left=0.15, bottom=0.4, right=0.95, top=0.85)
+        self.ax.set_ylabel("Объем продаж (кг)", color=TEXT_COLOR)
+        self.ax.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f'{x:,.0f} кг'))
+        self.ax.set_xlim(-0.5, limit - 0.5)
+        self.bars = self.ax.bar(range(limit), [0] * limit, color=LINE_COLOR).patches
+
+    def set_data(self, top):
+        for i, bar in enumerate(self.bars):
+            bar.set_visible(i < len(top))
+            bar.set_height(top[i][1] if i < len(top) else 0)
+        self.ax.set_xticks(range(len(top)))
+        self.ax.set_xticklabels([row[0] for row in top], rotation=30, ha='right')
+
+        highest = max((row[1] for row in top), default=0)
+        self.ax.set_ylim(0, highest * 1.05 or 1)
+
+
+class StockChart(Chart):
+    """Распределение запасов: круговая диаграмма или горизонтальные столбцы
+
+    Отображается не более limit позиций и позиция "Прочее", поэтому количество
+    секторов и столбцов постоянно: они создаются один раз, при обновлении
+    меняются только их размеры и подписи.
+    """
+
+    def __init__(self, figure, limit, mode=STOCK_PIE):
+        super().__init__(figure, "Распределение запасов")
+        figure.subplots_adjust(left=0.15, bottom=0.3)
+        self.limit = limit
+        self.mode = mode
+        self.stock = []
+        size = limit + 1
+        # Позиция "Прочее" всегда последняя и окрашена серым
+        colors = [color for color in rcParams['axes.prop_cycle'].by_key()['color']
+                  if color != '#7f7f7f']
+        colors = [colors[i % len(colors)] for i in range(limit)] + [OTHER_COLOR]
+
+        # Круговая диаграмма
+        self.ax.set(frame_on=False, xticks=[], yticks=[], xlim=(-1.25, 1.25), ylim=(-1.25, 1.25))
+        self.ax.set_aspect('equal')
+        self.wedges = [self.ax.add_patch(Wedge((0, 0), 1, 0, 0, facecolor=color))
+                       for color in colors]
+        self.labels = [self.ax.text(0, 0, '', color=TEXT_COLOR, va='center')
+                       for _ in range(size)]
+        self.percents = [self.ax.text(0, 0, '', color=TEXT_COLOR, ha='center', va='center')
+                         for _ in range(size)]
+
+        # Столбцы на отдельных осях в той же области рисунка
+        self.bar_ax = figure.add_axes([0.3, 0.1, 0.62, 0.72])
+        self.bar_ax.set_title(self.ax.get_title(), color=TEXT_COLOR, pad=20)
+        self.bar_ax.set_facecolor(AXES_COLOR)
+        self.bar_ax.tick_params(colors=TEXT_COLOR)
+        for spine in self.bar_ax.spines.values():
+            spine.set_color(TEXT_COLOR)
+        self.bar_ax.xaxis.set_major_formatter(FuncFormatter(lambda x, _: f'{x:,.0f} кг'))
+        self.bars = self.bar_ax.barh(range(size), [0] * size, color=colors).patches
+        self._show_mode()
+
+    def set_mode(self, mode):
+        """Смена вида графика; возвращает True, если нужна перерисовка"""
+        if mode == self.mode:
+            return False
+        self.mode = mode
+        self._show_mode()
+        return True
+
+    def _show_mode(self):
+        self.ax.set_visible(self.mode == STOCK_PIE)
+        self.bar_ax.set_visible(self.mode == STOCK_BAR)
+
+    def set_data(self, stock):
+        self.stock = stock[:self.limit + 1]
+        self._set_pie()
+        self._set_bars()
+
+    def _set_pie(self):
+        total = sum(row[1] for row in self.stock)
+        theta = 0
+        for i, wedge in enumerate(self.wedges):
+            visible = i < len(self.stock)
+            for artist in (wedge, self.labels[i], self.percents[i]):
+                artist.set_visible(visible)
+            if not visible:
+                continue
+
+            name, volume = self.stock[i]
+            share = volume / total
+            wedge.set_theta1(theta)
+            wedge.set_theta2(theta + 360 * share)
+
+            # Подписи на биссектрисе сектора, как в Axes.pie
+            middle = math.radians(theta + 180 * share)
+            x, y = math.cos(middle), math.sin(middle)
+            # Подписи узких секторов накладывались бы друг на друга
+            self.labels[i].set_text(short_label(name) if share >= MIN_LABEL_SHARE else '')
+            self.labels[i].set_position((1.1 * x, 1.1 * y))
+            self.labels[i].set_horizontalalignment('left' if x > 0 else 'right')
+            self.percents[i].set_text(f'{share * 100:.1f}%' if share >= 0.03 else '')
+            self.percents[i].set_position((0.6 * x, 0.6 * y))
+            theta += 360 * share
+
+    def _set_bars(self):
+        for i, bar in enumerate(self.bars):
+            bar.set_visible(i < len(self.stock))
+            bar.set_width(self.stock[i][1] if i < len(self.stock) else 0)
+        self.bar_ax.set_yticks(range(len(self.stock)))
+        self.bar_ax.set_yticklabels([short_label(row[0]) for row in self.stock])
+        # Крупнейшая позиция сверху
+        self.bar_ax.set_ylim(max(len(self.stock), 1) - 0.5, -0.5)
+        highest = max((row[1] for row in self.stock), default=0)
+        self.bar_ax.set_xlim(0, highest * 1.05 or 1)
@@ -0,0 +1,172 @@
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import instrumentation
+from migrations import migrate
+
+
+# Имя файла базы данных в директории приложения
+DB_NAME = 'store.db'
+
+# Максимальное количество соединений для чтения из фоновых потоков
+READER_POOL_SIZE = 4
+
+# Настройки соединений: журнал WAL позволяет читать во время записи,
+# synchronous=NORMAL достаточно для WAL и заметно ускоряет запись
+WRITER_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA mmap_size = 268435456",     # 256 МБ
+    "PRAGMA cache_size = -65536",       # 64 МБ
+    "PRAGMA temp_store = MEMORY",
+    # ANALYZE и PRAGMA optimize читают не больше ~1000 строк каждого индекса:
+    # статистика приблизительная, зато блокировка записи короткая
+    "PRAGMA analysis_limit = 1000",
+]
+# Ожидание блокировки записи для PRAGMA optimize при закрытии (мс): если
+# другое рабочее место пишет, статистика обновится при следующем закрытии
+CLOSE_BUSY_TIMEOUT = 200
+
+READER_PRAGMAS = [
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -16384",       # 16 МБ
+    "PRAGMA temp_store = MEMORY",
+]
+
+
+def get_app_dir():
+    """Получаем директорию приложения"""
+    if getattr(sys, 'frozen', False):
+        # Если приложение собрано
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def get_db_path():
+    """Путь к файлу базы данных в директории приложения"""
+    return os.path.join(get_app_dir(), DB_NAME)
+
+
+def connect_read_only(path):
+    """Соединение только для чтения (в том числе из другого процесса)"""
+    uri = Path(path).as_uri() + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    for pragma in READER_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class ReadOnlyDatabase:
+    """Пул соединений только для чтения к существующей базе данных
+
+    Файл и схема не изменяются: используется для чтения баз данных других
+    магазинов (federation.py).
+    """
+
+    def __init__(self, path, pool_size=READER_POOL_SIZE):
+        self.path = os.path.abspath(path)
+        self.pool_size = pool_size
+
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def reader(self):
+        """Соединение только для чтения из пула на время блока with
+
+        Соединение можно использовать в любом потоке, но только в одном
+        одновременно. Если все соединения заняты, ожидает освобождения.
+        """
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            # Незавершенная транзакция чтения не должна удерживать снимок WAL
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def close(self):
+        """Закрытие свободных соединений пула"""
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._reader_count < self.pool_size
+            if create:
+                self._reader_count += 1
+        if not create:
+            return self._readers.get()
+        try:
+            return self._connect_reader()
+        except Exception:
+            with self._lock:
+                self._reader_count -= 1
+            raise
+
+    def _connect_reader(self):
+        conn = connect_read_only(self.path)
+        instrumentation.watch_connection(conn)
+        return conn
+
+
+class Database(ReadOnlyDatabase):
+    """Единая точка доступа к базе данных магазина
+
+    Одно соединение для записи (используется в GUI-потоке) и небольшой пул
+    соединений только для чтения для фоновых задач. При открытии схема
+    обновляется до последней версии.
+    """
+
+    def __init__(self, path=None, pool_size=READER_POOL_SIZE):
+        super().__init__(path or get_db_path(), pool_size)
+
+        self.conn = sqlite3.connect(self.path)
+        # Свободные страницы новой базы данных возвращаются по частям
+        # (maintenance.incremental_vacuum); действует только до создания первой
+        # таблицы, поэтому выполняется раньше перехода в режим WAL
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        for pragma in WRITER_PRAGMAS:
+            self.conn.execute(pragma)
+        migrate(self.conn)
+        instrumentation.watch_connection(self.conn)
+
+    def connect(self):
+        """Отдельное соединение для записи из фонового потока
+
+        Соединение закрывает вызывающий код. Транзакции записи должны быть
+        короткими: соединение GUI-потока ожидает их завершения.
+        """
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for pragma in WRITER_PRAGMAS:
+            conn.execute(pragma)
+        instrumentation.watch_connection(conn)
+        return conn
+
+    def close(self):
+        """Закрытие всех соединений"""
+        super().close()
+        # Обновление статистики планировщика для таблиц, запрошенных за время
+        # работы; другая копия программы может удерживать блокировку записи
+        try:
+            self.conn.execute(f"PRAGMA busy_timeout = {CLOSE_BUSY_TIMEOUT}")
+            self.conn.execute("PRAGMA optimize")
+        except sqlite3.OperationalError:
+            pass
+        self.conn.close()
@@ -0,0 +1,208 @@
+"""Прогноз спроса по продуктам и рекомендуемый дозаказ
+
+Скорость продаж продукта (объем в день) оценивается по его продажам с даты
+поступления, сглаженным к средней скорости продуктов той же упаковки: оценка
+упаковки действует как PRIOR_DAYS дней продаж, поэтому для недавно
+поступивших продуктов она важнее собственной. По скорости продаж
+рассчитываются продажи до окончания срока хранения (receipt_date +
+storage_days), остаток, который не успеют продать, и объем дозаказа на
+REORDER_COVER_DAYS дней (не больше срока хранения).
+
+Расчет выполняет пакетная задача run_forecasts: диапазоны по CHUNK_SIZE
+продуктов обрабатываются в пуле процессов (ProcessPoolExecutor), каждый
+процесс читает свой диапазон через отдельное соединение только для чтения.
+Результаты записываются в таблицу forecasts (migrations.py, версия 7).
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date
+
+from database import connect_read_only
+
+
+# Вес средней скорости продаж упаковки, дней продаж
+PRIOR_DAYS = 7
+
+# Дозаказ рассчитывается на столько дней продаж (не больше срока хранения)
+REORDER_COVER_DAYS = 14
+
+# Количество продуктов в одном задании пула процессов
+CHUNK_SIZE = 20000
+
+# Наибольшее количество процессов
+MAX_WORKERS = 8
+
+# Период проверки отмены во время ожидания результатов (с)
+CANCEL_CHECK_INTERVAL = 0.2
+
+# Дней с поступления продукта на дату, переданную параметром
+_AGE = "CAST(julianday(?) - julianday(receipt_date) AS INTEGER)"
+
+
+class ForecastCancelled(Exception):
+    """Расчет прогноза отменен пользователем"""
+
+
+def forecast_product(age, storage_days, purchase_volume, sales_volume, group_rate):
+    """Прогноз одного продукта или None, если данных недостаточно
+
+    age - дней с поступления, group_rate - средняя скорость продаж упаковки.
+    Возвращает (продажи в день, продажи до окончания срока, непроданный
+    остаток, объем дозаказа).
+    """
+    if (age is None or not storage_days or storage_days <= 0
+            or purchase_volume is None or sales_volume is None):
+        return None
+    days_on_sale = max(1, min(age, storage_days))
+    rate = (sales_volume + PRIOR_DAYS * group_rate) / (days_on_sale + PRIOR_DAYS)
+
+    remaining = min(storage_days, max(0, storage_days - age))
+    stock = max(0.0, purchase_volume - sales_volume)
+    projected = min(stock, rate * remaining)
+
+    # Новая поставка должна покрыть продажи на cover дней за вычетом остатка,
+    # который будет продан за это время
+    cover = min(REORDER_COVER_DAYS, storage_days)
+    shortage = rate * cover - min(stock, rate * min(cover, remaining))
+    return rate, projected, stock - projected, max(0, math.ceil(round(shortage, 6)))
+
+
+def group_rates(cursor, today):
+    """Средняя скорость продаж по упаковке: {упаковка: объем в день}
+
+    Пустая упаковка и NULL - одна группа.
+    """
+    cursor.execute(f'''
+        SELECT COALESCE(package, ''), SUM(sales_volume), SUM(MAX(1, MIN(age, storage_days)))
+        FROM (SELECT package, sales_volume, storage_days, {_AGE} AS age FROM products)
+        WHERE age IS NOT NULL AND storage_days > 0 AND sales_volume IS NOT NULL
+        GROUP BY 1
+    ''', (today.isoformat(),))
+    return {package: sales / days for package, sales, days in cursor.fetchall()}
+
+
+def forecast_range(path, first_id, last_id, rates, today):
+    """Прогноз продуктов с id от first_id до last_id (выполняется в процессе пула)
+
+    Возвращает строки для таблицы forecasts.
+    """
+    conn = connect_read_only(path)
+    try:
+        rows = conn.execute(f'''
+            SELECT id, COALESCE(package, ''), {_AGE}, storage_days, purchase_volume, sales_volume
+            FROM products
+            WHERE id BETWEEN ? AND ?
+        ''', (today, first_id, last_id)).fetchall()
+    finally:
+        conn.close()
+
+    results = []
+    for product_id, package, *values in rows:
+        forecast = forecast_product(*values, rates.get(package, 0.0))
+        if forecast is not None:
+            results.append((product_id, *forecast, today))
+    return results
+
+
+def id_ranges(cursor, size=CHUNK_SIZE):
+    """Диапазоны id продуктов по size продуктов: список пар (первый, последний)"""
+    cursor.execute("SELECT MIN(id), MAX(id) FROM products")
+    first, last_id = cursor.fetchone()
+    ranges = []
+    while first is not None:
+        cursor.execute(
+            "SELECT id FROM products WHERE id >= ? ORDER BY id LIMIT 1 OFFSET ?", (first, size - 1)
+        )
+        row = cursor.fetchone()
+        last = row[0] if row else last_id
+        ranges.append((first, last))
+        cursor.execute("SELECT MIN(id) FROM products WHERE id > ?", (last,))
+        first = cursor.fetchone()[0]
+    return ranges
+
+
+def run_forecasts(conn, path, today=None, workers=None, progress=None,
+                  is_cancelled=lambda: False):
+    """Расчет прогноза всех продуктов базы данных path и запись в forecasts
+
+    conn - соединение для записи. Результаты каждого задания записываются
+    отдельной транзакцией, поэтому запись продуктов не ожидает всего расчета.
+    progress(n) вызывается с количеством рассчитанных продуктов. При отмене
+    (is_cancelled) выбрасывается ForecastCancelled; уже записанные прогнозы
+    сохраняются. Возвращает количество рассчитанных продуктов.
+    """
+    today = (today or date.today()).isoformat()
+    cursor = conn.cursor()
+    rates = group_rates(cursor, date.fromisoformat(today))
+    ranges = id_ranges(cursor)
+    if not ranges:
+        return 0
+
+    workers = min(workers or os.cpu_count() or 1, MAX_WORKERS, len(ranges))
+    # spawn: процессы пула не наследуют потоки и соединения SQLite программы
+    context = multiprocessing.get_context('spawn')
+    done = 0
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        pending = {
+            executor.submit(forecast_range, path, first, last, rates, today)
+            for first, last in ranges
+        }
+        try:
+            while pending:
+                finished, pending = wait(pending, CANCEL_CHECK_INTERVAL, FIRST_COMPLETED)
+                if is_cancelled():
+                    raise ForecastCancelled()
+                for future in finished:
+                    results = future.result()
+                    # Продукт могли удалить во время расчета
+                    with conn:
+                        conn.executemany('''
+                            INSERT OR REPLACE INTO forecasts (
+                                product_id, daily_sales, projected_sales, expected_waste,
+                                reorder_quantity, forecast_date
+                            )
+                            SELECT ?, ?, ?, ?, ?, ?
+                            WHERE EXISTS (SELECT 1 FROM products WHERE id = ?1)
+                        ''', results)
+                    done += len(results)
+                    if progress:
+                        progress(done)
+        except BaseException:
+            executor.shutdown(cancel_futures=True)
+            raise
+    return done
+
+
+def reorder_page(cursor, after=None, limit=100):
+    """Продукты с рекомендуемым дозаказом по убыванию объема дозаказа
+
+    Строки: (id, название, упаковка, остаток, продажи в день, продажи до
+    окончания срока, непроданный остаток, дозаказ). after - (дозаказ, id)
+    последней строки предыдущей страницы.
+    """
+    condition, params = "f.reorder_quantity > 0", ()
+    if after is not None:
+        condition, params = "(f.reorder_quantity, f.product_id) < (?, ?) AND f.reorder_quantity > 0", tuple(after)
+    cursor.execute(f'''
+        SELECT p.id, p.name, p.package, p.stock, f.daily_sales, f.projected_sales,
+               f.expected_waste, f.reorder_quantity
+        FROM forecasts f JOIN products p ON p.id = f.product_id
+        WHERE {condition}
+        ORDER BY f.reorder_quantity DESC, f.product_id DESC
+        LIMIT ?
+    ''', params + (limit,))
+    return cursor.fetchall()
+
+
+def reorder_count(cursor):
+    """Количество продуктов с рекомендуемым дозаказом"""
+    cursor.execute("SELECT COUNT(*) FROM forecasts WHERE reorder_quantity > 0")
+    return cursor.fetchone()[0]
+
+
+def forecast_date(cursor):
+    """Дата последнего расчета прогноза (строка ISO) или None"""
+    cursor.execute("SELECT MAX(forecast_date) FROM forecasts")
+    return cursor.fetchone()[0]
@@ -0,0 +1,110 @@
+from PySide6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QTableWidget, QTableWidgetItem, QHeaderView, QPlainTextEdit
+)
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont
+
+import instrumentation
+from instrumentation import HISTOGRAM_BOUNDS
+
+
+COLUMNS = ["Операция", "Вызовов", "Среднее, мс", "p50, мс", "p95, мс",
+           "Макс., мс", "SQL на вызов", "Гистограмма (мс: вызовов)"]
+
+# Период обновления сводки, пока вкладка открыта (мс)
+REFRESH_INTERVAL = 1000
+
+
+def histogram_text(buckets):
+    """Непустые интервалы гистограммы: "≤5: 12  ≤10: 3  >5000: 1" """
+    labels = [f"≤{bound}" for bound in HISTOGRAM_BOUNDS] + [f">{HISTOGRAM_BOUNDS[-1]}"]
+    return "  ".join(f"{label}: {count}" for label, count in zip(labels, buckets) if count)
+
+
+class DiagnosticsTab(QWidget):
+    """Скрытая вкладка "Диагностика": сводка замеров и отчеты профилирования"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        self.counters_label = QLabel()
+        self.counters_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.counters_label)
+
+        buttons = QHBoxLayout()
+        self.reset_btn = QPushButton("Сбросить статистику")
+        self.reset_btn.clicked.connect(self.reset)
+        buttons.addStretch()
+        buttons.addWidget(self.reset_btn)
+        layout.addLayout(buttons)
+
+        # Отчет последнего профилирования
+        self.report = QPlainTextEdit()
+        self.report.setReadOnly(True)
+        self.report.setFont(QFont("Courier New", 9))
+        self.report.setPlaceholderText("Отчет профилирования появится после его выключения "
+                                       "(меню \"Диагностика\")")
+        layout.addWidget(self.report)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        """Обновление сводки по накопленным замерам"""
+        metrics, counters = instrumentation.snapshot()
+        self.table.setRowCount(len(metrics))
+        for row, metric in enumerate(metrics):
+            queries = metric['queries'] / metric['count'] if metric['count'] else 0
+            values = [
+                metric['name'],
+                str(metric['count']),
+                f"{metric['mean_ms']:.1f}",
+                f"{metric['p50_ms']:.1f}",
+                f"{metric['p95_ms']:.1f}",
+                f"{metric['max_ms']:.1f}",
+                f"{queries:.1f}",
+                histogram_text(metric['histogram']),
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if 0 < column < len(values) - 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+        lines = [f"{name}: {value}" for name, value in sorted(counters.items())]
+        memory = instrumentation.traced_memory()
+        if memory:
+            current, peak = memory
+            lines.append(f"Память (tracemalloc): {current / 1024 / 1024:.1f} МБ, "
+                         f"пик {peak / 1024 / 1024:.1f} МБ")
+        self.counters_label.setText("\n".join(lines) or "Нет данных")
+
+    def reset(self):
+        """Сброс накопленной статистики"""
+        instrumentation.reset()
+        self.refresh()
+
+    def show_report(self, title, text, path):
+        """Отчет профилирования и путь к сохраненному файлу"""
+        header = f"{title}\n" + (f"Сохранено: {path}\n" if path else "")
+        self.report.setPlainText(f"{header}\n{text}")
@@ -0,0 +1,219 @@
+"""Расписание изменения скидок и истечения сроков хранения
+
+Скидка зависит только от количества дней хранения, поэтому для каждого
+продукта известна дата следующего изменения: начало скидки, переход на
+следующий процент или истечение срока хранения. Эти даты хранятся в очереди
+с приоритетом (heapq); advance() обрабатывает только наступившие события и
+возвращает продукты, скидка или срок которых действительно изменились.
+"""
+import heapq
+import itertools
+import math
+from datetime import date, timedelta
+
+from discounts import MAX_DISCOUNT_PERCENT, MIN_DISCOUNT_PERCENT, discount_info, discount_percent
+from instrumentation import timed
+
+
+# Начала скидок загружаются в очередь на столько дней вперед
+HORIZON_DAYS = 7
+
+# Количество продуктов, перечитываемых одним запросом
+QUERY_BATCH = 500
+
+PRODUCT_COLUMNS = '''
+    id, name, price, receipt_date, storage_days, purchase_volume, sales_volume
+'''
+
+
+def change_day(days_in_storage, storage_days):
+    """Ближайший день хранения, в который скидка изменится, или None
+
+    После наибольшей скидки следующим изменением считается истечение срока
+    хранения (день storage_days + 1).
+    """
+    if not storage_days or storage_days <= 0 or days_in_storage > storage_days:
+        return None
+    percent = discount_percent(days_in_storage, storage_days)
+    if not percent:
+        # Первый день, когда пройдено более половины срока
+        return max(storage_days // 2 + 1, days_in_storage + 1)
+    if percent >= MAX_DISCOUNT_PERCENT:
+        return storage_days + 1
+
+    # Решение MIN + (d - h) / h * (MAX - MIN) >= percent + 1 относительно d,
+    # уточненное по discount_percent из-за округления
+    half = storage_days / 2
+    day = max(days_in_storage + 1, math.ceil(
+        half + (percent + 1 - MIN_DISCOUNT_PERCENT) * half / (MAX_DISCOUNT_PERCENT - MIN_DISCOUNT_PERCENT)
+    ))
+    while discount_percent(day, storage_days) <= percent:
+        day += 1
+    while day - 1 > days_in_storage and discount_percent(day - 1, storage_days) > percent:
+        day -= 1
+    return day
+
+
+def next_change(receipt_date, storage_days, purchase_volume, sales_volume, today):
+    """Дата следующего изменения скидки или срока продукта, или None"""
+    if purchase_volume is None or sales_volume is None or purchase_volume <= sales_volume:
+        return None
+    try:
+        received = date.fromisoformat(receipt_date)
+    except (TypeError, ValueError):
+        return None
+    day = change_day((today - received).days, storage_days)
+    return received + timedelta(days=day) if day is not None else None
+
+
+class DiscountSchedule:
+    """Скидки продуктов и очередь дат их изменения
+
+    discounts - словарь {id продукта: данные о скидке} (как calculate_discounts),
+    expired - множество id продуктов с остатком и истекшим сроком хранения.
+    Оба объекта обновляются на месте, поэтому их можно передать модели таблицы.
+    """
+
+    def __init__(self):
+        self.discounts = {}
+        self.expired = set()
+        self.today = None
+        self._queue = []
+        # Версия расписания продукта: события прежних версий пропускаются
+        self._versions = {}
+        self._version = itertools.count()
+        # Последний день, начала скидок до которого уже в очереди
+        self._loaded_until = None
+
+    @timed('discount_schedule.build')
+    def build(self, cursor, today=None):
+        """Расчет скидок и очереди событий по всем продуктам"""
+        self.today = today or date.today()
+        self.discounts.clear()
+        self.expired.clear()
+        self._queue = []
+        self._versions = {}
+
+        # Продукты со скидкой: та же выборка, что и в calculate_discounts
+        cursor.execute(f'''
+            SELECT {PRODUCT_COLUMNS}
+            FROM products
+            WHERE
+                julianday(?) - julianday(receipt_date) > storage_days / 2
+                AND purchase_volume > sales_volume
+        ''', (self.today.isoformat(),))
+        for product in cursor.fetchall():
+            self._schedule(product)
+
+        self._loaded_until = self.today
+        self._load_starts(cursor)
+
+    @timed('discount_schedule.advance')
+    def advance(self, cursor, today=None):
+        """Обработка событий, наступивших к дате today
+
+        Возвращает пару множеств id: продукты с изменившейся скидкой и продукты,
+        срок хранения которых истек с прошлого вызова.
+        """
+        today = today or date.today()
+        if self.today is not None and today <= self.today:
+            return set(), set()
+        self.today = today
+        # После перерыва дольше HORIZON_DAYS _load_starts добавляет продукты,
+        # скидка которых уже началась: прежней скидки у них не было
+        started = self._load_starts(cursor)
+        old = dict.fromkeys(started)
+
+        due = set()
+        while self._queue and self._queue[0][0] <= today:
+            _, product_id, version = heapq.heappop(self._queue)
+            if self._versions.get(product_id) == version:
+                due.add(product_id)
+
+        for product_id in due:
+            old.setdefault(product_id, self.discounts.get(product_id))
+        was_expired = (due - started) & self.expired
+        self._reload(cursor, due)
+
+        changed = set()
+        for product_id, info in old.items():
+            new = self.discounts.get(product_id)
+            if (info and info['discount_percent']) != (new and new['discount_percent']):
+                changed.add(product_id)
+        return changed, ((due | started) & self.expired) - was_expired
+
+    def product_changed(self, cursor, product_id):
+        """Пересчет скидки и расписания одного продукта (после изменения или удаления)"""
+        self._reload(cursor, [product_id])
+
+    def products_changed(self, cursor, ids):
+        """Пересчет скидок и расписания продуктов ids"""
+        self._reload(cursor, ids)
+
+    def _reload(self, cursor, ids):
+        """Перечитывание продуктов ids и их расписания"""
+        ids = list(ids)
+        for product_id in ids:
+            self.discounts.pop(product_id, None)
+            self.expired.discard(product_id)
+            self._versions.pop(product_id, None)
+        for start in range(0, len(ids), QUERY_BATCH):
+            batch = ids[start:start + QUERY_BATCH]
+            cursor.execute(f'''
+                SELECT {PRODUCT_COLUMNS} FROM products WHERE id IN ({', '.join('?' * len(batch))})
+            ''', batch)
+            for product in cursor.fetchall():
+                self._schedule(product, self._loaded_until)
+
+    def next_date(self):
+        """Дата ближайшего события в очереди или None"""
+        while self._queue and self._versions.get(self._queue[0][1]) != self._queue[0][2]:
+            heapq.heappop(self._queue)
+        return self._queue[0][0] if self._queue else None
+
+    def _schedule(self, product, until=None):
+        """Текущая скидка продукта и событие его следующего изменения
+
+        Начало скидки не добавляется в очередь, если оно позже until: такие
+        начала загружает _load_starts.
+        """
+        product_id, _, _, receipt_date, storage_days, purchase_volume, sales_volume = product
+        info = discount_info(*product, today=self.today)
+        if info:
+            self.discounts[product_id] = info
+        change = next_change(receipt_date, storage_days, purchase_volume, sales_volume, self.today)
+        if change is None:
+            # Скидка есть, а изменений больше не будет: срок хранения истек
+            if info:
+                self.expired.add(product_id)
+            return
+        if not info and until is not None and change > until:
+            return
+        version = next(self._version)
+        self._versions[product_id] = version
+        heapq.heappush(self._queue, (change, product_id, version))
+
+    def _load_starts(self, cursor):
+        """Добавление в очередь продуктов, скидка которых начнется в ближайшие дни
+
+        Возвращает множество id добавленных продуктов.
+        """
+        until = self.today + timedelta(days=HORIZON_DAYS)
+        if self._loaded_until is not None and until <= self._loaded_until:
+            return set()
+        # Скидка начинается на день хранения storage_days / 2 + 1 (целочисленное деление)
+        cursor.execute(f'''
+            SELECT {PRODUCT_COLUMNS}
+            FROM products
+            WHERE
+                purchase_volume > sales_volume AND storage_days > 0
+                AND date(receipt_date, '+' || (storage_days / 2 + 1) || ' days') > ?
+                AND date(receipt_date, '+' || (storage_days / 2 + 1) || ' days') <= ?
+        ''', (self._loaded_until.isoformat(), until.isoformat()))
+        self._loaded_until = until
+        started = set()
+        for product in cursor.fetchall():
+            if product[0] not in self._versions:
+                self._schedule(product)
+                started.add(product[0])
+        return started
@@ -0,0 +1,89 @@
+from datetime import date
+
+
+# Границы прогрессивной скидки, %
+MIN_DISCOUNT_PERCENT = 5
+MAX_DISCOUNT_PERCENT = 50
+
+
+def discount_percent(days_in_storage, storage_days):
+    """Процент скидки для товара, пролежавшего более половины срока хранения"""
+    if not storage_days or days_in_storage <= storage_days / 2:
+        return 0
+    # Прогрессивная скидка: от 5% до 50% в зависимости от времени хранения
+    progress = min(1.0, (days_in_storage - storage_days / 2) / (storage_days / 2))
+    return min(MAX_DISCOUNT_PERCENT,
+               int(MIN_DISCOUNT_PERCENT + progress * (MAX_DISCOUNT_PERCENT - MIN_DISCOUNT_PERCENT)))
+
+
+def discount_info(product_id, name, price, receipt_date, storage_days,
+                  purchase_volume, sales_volume, today=None):
+    """Скидка для одного продукта или None, если скидка не положена"""
+    if purchase_volume is None or sales_volume is None or purchase_volume <= sales_volume:
+        return None
+    try:
+        # Рассчитываем количество дней в хранении
+        days_in_storage = ((today or date.today()) - date.fromisoformat(receipt_date)).days
+    except (TypeError, ValueError):
+        # Если дата некорректна, пропускаем товар
+        return None
+
+    percent = discount_percent(days_in_storage, storage_days)
+    if not percent:
+        return None
+    return {
+        'id': product_id,
+        'name': name,
+        'original_price': price,
+        'discounted_price': price * (1 - percent / 100),
+        'discount_percent': percent
+    }
+
+
+def calculate_discounts(cursor, today=None):
+    """Расчет скидок всех продуктов за один запрос
+
+    Возвращает словарь {id продукта: данные о скидке}.
+    """
+    today = today or date.today()
+    cursor.execute('''
+        SELECT id, name, price, receipt_date, storage_days, purchase_volume, sales_volume
+        FROM products
+        WHERE
+            julianday(?) - julianday(receipt_date) > storage_days / 2
+            AND purchase_volume > sales_volume
+    ''', (today.isoformat(),))
+
+    discounts = {}
+    for product in cursor.fetchall():
+        info = discount_info(*product, today=today)
+        if info:
+            discounts[info['id']] = info
+    return discounts
+
+
+def product_discount(cursor, product_id, today=None):
+    """Скидка одного продукта или None, если скидка не положена"""
+    cursor.execute('''
+        SELECT id, name, price, receipt_date, storage_days, purchase_volume, sales_volume
+        FROM products
+        WHERE id = ?
+    ''', (product_id,))
+    product = cursor.fetchone()
+    return discount_info(*product, today=today) if product else None
+
+
+def discount_sql(today=None):
+    """SQL-выражение процента скидки (та же формула, что и в discount_percent)"""
+    today = (today or date.today()).isoformat()
+    days = f"CAST(julianday('{today}') - julianday(receipt_date) AS INTEGER)"
+    half = "(storage_days / 2.0)"
+    return f'''
+        CASE
+            WHEN purchase_volume > sales_volume AND storage_days > 0 AND {days} > {half}
+            THEN MIN({MAX_DISCOUNT_PERCENT}, CAST(
+                {MIN_DISCOUNT_PERCENT} + MIN(1.0, ({days} - {half}) / {half})
+                * {MAX_DISCOUNT_PERCENT - MIN_DISCOUNT_PERCENT} AS INTEGER))
+            ELSE 0
+        END
+    '''
@@ -0,0 +1,46 @@
+import argparse
+import sys
+
+from database import Database
+from exporter import CHUNK_SIZE, FORMATS, export_income, export_products
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Выгрузка продуктов со скидками, дохода по месяцам и прогноза "
+                    "в CSV, JSON Lines или Parquet"
+    )
+    parser.add_argument('path', help="файл выгрузки продуктов (.csv, .jsonl, .parquet)")
+    parser.add_argument('--income', help="файл выгрузки дохода по месяцам и прогноза")
+    parser.add_argument('--format', choices=sorted(set(FORMATS.values())),
+                        help="формат выгрузки (по умолчанию по расширению файла)")
+    parser.add_argument('--db', help="файл базы данных (по умолчанию store.db в директории приложения)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help=f"строк в одной порции чтения (по умолчанию {CHUNK_SIZE})")
+    args = parser.parse_args()
+
+    database = Database(args.db)
+    try:
+        with database.reader() as conn:
+            count = export_products(
+                conn, args.path, args.format, args.chunk_size,
+                progress=lambda n: print(f"\rВыгружено строк: {n}", end='', file=sys.stderr)
+            )
+            print(file=sys.stderr)
+            print(f"Продукты: {count} строк -> {args.path}")
+            if args.income:
+                count = export_income(conn, args.income, args.format)
+                print(f"Доход и прогноз: {count} строк -> {args.income}")
+    except (OSError, ImportError, ValueError) as e:
+        print(f"\nОшибка выгрузки: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("\nВыгрузка прервана", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+
+from analytics import FORECAST_HORIZON, calculate_income_trend, predict_future_income
+from discounts import discount_sql
+from products import FIELDS
+
+
+# Количество строк, читаемых из базы данных и записываемых за один раз
+CHUNK_SIZE = 10000
+
+# Форматы выгрузки по расширению файла
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+# Столбцы выгрузки продуктов и их типы (для Parquet)
+PRODUCT_COLUMNS = [
+    ('id', 'int'),
+    ('name', 'text'),
+    ('package', 'text'),
+    ('receipt_date', 'text'),
+    ('storage_days', 'int'),
+    ('purchase_volume', 'float'),
+    ('sales_volume', 'float'),
+    ('price', 'float'),
+    ('stock', 'float'),
+    ('expiry_date', 'text'),
+    ('discount_percent', 'int'),
+    ('discounted_price', 'float'),
+]
+
+# Столбцы выгрузки дохода: месяц, доход и вид значения
+INCOME_COLUMNS = [
+    ('month', 'text'),
+    ('income', 'float'),
+    ('kind', 'text'),
+]
+INCOME_ACTUAL = 'actual'
+INCOME_FORECAST = 'forecast'
+
+
+class ExportCancelled(Exception):
+    """Выгрузка отменена пользователем; файл не создан"""
+
+
+def export_format(path, fmt=None):
+    """Формат выгрузки: заданный явно или по расширению файла"""
+    fmt = fmt or FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS.values():
+        raise ValueError(f"Неизвестный формат выгрузки для файла {path}; "
+                         f"используйте {', '.join(sorted(FORMATS))}")
+    return fmt
+
+
+def export_products(conn, path, fmt=None, chunk_size=CHUNK_SIZE, progress=None,
+                    is_cancelled=lambda: False, today=None):
+    """Потоковая выгрузка продуктов вместе с рассчитанными скидками
+
+    Строки читаются одним запросом порциями по chunk_size (fetchmany), поэтому
+    расход памяти не зависит от размера таблицы. Скидка рассчитывается той же
+    формулой, что и в таблице программы. progress(n) вызывается после каждой
+    порции. Возвращает количество выгруженных строк.
+    """
+    percent = discount_sql(today)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT {', '.join(FIELDS)}, stock, expiry_date,
+               discount, ROUND(price * (1 - discount / 100.0), 2)
+        FROM (SELECT *, {percent} AS discount FROM products)
+        ORDER BY id
+    ''')
+
+    def chunks():
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    return _write(path, export_format(path, fmt), PRODUCT_COLUMNS, chunks(),
+                  progress, is_cancelled)
+
+
+def export_income(conn, path, fmt=None, months=FORECAST_HORIZON, progress=None,
+                  is_cancelled=lambda: False):
+    """Выгрузка дохода по месяцам и прогноза на months месяцев вперед"""
+    income = calculate_income_trend(conn.cursor())
+    forecast = predict_future_income(income, months)
+    rows = [(month, value, INCOME_ACTUAL) for month, value in income]
+    rows += [(month, value, INCOME_FORECAST) for month, value in forecast]
+    return _write(path, export_format(path, fmt), INCOME_COLUMNS, [rows],
+                  progress, is_cancelled)
+
+
+def _write(path, fmt, columns, chunks, progress, is_cancelled):
+    # Данные пишутся во временный файл, который заменяет path только после
+    # успешного завершения: прерванная выгрузка не оставляет неполный файл
+    part_path = path + '.part'
+    writer = WRITERS[fmt](part_path, columns)
+    written = 0
+    try:
+        for rows in chunks:
+            if is_cancelled():
+                raise ExportCancelled()
+            if rows:
+                writer.write(rows)
+                written += len(rows)
+            if progress:
+                progress(written)
+        writer.close()
+    except BaseException:
+        writer.close()
+        os.remove(part_path)
+        raise
+    os.replace(part_path, path)
+    return written
+
+
+class CsvWriter:
+    """CSV с разделителем ";" (открывается в Excel с русскими настройками)"""
+
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file, delimiter=';')
+        self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesWriter:
+    """JSON Lines: один объект на строку"""
+
+    def __init__(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+        self.names = [name for name, _ in columns]
+
+    def write(self, rows):
+        self.file.writelines(
+            json.dumps(dict(zip(self.names, row)), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Parquet через pyarrow; каждая порция записывается отдельной группой строк"""
+
+    def __init__(self, path, columns):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Для выгрузки в Parquet установите пакет pyarrow")
+
+        types = {'int': pa.int64(), 'float': pa.float64(), 'text': pa.string()}
+        self.pa = pa
+        self.names = [name for name, _ in columns]
+        self.schema = pa.schema([(name, types[kind]) for name, kind in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        data = {name: list(values) for name, values in zip(self.names, zip(*rows))}
+        self.writer.write_table(self.pa.table(data, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'jsonl': JsonLinesWriter,
+    'parquet': ParquetWriter,
+}
@@ -0,0 +1,300 @@
+"""Сводные данные нескольких магазинов
+
+У каждого магазина своя база данных store.db. FederatedService открывает их
+только для чтения (database.ReadOnlyDatabase) и выполняет запрос ко всем
+выбранным магазинам параллельно в пуле потоков: SQLite отпускает GIL на
+время запроса, поэтому время ответа определяется самым большим магазином, а
+не суммой продуктов всех магазинов. Результаты объединяются без повторного чтения строк:
+
+- страницы продуктов и скидок - слиянием упорядоченных списков (heapq.merge);
+  от каждого магазина читаются только первые offset + limit строк (страница
+  одного магазина - как в StoreReader.list_products);
+- доход по месяцам - суммой по месяцам;
+- самые продаваемые продукты и крупнейшие остатки - limit наибольших из
+  limit наибольших каждого магазина, количество и сумма остальных - суммой
+  итогов магазинов;
+- остатки по упаковке - суммой по подписи упаковки.
+
+ATTACH не используется: запросы одного соединения к присоединенным базам
+данных выполняются последовательно, а их количество ограничено
+(SQLITE_MAX_ATTACHED, по умолчанию 10).
+"""
+import heapq
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import (
+    FORECAST_HORIZON, STOCK_BY_PACKAGE, STOCK_BY_PRODUCT, STOCK_TOP_N,
+    predict_future_income, stock_item_count, stock_page, stock_totals, top_products, with_other
+)
+from database import DB_NAME, ReadOnlyDatabase
+from migrations import LATEST_VERSION, schema_version
+from service import PAGE_SIZE, StoreReader, ValidationError, page_bounds
+
+
+# Соединений чтения на магазин
+STORE_POOL_SIZE = 2
+
+# Наибольшее количество строк, читаемых у всех выбранных магазинов вместе
+# для одной страницы: у каждого магазина - первые offset + limit строк,
+# поэтому чем меньше магазинов, тем дальше доступные страницы. Страницы
+# одного магазина читаются без ограничения
+MAX_MERGED_ROWS = 30000
+
+
+def store_name(path):
+    """Имя магазина по пути к базе данных
+
+    Для файла с именем по умолчанию (store.db) - имя его директории.
+    """
+    path = os.path.abspath(path)
+    if os.path.basename(path) == DB_NAME:
+        return os.path.basename(os.path.dirname(path))
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def parse_stores(values):
+    """Магазины из аргументов "имя=путь" или "путь": {имя: путь}"""
+    stores = {}
+    for value in values:
+        name, sep, path = value.partition('=')
+        if not sep:
+            name, path = store_name(value), value
+        if name in stores:
+            raise ValidationError(f"Магазин {name} указан дважды; задайте имена: имя=путь")
+        stores[name] = path
+    return stores
+
+
+def _label(name, store):
+    return f"{name} ({store})"
+
+
+def open_store(name, path, pool_size=STORE_POOL_SIZE):
+    """Чтение базы данных магазина без ее изменения
+
+    Схема не обновляется, поэтому база данных должна быть последней версии:
+    более старую нужно открыть программой магазина, более новая создана
+    следующей версией программы. Иначе - ValidationError.
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Нет базы данных магазина {name}: {path}")
+    database = ReadOnlyDatabase(path, pool_size)
+    try:
+        with database.reader() as conn:
+            version = schema_version(conn)
+    except Exception:
+        database.close()
+        raise
+    if version != LATEST_VERSION:
+        database.close()
+        if version < LATEST_VERSION:
+            raise ValidationError(
+                f"База данных магазина {name} ({path}) версии {version}, нужна "
+                f"{LATEST_VERSION}: откройте ее программой магазина для обновления"
+            )
+        raise ValidationError(
+            f"База данных магазина {name} ({path}) версии {version} создана более "
+            f"новой версией программы (поддерживается {LATEST_VERSION}): обновите программу"
+        )
+    return StoreReader(database)
+
+
+def _top_products(service, limit):
+    with service.database.reader() as conn:
+        return top_products(conn.cursor(), limit)
+
+
+def _stock(service, limit, group_by):
+    """Крупнейшие позиции магазина, количество позиций и сумма остатков
+
+    По упаковке возвращаются все позиции: одинаковые упаковки разных
+    магазинов складываются, а видов упаковки немного.
+    """
+    with service.database.reader() as conn:
+        cursor = conn.cursor()
+        if group_by == STOCK_BY_PACKAGE:
+            limit = stock_item_count(cursor, group_by)
+        rows = stock_page(cursor, limit=limit, group_by=group_by)
+        count, total = stock_totals(cursor, group_by)
+    return rows, count, total or 0
+
+
+class FederatedService:
+    """Продукты, скидки и аналитика нескольких магазинов (только чтение)
+
+    stores - {имя магазина: путь к базе данных}. Базы данных открываются
+    только для чтения (open_store) и не изменяются. Методы принимают
+    stores - список имен магазинов (None - все); строки результатов содержат
+    имя магазина.
+    """
+
+    def __init__(self, stores, pool_size=STORE_POOL_SIZE):
+        if not stores:
+            raise ValidationError("Не указано ни одного магазина")
+        self.services = {}
+        try:
+            for name, path in stores.items():
+                self.services[name] = open_store(name, path, pool_size)
+        except Exception:
+            self.close()
+            raise
+        self._executor = ThreadPoolExecutor(
+            len(self.services) * pool_size, thread_name_prefix='federation'
+        )
+
+    @property
+    def names(self):
+        return list(self.services)
+
+    def close(self):
+        executor = getattr(self, '_executor', None)
+        if executor is not None:
+            executor.shutdown()
+        for service in self.services.values():
+            service.database.close()
+        self.services = {}
+
+    def _selected(self, stores):
+        """Имена выбранных магазинов (None - все) без повторов"""
+        if stores is None:
+            return self.names
+        # Магазин, указанный дважды, иначе учитывался бы в итогах дважды
+        stores = list(dict.fromkeys(stores))
+        unknown = [name for name in stores if name not in self.services]
+        if unknown:
+            raise ValidationError(f"Неизвестные магазины: {', '.join(unknown)}")
+        return stores
+
+    def _map(self, func, stores, *args):
+        """func(сервис магазина, *args) для выбранных магазинов параллельно
+
+        Возвращает список пар (имя магазина, результат).
+        """
+        futures = [(name, self._executor.submit(func, self.services[name], *args))
+                   for name in self._selected(stores)]
+        return [(name, future.result()) for name, future in futures]
+
+    def _merged_page(self, page, page_size, results, key, reverse=False):
+        """Страница из упорядоченных строк магазинов: (всего, строки)"""
+        limit, offset = page_bounds(page, page_size)
+        total = sum(store_total for _, (store_total, _) in results)
+        rows = heapq.merge(
+            *[[dict(row, store=name) for row in items] for name, (_, items) in results],
+            key=key, reverse=reverse
+        )
+        items = list(rows)[offset:offset + limit]
+        return {'page': page, 'page_size': page_size, 'total': total, 'items': items,
+                'stores': [name for name, _ in results]}
+
+    @staticmethod
+    def _store_page(name, result):
+        """Страница одного магазина с его именем в строках"""
+        result['items'] = [dict(row, store=name) for row in result['items']]
+        result['stores'] = [name]
+        return result
+
+    @staticmethod
+    def _depth(page, page_size, count):
+        """Строк, читаемых у каждого из count магазинов для страницы page"""
+        limit, offset = page_bounds(page, page_size)
+        max_depth = MAX_MERGED_ROWS // count
+        if offset + limit > max_depth:
+            raise ValidationError(
+                f"Слишком дальняя страница: для {count} магазинов доступны первые "
+                f"{max_depth} строк; выберите меньше магазинов или один магазин "
+                f"(у одного магазина доступны все страницы)"
+            )
+        return offset + limit
+
+    # Представления
+
+    def list_products(self, page=0, page_size=PAGE_SIZE, sort='id', descending=False,
+                      query=None, today=None, stores=None):
+        """Страница продуктов всех магазинов (как StoreService.list_products)"""
+        stores = self._selected(stores)
+        if len(stores) == 1:
+            [(name, result)] = self._map(
+                lambda service: service.list_products(page, page_size, sort, descending, query, today),
+                stores
+            )
+            return self._store_page(name, result)
+        depth = self._depth(page, page_size, len(stores))
+        results = self._map(
+            lambda service: service.product_rows(depth, 0, sort, descending, query, today), stores
+        )
+        # NULL в SQLite меньше любого значения; при равенстве - по id
+        return self._merged_page(
+            page, page_size, results,
+            key=lambda row: (row[sort] is not None, row[sort], row['id']), reverse=descending
+        )
+
+    def discounts(self, page=0, page_size=PAGE_SIZE, today=None, stores=None):
+        """Страница продуктов со скидкой всех магазинов по убыванию скидки"""
+        stores = self._selected(stores)
+        if len(stores) == 1:
+            [(name, result)] = self._map(
+                lambda service: service.discounts(page, page_size, today), stores
+            )
+            return self._store_page(name, result)
+        depth = self._depth(page, page_size, len(stores))
+        results = self._map(lambda service: service.discount_rows(depth, 0, today), stores)
+        return self._merged_page(
+            page, page_size, results, key=lambda row: (-row['discount_percent'], row['id'])
+        )
+
+    def income_trend(self, stores=None):
+        """Доход всех магазинов по месяцам: список пар (месяц, доход)"""
+        totals = defaultdict(float)
+        for _, income in self._map(StoreReader.income_trend, stores):
+            for month, value in income:
+                totals[month] += value
+        return sorted(totals.items())
+
+    def forecast(self, months=FORECAST_HORIZON, stores=None):
+        """Доход всех магазинов по месяцам и прогноз на months месяцев"""
+        income = self.income_trend(stores)
+        return {'income': income, 'forecast': predict_future_income(income, months)}
+
+    def top_products(self, limit=5, stores=None):
+        """Самые продаваемые продукты всех магазинов: (название, продажи, магазин)"""
+        rows = [(name, sales, store)
+                for store, top in self._map(_top_products, stores, limit)
+                for name, sales in top]
+        # Продажи NULL - в конце, как ORDER BY sales_volume DESC
+        return heapq.nlargest(limit, rows, key=lambda row: (row[1] is not None, row[1]))
+
+    def stock_distribution(self, limit=STOCK_TOP_N, group_by=STOCK_BY_PRODUCT, stores=None):
+        """Остатки всех магазинов: limit крупнейших позиций и сумма остальных
+
+        Позиции по продуктам подписаны именем магазина, по упаковке - общие.
+        """
+        if group_by not in (STOCK_BY_PRODUCT, STOCK_BY_PACKAGE):
+            raise ValidationError(f"Группировка запасов: {STOCK_BY_PRODUCT} или {STOCK_BY_PACKAGE}")
+        results = self._map(_stock, stores, limit, group_by)
+        if group_by == STOCK_BY_PACKAGE:
+            packages = defaultdict(float)
+            for _, (rows, _, _) in results:
+                for _, label, stock in rows:
+                    packages[label] += stock
+            items = list(packages.items())
+            count, total = len(items), sum(packages.values())
+        else:
+            items = [(_label(label, store), stock)
+                     for store, (rows, _, _) in results for _, label, stock in rows]
+            count = sum(store_count for _, (_, store_count, _) in results)
+            total = sum(store_total for _, (_, _, store_total) in results)
+        top = heapq.nlargest(limit, items, key=lambda item: item[1])
+        return with_other(top, count, total)
+
+    def analytics(self, stock_group=STOCK_BY_PRODUCT, stores=None):
+        """Данные графиков вкладки "Аналитика" по всем магазинам"""
+        income = self.income_trend(stores)
+        return {
+            'income': income,
+            'forecast': predict_future_income(income),
+            'top': [(_label(name, store), sales)
+                    for name, sales, store in self.top_products(stores=stores)],
+            'stock': self.stock_distribution(group_by=stock_group, stores=stores),
+        }
@@ -0,0 +1,142 @@
+import threading
+from collections import OrderedDict
+
+
+# Поддерживаемые режимы прогноза
+LINEAR = 'linear'          # линейный тренд (метод наименьших квадратов)
+SEASONAL = 'seasonal'      # линейный тренд с поправкой на месяц года
+SMOOTHING = 'smoothing'    # двойное экспоненциальное сглаживание (метод Хольта)
+MODES = (LINEAR, SEASONAL, SMOOTHING)
+
+# Сезонная модель строится, если есть данные хотя бы за два года
+MIN_SEASONAL_MONTHS = 24
+
+# Параметры сглаживания уровня и тренда
+SMOOTHING_ALPHA = 0.5
+SMOOTHING_BETA = 0.3
+
+# Количество обученных моделей в кэше
+CACHE_SIZE = 16
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def month_index(month):
+    """Номер месяца от начала летоисчисления для строки 'ГГГГ-ММ'"""
+    year, month = month.split('-')
+    return int(year) * 12 + int(month) - 1
+
+
+def month_label(index):
+    """Строка 'ГГГГ-ММ' по номеру месяца"""
+    year, month = divmod(index, 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+def forecast_income(data, horizon=3, mode=LINEAR):
+    """Прогноз дохода на horizon месяцев вперед по тренду дохода
+
+    data - список пар (месяц 'ГГГГ-ММ', доход), отсортированный по месяцу.
+    Возвращает список пар (месяц, прогноз дохода не меньше нуля).
+    """
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим прогноза: {mode}")
+
+    # Месяцы без даты поступления в прогнозе не участвуют
+    points = tuple((month, income or 0.0) for month, income in data if month)
+    if not points:
+        return []
+
+    model = _fitted_model(points, mode)
+    last = month_index(points[-1][0])
+    months = list(range(last + 1, last + horizon + 1))
+    return [(month_label(m), max(0.0, float(value)))
+            for m, value in zip(months, model(months))]
+
+
+def clear_cache():
+    """Очистка кэша обученных моделей"""
+    with _cache_lock:
+        _cache.clear()
+
+
+def _fitted_model(points, mode):
+    """Обученная модель из кэша; модель обучается заново только на новых данных"""
+    key = (mode, hash(points))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == points:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    model = _FITTERS[mode](points)
+
+    with _cache_lock:
+        _cache[key] = (points, model)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return model
+
+
+def _fit_linear(points):
+    """Линейный тренд: решение наименьших квадратов в замкнутой форме"""
+    import numpy as np
+
+    x = np.array([month_index(month) for month, _ in points], dtype=float)
+    y = np.array([income for _, income in points], dtype=float)
+
+    x_mean = x.mean()
+    y_mean = y.mean()
+    variance = ((x - x_mean) ** 2).sum()
+    slope = ((x - x_mean) * (y - y_mean)).sum() / variance if variance else 0.0
+    intercept = y_mean - slope * x_mean
+
+    return lambda months: intercept + slope * np.asarray(months, dtype=float)
+
+
+def _fit_seasonal(points):
+    """Линейный тренд плюс сезонная составляющая по месяцам года"""
+    import numpy as np
+
+    if len(points) < MIN_SEASONAL_MONTHS:
+        return _fit_linear(points)
+
+    def design(months):
+        months = np.asarray(months)
+        # Январь - базовый месяц, для остальных - отдельные признаки
+        seasons = (months[:, None] % 12) == np.arange(1, 12)[None, :]
+        return np.column_stack([np.ones(len(months)), months, seasons]).astype(float)
+
+    x = np.array([month_index(month) for month, _ in points])
+    y = np.array([income for _, income in points], dtype=float)
+    coefficients = np.linalg.lstsq(design(x), y, rcond=None)[0]
+
+    return lambda months: design(months) @ coefficients
+
+
+def _fit_smoothing(points):
+    """Метод Хольта по непрерывному ряду месяцев (пропуски - нулевой доход)"""
+    import numpy as np
+
+    first = month_index(points[0][0])
+    last = month_index(points[-1][0])
+    series = np.zeros(last - first + 1)
+    for month, income in points:
+        series[month_index(month) - first] = income
+
+    level = series[0]
+    trend = series[1] - series[0] if len(series) > 1 else 0.0
+    for value in series[1:]:
+        previous_level = level
+        level = SMOOTHING_ALPHA * value + (1 - SMOOTHING_ALPHA) * (level + trend)
+        trend = SMOOTHING_BETA * (level - previous_level) + (1 - SMOOTHING_BETA) * trend
+
+    return lambda months: level + trend * (np.asarray(months, dtype=float) - last)
+
+
+_FITTERS = {
+    LINEAR: _fit_linear,
+    SEASONAL: _fit_seasonal,
+    SMOOTHING: _fit_smoothing,
+}
@@ -0,0 +1,45 @@
+import argparse
+import sys
+
+from database import Database
+from importer import BATCH_SIZE, ImportCancelled, import_products
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Импорт продуктов из файла поставки (CSV или XLSX) в базу данных магазина"
+    )
+    parser.add_argument('path', help="файл CSV или XLSX; первая строка - заголовки столбцов")
+    parser.add_argument('--db', help="файл базы данных (по умолчанию store.db в директории приложения)")
+    parser.add_argument('--errors', help="файл для отклоненных строк (по умолчанию <файл>.errors.csv)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f"строк в одном пакете вставки (по умолчанию {BATCH_SIZE})")
+    args = parser.parse_args()
+
+    database = Database(args.db)
+    try:
+        result = import_products(
+            database.conn, args.path,
+            error_path=args.errors,
+            batch_size=args.batch_size,
+            progress=lambda n: print(f"\rОбработано строк: {n}", end='', file=sys.stderr)
+        )
+    except (OSError, ImportError, ImportCancelled) as e:
+        print(f"\nОшибка импорта: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("\nИмпорт прерван, изменения не сохранены", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
+
+    print(file=sys.stderr)
+    print(f"Импортировано: {result['imported']}, отклонено: {result['rejected']}")
+    if result['error_path']:
+        print(f"Отклоненные строки: {result['error_path']}")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
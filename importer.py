@@ -0,0 +1,231 @@
+import csv
+import math
+import os
+from datetime import date, datetime
+
+from products import DATA_FIELDS, validate_product
+
+
+# Количество строк в одном вызове executemany
+BATCH_SIZE = 1000
+
+# Названия столбцов файла: поля таблицы products и заголовки таблицы в программе
+COLUMN_ALIASES = {
+    'name': 'name', 'название': 'name',
+    'package': 'package', 'упаковка': 'package',
+    'receipt_date': 'receipt_date', 'дата поступления': 'receipt_date',
+    'storage_days': 'storage_days', 'срок хранения': 'storage_days',
+    'purchase_volume': 'purchase_volume', 'объем закупки': 'purchase_volume',
+    'sales_volume': 'sales_volume', 'объем продажи': 'sales_volume',
+    'price': 'price', 'цена': 'price',
+}
+
+# Столбец с текстом ошибки в файле отклоненных строк
+ERROR_COLUMN = 'Ошибка'
+LINE_COLUMN = 'Строка'
+
+
+class ImportCancelled(Exception):
+    """Импорт отменен пользователем; изменения не сохранены"""
+
+
+def read_rows(path):
+    """Построчное чтение файла поставки: пары (номер строки, словарь значений)
+
+    Поддерживаются CSV (разделитель определяется автоматически) и XLSX.
+    Первая строка файла содержит заголовки столбцов.
+    """
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        return _read_xlsx(path)
+    return _read_csv(path)
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        for row in reader:
+            if any(value.strip() for value in row):
+                yield reader.line_num, dict(zip(header, row))
+
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Для импорта файлов Excel установите пакет openpyxl")
+
+    # В режиме read_only строки читаются с диска по мере обхода
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = ['' if value is None else str(value) for value in header]
+        for line, row in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in row):
+                yield line, dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def parse_row(raw):
+    """Преобразование значений строки файла в данные продукта
+
+    Возвращает пару (данные, текст ошибки). Проверка выполняется теми же
+    правилами, что и в форме продукта.
+    """
+    values = {}
+    for column, value in raw.items():
+        field = COLUMN_ALIASES.get(str(column).strip().lower())
+        if field:
+            values[field] = value
+
+    missing = [field for field in DATA_FIELDS if field not in values and field != 'package']
+    if missing:
+        return None, f"Нет столбцов: {', '.join(missing)}"
+
+    try:
+        data = {
+            'name': _text(values['name']),
+            'package': _text(values.get('package')),
+            'receipt_date': _date(values['receipt_date']),
+            'storage_days': _integer(values['storage_days']),
+            'purchase_volume': _number(values['purchase_volume']),
+            'sales_volume': _number(values['sales_volume']),
+            'price': _number(values['price']),
+        }
+    except (TypeError, ValueError, OverflowError) as e:
+        return None, f"Некорректное значение: {e}"
+
+    return data, validate_product(data)
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        number = float(value)
+    else:
+        text = _text(value).replace(' ', '').replace(' ', '').replace(',', '.')
+        if not text:
+            raise ValueError("пустое число")
+        number = float(text)
+    # inf, nan и 1e400 (float переполняется в inf)
+    if not math.isfinite(number):
+        raise ValueError(f"ожидалось конечное число, получено {value}")
+    return number
+
+
+def _integer(value):
+    number = _number(value)
+    if number != int(number):
+        raise ValueError(f"ожидалось целое число, получено {number}")
+    return int(number)
+
+
+def _date(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = _text(value)
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"дата '{text}'")
+
+
+def default_error_path(path):
+    """Путь к файлу отклоненных строк рядом с исходным файлом"""
+    return os.path.splitext(path)[0] + '.errors.csv'
+
+
+def import_products(conn, path, error_path=None, batch_size=BATCH_SIZE,
+                    progress=None, is_cancelled=lambda: False):
+    """Импорт продуктов из файла CSV или XLSX в одной транзакции
+
+    Корректные строки вставляются пакетами через executemany, отклоненные
+    записываются в CSV-файл error_path вместе с причиной. progress(n)
+    вызывается после каждого пакета с количеством обработанных строк.
+    При ошибке или отмене (is_cancelled() вернул True) транзакция
+    откатывается целиком, а файл отклоненных строк не создается: он пишется
+    во временный файл и получает имя error_path только после фиксации.
+
+    Возвращает словарь: imported, rejected, error_path (None, если ошибок нет).
+    """
+    error_path = error_path or default_error_path(path)
+    part_path = error_path + '.part'
+    insert_sql = f'''
+        INSERT INTO products ({', '.join(DATA_FIELDS)})
+        VALUES ({', '.join('?' * len(DATA_FIELDS))})
+    '''
+
+    imported = 0
+    rejected = 0
+    processed = 0
+    batch = []
+    error_file = None
+    error_writer = None
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for line, raw in read_rows(path):
+            data, error = parse_row(raw)
+            if error:
+                if error_writer is None:
+                    error_file = open(part_path, 'w', newline='', encoding='utf-8-sig')
+                    error_writer = csv.writer(error_file, delimiter=';')
+                    error_writer.writerow([LINE_COLUMN, ERROR_COLUMN] + list(raw.keys()))
+                error_writer.writerow([line, error] + ['' if v is None else v for v in raw.values()])
+                rejected += 1
+            else:
+                batch.append(tuple(data[field] for field in DATA_FIELDS))
+
+            processed += 1
+            if len(batch) >= batch_size or (processed % batch_size == 0):
+                if is_cancelled():
+                    raise ImportCancelled()
+                conn.executemany(insert_sql, batch)
+                imported += len(batch)
+                batch = []
+                if progress:
+                    progress(processed)
+
+        if batch:
+            conn.executemany(insert_sql, batch)
+            imported += len(batch)
+        if is_cancelled():
+            raise ImportCancelled()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        if error_file is not None:
+            error_file.close()
+            os.remove(part_path)
+        raise
+
+    if error_file is not None:
+        error_file.close()
+        os.replace(part_path, error_path)
+
+    if progress:
+        progress(processed)
+    return {
+        'imported': imported,
+        'rejected': rejected,
+        'error_path': error_path if rejected else None,
+    }
@@ -0,0 +1,286 @@
+"""Замеры производительности: таймеры, счетчики и профилирование
+
+Длительность вызовов отмеченных операций (measure, timed) накапливается в
+гистограммах вместе с количеством SQL-запросов, выполненных во время вызова
+на соединениях, переданных в watch_connection. Сводка отображается на
+скрытой вкладке "Диагностика" (Ctrl+Shift+D); каждый вызов записывается в
+журнал metrics.jsonl (JSON Lines, с ротацией) в директории приложения.
+
+Профилирование cProfile и трассировка памяти tracemalloc включаются из меню
+"Диагностика" или переменной окружения STORE_PROFILE=cprofile,tracemalloc
+(на все время работы программы). Результаты сохраняются в директорию журнала.
+"""
+import atexit
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+
+PROFILE_ENV = 'STORE_PROFILE'
+
+# Виды профилирования
+CPROFILE = 'cprofile'
+TRACEMALLOC = 'tracemalloc'
+
+# Журнал замеров: размер файла и количество старых файлов
+LOG_NAME = 'metrics.jsonl'
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUPS = 3
+
+# Верхние границы интервалов гистограммы длительности (мс); последний - без границы
+HISTOGRAM_BOUNDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Количество строк в отчетах профилирования
+REPORT_LINES = 25
+
+# Счетчик всех SQL-запросов на отслеживаемых соединениях
+SQL_QUERIES = 'sql.queries'
+
+
+class Metric:
+    """Статистика вызовов одной операции"""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.queries = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def add(self, ms, queries):
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+        self.queries += queries
+        position = 0
+        while position < len(HISTOGRAM_BOUNDS) and ms > HISTOGRAM_BOUNDS[position]:
+            position += 1
+        self.buckets[position] += 1
+
+    def percentile(self, share):
+        """Оценка перцентиля сверху: граница интервала гистограммы (мс)"""
+        rank = share * self.count
+        seen = 0
+        for position, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                if position < len(HISTOGRAM_BOUNDS):
+                    return min(HISTOGRAM_BOUNDS[position], self.max)
+                return self.max
+        return 0.0
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': self.max,
+            'queries': self.queries,
+            'histogram': list(self.buckets),
+        }
+
+
+_lock = threading.Lock()
+_metrics = {}
+_counters = {}
+# Незавершенные замеры текущего потока: [имя, количество запросов]
+_local = threading.local()
+
+_log = logging.getLogger('store.metrics')
+_log.propagate = False
+_log_dir = None
+
+_profiler = None
+_captures = {}
+
+
+def _active():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+@contextmanager
+def measure(name):
+    """Замер длительности и количества SQL-запросов блока with"""
+    entry = [name, 0]
+    stack = _active()
+    stack.append(entry)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        stack.pop()
+        record(name, ms, entry[1])
+
+
+def timed(name):
+    """Декоратор: замер каждого вызова функции под именем name"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(name, ms, queries=0):
+    """Учет одного вызова операции name длительностью ms"""
+    with _lock:
+        metric = _metrics.get(name)
+        if metric is None:
+            metric = _metrics[name] = Metric(name)
+        metric.add(ms, queries)
+    if _log.handlers:
+        _log.info(json.dumps({
+            'time': datetime.now().isoformat(timespec='milliseconds'),
+            'name': name,
+            'ms': round(ms, 3),
+            'queries': queries,
+            'thread': threading.current_thread().name,
+        }, ensure_ascii=False))
+
+
+def count(name, n=1):
+    """Увеличение счетчика name"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def watch_connection(conn):
+    """Подсчет SQL-запросов соединения (sqlite3 set_trace_callback)
+
+    Учитывается каждое выполнение оператора, в том числе каждая строка
+    executemany и операторы триггеров; служебные запросы SQLite к теневым
+    таблицам (текст начинается с "--") не учитываются.
+    """
+    conn.set_trace_callback(_on_query)
+
+
+def _on_query(sql):
+    if sql.startswith('--'):
+        return
+    count(SQL_QUERIES)
+    # Запрос относится ко всем вложенным замерам потока
+    for entry in getattr(_local, 'stack', ()):
+        entry[1] += 1
+
+
+def snapshot():
+    """Сводка по операциям (по имени) и значения счетчиков"""
+    with _lock:
+        metrics = [metric.summary() for metric in _metrics.values()]
+        counters = dict(_counters)
+    return sorted(metrics, key=lambda item: item['name']), counters
+
+
+def reset():
+    """Сброс накопленной статистики"""
+    with _lock:
+        _metrics.clear()
+        _counters.clear()
+
+
+def set_log_dir(path):
+    """Запись замеров в журнал LOG_NAME с ротацией в директории path"""
+    global _log_dir
+    _log_dir = path
+    for handler in list(_log.handlers):
+        _log.removeHandler(handler)
+        handler.close()
+    handler = RotatingFileHandler(os.path.join(path, LOG_NAME), maxBytes=LOG_MAX_BYTES,
+                                  backupCount=LOG_BACKUPS, encoding='utf-8')
+    _log.addHandler(handler)
+    _log.setLevel(logging.INFO)
+
+
+def is_capturing(kind):
+    """Включено ли профилирование вида kind"""
+    return kind in _captures
+
+
+def start_capture(kind):
+    """Включение профилирования cProfile или трассировки памяти tracemalloc
+
+    cProfile учитывает только вызовы в потоке, из которого включен (GUI-поток).
+    """
+    global _profiler
+    if kind in _captures:
+        return
+    if kind == CPROFILE:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    elif kind == TRACEMALLOC:
+        tracemalloc.start(10)
+    else:
+        raise ValueError(f"Неизвестный вид профилирования: {kind}")
+    _captures[kind] = datetime.now()
+
+
+def stop_capture(kind):
+    """Выключение профилирования; возвращает (текст отчета, путь к файлу или None)"""
+    global _profiler
+    started = _captures.pop(kind, None)
+    if started is None:
+        return '', None
+    stamp = started.strftime('%Y%m%d-%H%M%S')
+
+    if kind == CPROFILE:
+        profiler, _profiler = _profiler, None
+        profiler.disable()
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(REPORT_LINES)
+        path = None
+        if _log_dir:
+            path = os.path.join(_log_dir, f'profile-{stamp}.prof')
+            profiler.dump_stats(path)
+        return text.getvalue(), path
+
+    memory = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lines = [f"Память: {current / 1024 / 1024:.1f} МБ, пик {peak / 1024 / 1024:.1f} МБ", '']
+    lines += [str(stat) for stat in memory.statistics('lineno')[:REPORT_LINES]]
+    path = None
+    if _log_dir:
+        path = os.path.join(_log_dir, f'memory-{stamp}.tracemalloc')
+        memory.dump(path)
+    return '\n'.join(lines), path
+
+
+def traced_memory():
+    """Текущий и пиковый объем памяти (байт) под трассировкой tracemalloc"""
+    if TRACEMALLOC not in _captures:
+        return None
+    return tracemalloc.get_traced_memory()
+
+
+def start_from_env():
+    """Профилирование по переменной окружения STORE_PROFILE до завершения программы"""
+    kinds = [kind.strip().lower() for kind in os.environ.get(PROFILE_ENV, '').split(',')]
+    kinds = [kind for kind in kinds if kind in (CPROFILE, TRACEMALLOC)]
+    for kind in kinds:
+        start_capture(kind)
+    if kinds:
+        atexit.register(_stop_all)
+
+
+def _stop_all():
+    for kind in list(_captures):
+        stop_capture(kind)
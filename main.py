@@ -1,58 +1,50 @@
+import multiprocessing
 import sys
-import os
+import sqlite3
+import startup_trace
+import instrumentation
+from PySide6.QtCore import QThreadPool
 from PySide6.QtWidgets import QApplication
-from PySide6.QtSql import QSqlDatabase, QSqlQuery
+from database import Database, get_app_dir
 from main_window import MainWindow
+startup_trace.mark("импорт модулей")
 
-def get_app_dir():
-    """Получаем директорию приложения"""
-    if getattr(sys, 'frozen', False):
-        # Если приложение собрано
-        return os.path.dirname(sys.executable)
-    return os.path.dirname(os.path.abspath(__file__))
+# Ожидание фоновых задач, отмененных при закрытии окна (мс)
+JOBS_WAIT_TIMEOUT = 5000
 
 def setup_database():
-    db = QSqlDatabase.addDatabase('QSQLITE')
-    
-    # Путь к базе данных в директории приложения
-    db_path = os.path.join(get_app_dir(), 'app_data.db')
-    db.setDatabaseName(db_path)
-    
-    # Проверяем, нужно ли создавать новую базу данных
-    is_new_db = not os.path.exists(db_path)
-    
-    if not db.open():
-        print("Ошибка: Не удалось открыть базу данных")
-        return False
-        
-    if is_new_db:
-        # Создаем таблицы для новой базы данных
-        query = QSqlQuery()
-        if not query.exec("""
-            CREATE TABLE products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL
-            )
-        """):
-            print("Ошибка: Не удалось создать таблицу products")
-            return False
-            
-        # Добавляем начальные данные
-        if not query.exec("INSERT INTO products (name, price) VALUES ('Пример продукта', 100.0)"):
-            print("Ошибка: Не удалось добавить начальные данные")
-            
-    return True
+    """Открытие базы данных магазина в директории приложения"""
+    try:
+        return Database()
+    except sqlite3.Error as e:
+        print(f"Ошибка: Не удалось открыть базу данных: {e}")
+        return None
 
 def main():
+    startup_trace.set_log_dir(get_app_dir())
+    instrumentation.set_log_dir(get_app_dir())
+    instrumentation.start_from_env()
     app = QApplication(sys.argv)
+    startup_trace.mark("создание QApplication")
     
-    if not setup_database():
+    database = setup_database()
+    if database is None:
         sys.exit(1)
+    startup_trace.mark("настройка базы данных")
         
-    window = MainWindow()
+    window = MainWindow(database)
+    startup_trace.mark("создание главного окна")
+    startup_trace.watch_first_paint(window.table.viewport(), "первая отрисовка таблицы продуктов")
     window.show()
-    sys.exit(app.exec())
+    code = app.exec()
+    
+    # Соединения закрываются после фоновых задач; при закрытии соединения
+    # записи обновляется статистика планировщика (PRAGMA optimize)
+    QThreadPool.globalInstance().waitForDone(JOBS_WAIT_TIMEOUT)
+    database.close()
+    sys.exit(code)
 
 if __name__ == "__main__":
+    # Процессы пула прогноза спроса (demand.py) в собранном приложении
+    multiprocessing.freeze_support()
     main()
@@ -1,22 +1,45 @@
+import time
+from datetime import datetime, timedelta
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
-    QPushButton, QTableWidget, QTableWidgetItem,
+    QPushButton, QTableView, QAbstractItemView,
     QLabel, QGridLayout, QMessageBox, QDialog,
-    QHeaderView, QTabWidget, QScrollArea
+    QHeaderView, QTabWidget, QScrollArea, QLineEdit,
+    QFileDialog, QProgressDialog, QComboBox
 )
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QColor
+from PySide6.QtCore import Qt, QThreadPool, QTimer
+from PySide6.QtGui import QColor, QAction, QKeySequence, QUndoStack
 from PySide6.QtGui import QFont
-import sqlite3
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
-import numpy as np
+from analytics import FORECAST_HORIZON, STOCK_TOP_N, STOCK_BY_PRODUCT, STOCK_BY_PACKAGE
+from workers import (
+    AnalyticsWorker, SearchWorker, SnapshotWorker, ImportWorker, ExportWorker, ForecastWorker,
+    MaintenanceWorker, EXPORT_PRODUCTS, EXPORT_INCOME
+)
+from search import SEARCH_LIMIT
+from product_model import ProductTableModel
+from discount_schedule import DiscountSchedule
+from maintenance import TASK_CHECK
+from database import Database
+from products import PRODUCT_INSERTED, PRODUCT_UPDATED, PRODUCT_DELETED, ConflictError
+from service import StoreService, NotFoundError, ValidationError
+from sync import PATCH_LIMIT, ChangeWatcher, current_seq
+import analytics_cache
+import startup_trace
+import instrumentation
+from instrumentation import timed, CPROFILE, TRACEMALLOC
+
+# Количество групповых операций, которые можно отменить
+UNDO_LIMIT = 20
+
+# Обслуживание базы данных запускается, если продукты не менялись столько
+# секунд; простой проверяется раз в MAINTENANCE_CHECK_INTERVAL мс
+MAINTENANCE_IDLE_SECONDS = 120
+MAINTENANCE_CHECK_INTERVAL = 60 * 1000
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, database=None):
         super().__init__()
+        self.database = database
         
         # Настройки главного окна
         self.setWindowTitle("Продуктовый магазин")
@@ -26,6 +49,56 @@ class MainWindow(QMainWindow):
         self.tabs = QTabWidget()
         self.setCentralWidget(self.tabs)
         
+        # Графики перестраиваются только при открытии вкладки "Аналитика"
+        self.charts_dirty = True
+        # Графики и matplotlib создаются при первом открытии вкладки "Аналитика"
+        self.charts_ready = False
+        
+        # Текущая фоновая задача расчета аналитики
+        self.analytics_job = None
+        self.analytics_job_id = 0
+        self.analytics_started = None
+        # Группировка графика распределения запасов
+        self.stock_group = STOCK_BY_PRODUCT
+        # Файл кэша данных графиков (analytics_cache.py); графики еще не
+        # строились после запуска
+        self.analytics_cache = None
+        self.charts_drawn = False
+        
+        # Снимок каталога для графиков (catalog_snapshot.py) загружается в фоне;
+        # до загрузки графики считаются запросами. snapshot_pending - id
+        # продуктов, измененных во время загрузки (None, если она завершена)
+        self.snapshot = None
+        self.snapshot_pending = None
+        self.snapshot_job_id = 0
+        
+        # Последний запрос поиска (результаты прежних отбрасываются)
+        self.search_job = None
+        self.search_job_id = 0
+        
+        # Текущий импорт продуктов из файла
+        self.import_job = None
+        self.import_job_id = 0
+        self.import_progress = None
+        
+        # Текущий расчет прогноза спроса и окно "Дозаказ"
+        self.forecast_job = None
+        self.forecast_job_id = 0
+        self.forecast_progress = None
+        self.reorder_dialog = None
+        
+        # Текущая выгрузка данных в файл
+        self.export_job = None
+        self.export_job_id = 0
+        self.export_progress = None
+        
+        # Текущее обслуживание базы данных, окно его состояния и время
+        # последнего изменения продуктов (обслуживание выполняется в простое)
+        self.maintenance_job = None
+        self.maintenance_job_id = 0
+        self.maintenance_dialog = None
+        self.last_activity = time.monotonic()
+        
         # Подключаем обработчик переключения вкладок
         self.tabs.currentChanged.connect(self.on_tab_changed)
         
@@ -53,26 +126,91 @@ class MainWindow(QMainWindow):
         
     def init_ui(self):
         """Инициализация пользовательского интерфейса"""
+        # Меню
+        file_menu = self.menuBar().addMenu("Файл")
+        self.import_action = file_menu.addAction("Импорт продуктов...")
+        self.import_action.triggered.connect(self.import_products)
+        file_menu.addSeparator()
+        self.export_products_action = file_menu.addAction("Экспорт продуктов...")
+        self.export_products_action.triggered.connect(lambda: self.export_data(EXPORT_PRODUCTS))
+        self.export_income_action = file_menu.addAction("Экспорт дохода и прогноза...")
+        self.export_income_action.triggered.connect(lambda: self.export_data(EXPORT_INCOME))
+        file_menu.addSeparator()
+        self.maintenance_action = file_menu.addAction("Обслуживание базы данных...")
+        self.maintenance_action.triggered.connect(self.show_maintenance)
+        
+        # Отмена и повтор групповых операций с выбранными продуктами
+        self.undo_stack = QUndoStack(self)
+        self.undo_stack.setUndoLimit(UNDO_LIMIT)
+        edit_menu = self.menuBar().addMenu("Правка")
+        self.undo_action = self.undo_stack.createUndoAction(self, "Отменить")
+        self.undo_action.setShortcut(QKeySequence.Undo)
+        self.redo_action = self.undo_stack.createRedoAction(self, "Повторить")
+        self.redo_action.setShortcut(QKeySequence.Redo)
+        edit_menu.addAction(self.undo_action)
+        edit_menu.addAction(self.redo_action)
+        
+        # Скрытая вкладка и меню "Диагностика" открываются по Ctrl+Shift+D
+        self.diagnostics_tab = None
+        self.diagnostics_action = QAction("Панель диагностики", self)
+        self.diagnostics_action.setShortcut(QKeySequence("Ctrl+Shift+D"))
+        self.diagnostics_action.triggered.connect(self.toggle_diagnostics)
+        self.addAction(self.diagnostics_action)
+        self.diagnostics_menu = self.menuBar().addMenu("Диагностика")
+        self.diagnostics_menu.addAction(self.diagnostics_action)
+        self.diagnostics_menu.addSeparator()
+        self.capture_actions = {}
+        for kind, text in ((CPROFILE, "Профилирование (cProfile)"),
+                           (TRACEMALLOC, "Трассировка памяти (tracemalloc)")):
+            action = self.diagnostics_menu.addAction(text)
+            action.setCheckable(True)
+            action.setChecked(instrumentation.is_capturing(kind))
+            action.toggled.connect(lambda checked, kind=kind: self.toggle_capture(kind, checked))
+            self.capture_actions[kind] = action
+        self.diagnostics_menu.menuAction().setVisible(False)
+        
         # Заголовок
         title = QLabel("Управление продуктами")
         title.setFont(QFont("Arial", 16))
         title.setAlignment(Qt.AlignCenter)
         self.main_layout.addWidget(title, 0, 0, 1, 2)
         
-        # Таблица продуктов
-        self.table = QTableWidget()
-        self.table.setColumnCount(9)
-        self.table.setHorizontalHeaderLabels([
-            "Код", "Название", "Упаковка", "Дата поступления",
-            "Срок хранения", "Объем закупки", "Объем продажи", "Цена", "Скидка"
-        ])
-        self.table.setSortingEnabled(True)
+        # Поиск по мере ввода
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Поиск по названию или упаковке")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.on_search_text_changed)
+        self.main_layout.addWidget(self.search_input, 1, 0, 1, 2)
+        
+        # Запрос отправляется после паузы в наборе текста
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_search)
+        
+        # Скидки и сроки хранения меняются только в начале суток
+        self.discount_timer = QTimer(self)
+        self.discount_timer.setSingleShot(True)
+        self.discount_timer.timeout.connect(self.on_discount_timer)
+        
+        # Обслуживание базы данных выполняется по расписанию во время простоя
+        self.maintenance_timer = QTimer(self)
+        self.maintenance_timer.setInterval(MAINTENANCE_CHECK_INTERVAL)
+        self.maintenance_timer.timeout.connect(self.on_maintenance_timer)
+        
+        # Таблица продуктов (модель подключается после открытия базы данных)
+        self.table = QTableView()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # Несколько строк выбираются с Ctrl и Shift для групповой правки и удаления
+        self.table.setSelectionMode(QAbstractItemView.ExtendedSelection)
         
         # Настройка таблицы
         self.table.horizontalHeader().setDefaultAlignment(Qt.AlignCenter)
         self.table.horizontalHeader().setStretchLastSection(True)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.main_layout.addWidget(self.table, 1, 0, 1, 2)
+        # Фиксированная высота строк: представление не измеряет каждую строку
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.main_layout.addWidget(self.table, 2, 0, 1, 2)
         
         # Панель управления
         control_panel = QHBoxLayout()
@@ -89,17 +227,35 @@ class MainWindow(QMainWindow):
         self.search_btn = QPushButton("Поиск")
         self.search_btn.clicked.connect(self.search_product)
         
+        self.reorder_btn = QPushButton("Дозаказ")
+        self.reorder_btn.clicked.connect(self.show_reorder)
+        
         control_panel.addWidget(self.add_btn)
         control_panel.addWidget(self.edit_btn)
         control_panel.addWidget(self.delete_btn)
         control_panel.addWidget(self.search_btn)
+        control_panel.addWidget(self.reorder_btn)
         
-        self.main_layout.addLayout(control_panel, 2, 0, 1, 2)
+        self.main_layout.addLayout(control_panel, 3, 0, 1, 2)
         
         # Кнопка "Показать все"
         self.show_all_btn = QPushButton("Показать все")
         self.show_all_btn.clicked.connect(self.show_all_products)
-        self.main_layout.addWidget(self.show_all_btn, 3, 0, 1, 2)
+        self.main_layout.addWidget(self.show_all_btn, 4, 0, 1, 2)
+        
+        # Индикатор фонового обновления графиков
+        self.analytics_status = QLabel("Обновление данных...")
+        self.analytics_status.setAlignment(Qt.AlignCenter)
+        self.analytics_status.hide()
+        self.analytics_layout.addWidget(self.analytics_status)
+        
+    def init_analytics_ui(self):
+        """Создание графиков вкладки "Аналитика" при первом открытии"""
+        # matplotlib загружается только здесь, чтобы не замедлять запуск
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from charts import IncomeChart, TopProductsChart, StockChart, STOCK_PIE, STOCK_BAR
+        startup_trace.mark("импорт matplotlib")
         
         # Контейнеры для графиков
         self.chart_container = QWidget()
@@ -123,7 +279,7 @@ class MainWindow(QMainWindow):
         self.analytics_layout.addWidget(scroll)
         
         # График тренда дохода
-        self.figure1 = plt.Figure(facecolor='#3A3A3A')
+        self.figure1 = Figure(facecolor='#3A3A3A')
         self.figure1.patch.set_alpha(0.0)
         self.canvas1 = FigureCanvas(self.figure1)
         self.canvas1.setMinimumSize(600, 400)
@@ -136,13 +292,12 @@ class MainWindow(QMainWindow):
             color: white;
         """)
         
-        # Добавляем заголовок
-        ax1 = self.figure1.add_subplot(111)
-        ax1.set_title("Тренд дохода по месяцам", color='white', pad=20)
+        # Оси и элементы графика создаются один раз
+        self.income_chart = IncomeChart(self.figure1)
         self.chart_layout.addWidget(self.canvas1)
         
         # График топ продаж
-        self.figure2 = plt.Figure(facecolor='#3A3A3A')
+        self.figure2 = Figure(facecolor='#3A3A3A')
         self.figure2.patch.set_alpha(0.0)
         self.canvas2 = FigureCanvas(self.figure2)
         self.canvas2.setMinimumSize(600, 400)
@@ -155,13 +310,12 @@ class MainWindow(QMainWindow):
             color: white;
         """)
         
-        # Добавляем заголовок
-        ax2 = self.figure2.add_subplot(111)
-        ax2.set_title("Топ 5 продаваемых продуктов", color='white', pad=20)
+        # Оси и элементы графика создаются один раз
+        self.top_chart = TopProductsChart(self.figure2)
         self.chart_layout.addWidget(self.canvas2)
         
         # Круговая диаграмма распределения запасов
-        self.figure3 = plt.Figure(facecolor='#3A3A3A')
+        self.figure3 = Figure(facecolor='#3A3A3A')
         self.figure3.patch.set_alpha(0.0)
         self.canvas3 = FigureCanvas(self.figure3)
         self.canvas3.setMinimumSize(600, 400)
@@ -174,89 +328,278 @@ class MainWindow(QMainWindow):
             color: white;
         """)
         
-        # Добавляем заголовок
-        ax3 = self.figure3.add_subplot(111)
-        ax3.set_title("Распределение запасов", color='white', pad=20)
+        # Оси и элементы графика создаются один раз: крупнейшие позиции и "Прочее"
+        self.stock_chart = StockChart(self.figure3, STOCK_TOP_N)
+        
+        # Настройки графика запасов
+        stock_controls = QHBoxLayout()
+        self.stock_group_box = QComboBox()
+        self.stock_group_box.addItem("По продуктам", STOCK_BY_PRODUCT)
+        self.stock_group_box.addItem("По упаковке", STOCK_BY_PACKAGE)
+        self.stock_group_box.currentIndexChanged.connect(self.on_stock_group_changed)
+        self.stock_mode_box = QComboBox()
+        self.stock_mode_box.addItem("Круговая диаграмма", STOCK_PIE)
+        self.stock_mode_box.addItem("Столбцы", STOCK_BAR)
+        self.stock_mode_box.currentIndexChanged.connect(self.on_stock_mode_changed)
+        self.stock_details_btn = QPushButton("Остальные позиции...")
+        self.stock_details_btn.clicked.connect(self.show_stock_details)
+        stock_controls.addWidget(QLabel("Запасы:"))
+        stock_controls.addWidget(self.stock_group_box)
+        stock_controls.addWidget(self.stock_mode_box)
+        stock_controls.addStretch()
+        stock_controls.addWidget(self.stock_details_btn)
+        self.chart_layout.addLayout(stock_controls)
         self.chart_layout.addWidget(self.canvas3)
         
         # Настройка растяжения
         self.analytics_layout.setContentsMargins(0, 0, 0, 0)
         self.analytics_layout.setSpacing(0)
         
+        # Замер отрисовки каждого холста matplotlib
+        for name, canvas in (('income', self.canvas1), ('top', self.canvas2), ('stock', self.canvas3)):
+            canvas.draw = timed(f'render_chart.{name}')(canvas.draw)
+        
+        self.charts_ready = True
+        startup_trace.mark("создание графиков")
+        
     def on_tab_changed(self, index):
         """Обработчик переключения вкладок"""
         # Если переключились на вкладку "Аналитика" (индекс 1)
-        if index == 1:
-            # Обновляем данные таблицы и графики
-            self.update_table()
+        if index == 1 and not self.charts_ready:
+            self.init_analytics_ui()
+        if index == 1 and self.charts_dirty:
+            # Перестраиваем графики только если данные изменились
             self.update_charts()
-            # Принудительно обновляем отображение графиков
-            for canvas in [self.canvas1, self.canvas2, self.canvas3]:
-                canvas.draw()
+        
+    def closeEvent(self, event):
+        """Отмена фоновых задач при закрытии окна"""
+        if self.analytics_job is not None:
+            self.analytics_job.cancel()
+        if self.import_job is not None:
+            self.import_job.cancel()
+        if self.export_job is not None:
+            self.export_job.cancel()
+        if self.forecast_job is not None:
+            self.forecast_job.cancel()
+        if self.maintenance_job is not None:
+            self.maintenance_job.cancel()
+        super().closeEvent(event)
+        
+    def toggle_diagnostics(self):
+        """Показ или скрытие вкладки "Диагностика" """
+        from diagnostics_tab import DiagnosticsTab
+        
+        if self.diagnostics_tab is None:
+            self.diagnostics_tab = DiagnosticsTab()
+        index = self.tabs.indexOf(self.diagnostics_tab)
+        if index == -1:
+            self.tabs.setCurrentIndex(self.tabs.addTab(self.diagnostics_tab, "Диагностика"))
+            self.diagnostics_menu.menuAction().setVisible(True)
+        else:
+            self.tabs.removeTab(index)
+            self.diagnostics_menu.menuAction().setVisible(False)
+            
+    def toggle_capture(self, kind, enabled):
+        """Включение и выключение профилирования из меню "Диагностика" """
+        if enabled:
+            instrumentation.start_capture(kind)
+            self.statusBar().showMessage(f"{self.capture_actions[kind].text()}: включено")
+            return
+        text, path = instrumentation.stop_capture(kind)
+        self.statusBar().showMessage(f"{self.capture_actions[kind].text()}: выключено")
+        if self.diagnostics_tab is not None:
+            self.diagnostics_tab.show_report(self.capture_actions[kind].text(), text, path)
         
     def show_all_products(self):
         """Показать все продукты"""
+        # Очистка поля поиска не должна запускать повторный поиск
+        self.search_input.blockSignals(True)
+        self.search_input.clear()
+        self.search_input.blockSignals(False)
+        self.search_timer.stop()
+        self.search_job_id += 1
+        self.statusBar().clearMessage()
         self.update_table()
         
+    @timed('db_connect')
     def db_connect(self):
         """Подключение к базе данных"""
-        self.conn = sqlite3.connect('store.db')
+        # Соединение для записи; фоновые задачи читают через пул database.reader().
+        # Схема базы данных обновляется при открытии
+        if self.database is None:
+            self.database = Database()
+        self.conn = self.database.conn
         self.cursor = self.conn.cursor()
         
-        # Создание таблицы, если она не существует
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                package TEXT,
-                receipt_date TEXT,
-                storage_days INTEGER,
-                purchase_volume REAL,
-                sales_volume REAL,
-                price REAL
-            )
-        ''')
-        self.conn.commit()
-        # Первое обновление таблицы и графиков после подключения к БД
+        # Операции с продуктами и аналитика без интерфейса (общие с HTTP API);
+        # все изменения продуктов проходят через репозиторий сервиса
+        self.service = StoreService(self.database, self.conn)
+        self.products = self.service.products
+        self.products.subscribe(self.on_product_changed)
+        self.products.subscribe_many(self.on_products_changed)
+        
+        # Изменения, сделанные другими рабочими местами с той же базой данных,
+        # читаются из журнала изменений и применяются построчно; старые записи
+        # журнала удаляет обслуживание (maintenance.TASK_PRUNE)
+        self.analytics_cache = analytics_cache.cache_path(self.database.path)
+        self.sync = ChangeWatcher(self.conn, self.database.path, self)
+        self.sync.changed.connect(self.on_remote_changes)
+        
+        # Скидки рассчитываются один раз и далее обновляются по расписанию
+        self.discount_schedule = DiscountSchedule()
+        self.discount_schedule.build(self.cursor)
+        
+        # Снимок каталога для графиков загружается один раз и далее
+        # обновляется только для измененных продуктов
+        self.load_snapshot()
+        
+        # Модель таблицы загружает строки постранично по мере прокрутки
+        self.model = ProductTableModel(self.conn, self)
+        self.model.set_discounts(self.discount_schedule.discounts)
+        self.model.set_expired(self.discount_schedule.expired)
+        self.table.setModel(self.model)
+        # Сортировка по клику на заголовок выполняется моделью через ORDER BY
+        self.table.setSortingEnabled(True)
+        self.table.horizontalHeader().setSortIndicator(0, Qt.AscendingOrder)
+        
+        # Первое обновление таблицы после подключения к БД;
+        # графики строятся при первом открытии вкладки "Аналитика"
         self.update_table()
-        self.update_charts()
+        self.start_discount_timer()
+        self.maintenance_timer.start()
+        if self.discount_schedule.expired:
+            self.statusBar().showMessage(
+                f"Продуктов с истекшим сроком хранения: {len(self.discount_schedule.expired)}"
+            )
         
+    @timed('update_table')
     def update_table(self):
         """Обновление данных в таблице"""
-        self.table.setRowCount(0)
-        self.cursor.execute("SELECT * FROM products")
-        rows = self.cursor.fetchall()
+        # Скидки берутся из расписания (self.discount_schedule) без пересчета
+        self.model.set_filter()
+        self.model.refresh()
+        
+    def start_discount_timer(self):
+        """Запуск таймера до начала следующих суток"""
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        # Секунда запаса, чтобы date.today() уже вернул новую дату
+        self.discount_timer.start(int((midnight - now).total_seconds() * 1000) + 1000)
+        
+    def on_discount_timer(self):
+        """Обновление скидок и сроков хранения, изменившихся с начала суток"""
+        changed, expired = self.discount_schedule.advance(self.cursor)
+        self.model.products_changed(changed | expired)
+        if expired:
+            names = [self.products.get(product_id)['name'] for product_id in sorted(expired)[:5]]
+            more = f" и еще {len(expired) - len(names)}" if len(expired) > len(names) else ""
+            self.statusBar().showMessage(f"Истек срок хранения: {', '.join(names)}{more}")
+        self.start_discount_timer()
         
-        for row in rows:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
+    @timed('on_product_changed')
+    def on_product_changed(self, change, product_id, old_row):
+        """Обновление только затронутой строки после изменения продукта"""
+        # Это изменение не нужно повторно применять при чтении журнала изменений
+        self.sync.local_change(self.products.last_changes)
+        self.note_activity()
+        
+        # Скидка и дата ее следующего изменения пересчитываются для одного продукта
+        self.discount_schedule.product_changed(self.cursor, product_id)
+        self.update_snapshot([product_id])
+        
+        if change == PRODUCT_INSERTED:
+            self.model.product_inserted(product_id)
+        elif change == PRODUCT_UPDATED:
+            self.model.product_updated(product_id, old_row)
+        elif change == PRODUCT_DELETED:
+            self.model.product_deleted(product_id, old_row)
+        
+        # Графики будут перестроены при открытии вкладки "Аналитика"
+        self.charts_dirty = True
+        if self.tabs.currentIndex() == 1:
+            self.on_tab_changed(1)
             
-            # Get discount info if applicable
-            discounted = next((p for p in self.calculate_discounts() if p['id'] == row[0]), None)
+    @timed('on_products_changed')
+    def on_products_changed(self, changes):
+        """Обновление затронутых строк после групповой операции"""
+        self.sync.local_change(self.products.last_changes)
+        self.note_activity()
+        self.apply_product_changes(changes)
+        
+    @timed('on_remote_changes')
+    def on_remote_changes(self, changes):
+        """Применение изменений продуктов, сделанных на других рабочих местах"""
+        self.note_activity()
+        if changes is None:
+            # Изменений слишком много: скидки и таблица пересчитываются целиком
+            self.discount_schedule.build(self.cursor)
+            self.load_snapshot()
+            self.model.refresh()
+            self.charts_dirty = True
+            if self.tabs.currentIndex() == 1:
+                self.on_tab_changed(1)
+        else:
+            self.apply_product_changes(changes)
             
-            for col in range(len(row)):
-                value = row[col]
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                item.setTextAlignment(Qt.AlignCenter)
-                
-                # Apply discount to price column
-                if col == 7 and discounted:
-                    item.setText(f"{discounted['discounted_price']:.2f} ₽")
-                    item.setBackground(Qt.yellow)
-                    item.setToolTip(f"Скидка {discounted['discount_percent']}% (было {discounted['original_price']} ₽)")
-                
-                self.table.setItem(row_position, col, item)
+    def apply_product_changes(self, changes):
+        """Пересчет скидок и строк таблицы для списка изменений продуктов"""
+        ids = [product_id for _, product_id, _ in changes]
+        self.discount_schedule.products_changed(self.cursor, ids)
+        self.update_snapshot(ids)
+        if len(changes) > PATCH_LIMIT:
+            # Перечитать таблицу быстрее, чем обновлять строки по одной
+            self.model.refresh()
+        else:
+            self.model.apply_changes(changes)
+        
+        self.charts_dirty = True
+        if self.tabs.currentIndex() == 1:
+            self.on_tab_changed(1)
             
-            # Add discount percentage
-            if discounted:
-                discount_item = QTableWidgetItem(f"{discounted['discount_percent']}%")
-                discount_item.setBackground(Qt.yellow)
-            else:
-                discount_item = QTableWidgetItem("0%")
-            discount_item.setFlags(discount_item.flags() ^ Qt.ItemIsEditable)
-            discount_item.setTextAlignment(Qt.AlignCenter)
-            self.table.setItem(row_position, 8, discount_item)
+    def load_snapshot(self):
+        """Фоновая загрузка снимка каталога"""
+        self.snapshot = None
+        self.snapshot_pending = set()
+        self.snapshot_job_id += 1
+        job = SnapshotWorker(self.snapshot_job_id, self.database)
+        job.signals.finished.connect(self.on_snapshot_ready)
+        job.signals.failed.connect(self.on_snapshot_failed)
+        QThreadPool.globalInstance().start(job)
+        
+    def update_snapshot(self, ids):
+        """Обновление снимка каталога для измененных продуктов ids"""
+        if self.snapshot_pending is not None:
+            # Снимок еще загружается и мог прочитать прежние строки
+            self.snapshot_pending.update(ids)
+        elif self.snapshot is not None:
+            self.snapshot.update(self.cursor, ids)
+            
+    def on_snapshot_ready(self, job_id, snapshot):
+        """Снимок каталога загружен: применение изменений, сделанных за время загрузки"""
+        if job_id != self.snapshot_job_id:
+            return
+        snapshot.update(self.cursor, self.snapshot_pending)
+        self.snapshot = snapshot
+        self.snapshot_pending = None
+        
+    def on_snapshot_failed(self, job_id, message):
+        """Ошибка загрузки снимка: графики по-прежнему считаются запросами"""
+        if job_id == self.snapshot_job_id:
+            self.snapshot_pending = None
+            self.statusBar().showMessage(f"Ошибка загрузки данных для графиков: {message}")
+            
+    def selected_ids(self):
+        """id продуктов в выбранных строках таблицы"""
+        rows = sorted(index.row() for index in self.table.selectionModel().selectedRows())
+        ids = [self.model.product_id(row) for row in rows]
+        return [product_id for product_id in ids if product_id is not None]
+        
+    def report_bulk(self, text, done, requested):
+        """Итог групповой операции в строке состояния"""
+        message = f"{text}. Продуктов: {done}"
+        if done < requested:
+            message += f", пропущено: {requested - done} (изменены или удалены на другом рабочем месте)"
+        self.statusBar().showMessage(message)
                 
     def add_product(self):
         """Добавление нового продукта"""
@@ -264,23 +607,7 @@ class MainWindow(QMainWindow):
         
         dialog = ProductDialog(self)
         if dialog.exec() == QDialog.Accepted:
-            data = dialog.get_data()
-            
-            self.cursor.execute('''
-                INSERT INTO products (
-                    name, package, receipt_date, 
-                    storage_days, purchase_volume, 
-                    sales_volume, price
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['name'], data['package'], data['receipt_date'],
-                data['storage_days'], data['purchase_volume'],
-                data['sales_volume'], data['price']
-            ))
-            self.conn.commit()
-            # Обновляем таблицу и графики
-            self.update_table()
-            self.update_charts()
+            self.service.add_product(dialog.get_data())
             
             # Показываем сообщение об успешном добавлении
             QMessageBox.information(self, "Успех", "Продукт успешно добавлен.")
@@ -289,65 +616,110 @@ class MainWindow(QMainWindow):
         """Редактирование продукта"""
         from product_dialog import ProductDialog
         
-        selected = self.table.currentRow()
-        if selected == -1:
+        ids = self.selected_ids()
+        if len(ids) > 1:
+            self.bulk_edit(ids)
+            return
+        
+        selected = self.table.currentIndex()
+        if not selected.isValid():
             QMessageBox.warning(self, "Ошибка", "Выберите продукт для редактирования")
             return
             
-        product_id = self.table.item(selected, 0).text()
+        product_id = self.model.product_id(selected.row())
         
-        self.cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        product = self.cursor.fetchone()
+        data = self.products.get(product_id)
         
-        if not product:
+        if not data:
             QMessageBox.warning(self, "Ошибка", "Продукт не найден")
             return
             
-        data = {
-            'name': product[1],
-            'package': product[2],
-            'receipt_date': product[3],
-            'storage_days': product[4],
-            'purchase_volume': product[5],
-            'sales_volume': product[6],
-            'price': product[7]
-        }
-        
         dialog = ProductDialog(self, data)
         if dialog.exec() == QDialog.Accepted:
-            new_data = dialog.get_data()
-            
-            self.cursor.execute('''
-                UPDATE products SET
-                    name = ?,
-                    package = ?,
-                    receipt_date = ?,
-                    storage_days = ?,
-                    purchase_volume = ?,
-                    sales_volume = ?,
-                    price = ?
-                WHERE id = ?
-            ''', (
-                new_data['name'], new_data['package'], new_data['receipt_date'],
-                new_data['storage_days'], new_data['purchase_volume'],
-                new_data['sales_volume'], new_data['price'], product_id
-            ))
-            self.conn.commit()
-            # Обновляем таблицу с пересчетом скидок
-            self.update_table()
-            self.update_charts()
-            
+            # Изменение не должно затереть правку, сделанную на другом рабочем
+            # месте, пока была открыта форма
+            try:
+                self.service.update_product(product_id, dialog.get_data(), data['row_version'])
+            except NotFoundError:
+                QMessageBox.warning(self, "Ошибка", "Продукт удален на другом рабочем месте")
+                return
+            except ConflictError:
+                confirm = QMessageBox.question(
+                    self,
+                    "Продукт изменен",
+                    "Пока форма была открыта, продукт изменили на другом рабочем месте.\n"
+                    "Сохранить ваши данные вместо этих изменений?",
+                    QMessageBox.Yes | QMessageBox.No
+                )
+                if confirm != QMessageBox.Yes:
+                    return
+                try:
+                    self.service.update_product(product_id, dialog.get_data())
+                except NotFoundError:
+                    # Продукт могли удалить, пока был открыт вопрос
+                    QMessageBox.warning(self, "Ошибка", "Продукт удален на другом рабочем месте")
+                    return
+
             # Показываем сообщение об успешном обновлении
             QMessageBox.information(self, "Успех", "Продукт успешно обновлен. Скидки пересчитаны.")
             
+    def bulk_edit(self, ids):
+        """Изменение цены или срока хранения выбранных продуктов одной операцией"""
+        from bulk_edit import (
+            BulkEditDialog, UpdateProductsCommand,
+            CHANGE_PRICE_PERCENT, SET_PRICE
+        )
+        
+        dialog = BulkEditDialog(len(ids), self)
+        if dialog.exec() != QDialog.Accepted:
+            return
+        action, value = dialog.get_action()
+        try:
+            if action == CHANGE_PRICE_PERCENT:
+                field, text = 'price', f"Изменение цены на {value:+g}%"
+                values, versions = self.service.new_prices(ids, percent=value)
+            elif action == SET_PRICE:
+                field, text = 'price', f"Цена {value:.2f} ₽"
+                values, versions = self.service.new_prices(ids, price=value)
+            else:
+                field, text = 'storage_days', f"Срок хранения {value} дн."
+                values, versions = self.service.new_storage_days(ids, value)
+        except (ValidationError, NotFoundError) as e:
+            QMessageBox.warning(self, "Ошибка", str(e))
+            return
+        self.undo_stack.push(
+            UpdateProductsCommand(self.service, field, values, versions, text, self.report_bulk)
+        )
+        
+    def delete_products(self, ids):
+        """Удаление выбранных продуктов одной операцией (отменяется через "Правка")"""
+        from bulk_edit import DeleteProductsCommand
+        
+        confirm = QMessageBox.question(
+            self,
+            "Подтверждение удаления",
+            f"Удалить выбранные продукты ({len(ids)})?\n"
+            "Удаление можно отменить: \"Правка\" → \"Отменить\".",
+            QMessageBox.Yes | QMessageBox.No
+        )
+        if confirm == QMessageBox.Yes:
+            self.undo_stack.push(
+                DeleteProductsCommand(self.service, ids, "Удаление продуктов", self.report_bulk)
+            )
+            
     def delete_product(self):
         """Удаление продукта"""
-        selected = self.table.currentRow()
-        if selected == -1:
+        ids = self.selected_ids()
+        if len(ids) > 1:
+            self.delete_products(ids)
+            return
+        
+        selected = self.table.currentIndex()
+        if not selected.isValid():
             QMessageBox.warning(self, "Ошибка", "Выберите продукт для удаления")
             return
             
-        product_id = self.table.item(selected, 0).text()
+        product_id = self.model.product_id(selected.row())
         
         confirm = QMessageBox.question(
             self,
@@ -357,198 +729,408 @@ class MainWindow(QMainWindow):
         )
         
         if confirm == QMessageBox.Yes:
-            self.cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-            self.conn.commit()
-            # Обновляем таблицу и графики
-            self.update_table()
-            self.update_charts()
+            try:
+                self.service.delete_product(product_id)
+            except NotFoundError:
+                QMessageBox.warning(self, "Ошибка", "Продукт уже удален на другом рабочем месте")
+                return
             
             # Показываем сообщение об успешном удалении
             QMessageBox.information(self, "Успех", "Продукт успешно удален.")
             
-    def search_product(self):
-        """Поиск продукта"""
-        from PySide6.QtWidgets import QInputDialog
+    def import_products(self):
+        """Импорт продуктов из файла поставки CSV или XLSX"""
+        path, _ = QFileDialog.getOpenFileName(
+            self, "Импорт продуктов", "",
+            "Файлы поставки (*.csv *.xlsx);;CSV (*.csv);;Excel (*.xlsx)"
+        )
+        if not path:
+            return
         
-        name, ok = QInputDialog.getText(
-            self,
-            "Поиск продукта",
-            "Введите название продукта:"
+        self.import_job_id += 1
+        self.import_job = ImportWorker(self.import_job_id, self.database, path)
+        self.import_job.signals.progress.connect(self.on_import_progress)
+        self.import_job.signals.finished.connect(self.on_import_ready)
+        self.import_job.signals.failed.connect(self.on_import_failed)
+        
+        self.import_progress = self.create_progress("Импорт", "Импорт продуктов...", self.import_job)
+        self.import_action.setEnabled(False)
+        QThreadPool.globalInstance().start(self.import_job)
+        
+    def create_progress(self, title, text, job):
+        """Индикатор фоновой задачи с кнопкой отмены"""
+        # Количество строк заранее неизвестно: индикатор без шкалы
+        progress = QProgressDialog(text, "Отмена", 0, 0, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(job.cancel)
+        return progress
+        
+    def on_import_progress(self, job_id, processed):
+        """Отображение количества обработанных строк"""
+        if job_id == self.import_job_id and self.import_progress is not None:
+            self.import_progress.setLabelText(f"Обработано строк: {processed}")
+            
+    def finish_import(self):
+        """Закрытие индикатора импорта"""
+        self.import_job = None
+        self.import_action.setEnabled(True)
+        if self.import_progress is not None:
+            self.import_progress.canceled.disconnect()
+            self.import_progress.close()
+            self.import_progress = None
+            
+    def on_import_ready(self, job_id, result):
+        """Итоги импорта"""
+        if job_id != self.import_job_id:
+            return
+        self.finish_import()
+        
+        # Импортированные продукты читаются из журнала изменений, как изменения
+        # других рабочих мест; при большом импорте таблица перечитывается целиком
+        self.sync.check()
+        
+        message = f"Импортировано продуктов: {result['imported']}."
+        if result['rejected']:
+            message += (
+                f"\nОтклонено строк: {result['rejected']}."
+                f"\nПричины сохранены в файле:\n{result['error_path']}"
+            )
+            QMessageBox.warning(self, "Импорт", message)
+        else:
+            QMessageBox.information(self, "Импорт", message)
+            
+    def on_import_failed(self, job_id, message):
+        """Ошибка или отмена импорта"""
+        if job_id != self.import_job_id:
+            return
+        self.finish_import()
+        QMessageBox.warning(self, "Импорт", message)
+        
+    def export_data(self, kind):
+        """Выгрузка продуктов или дохода с прогнозом в CSV, JSON Lines или Parquet"""
+        if self.export_job is not None:
+            return
+        title = "Экспорт продуктов" if kind == EXPORT_PRODUCTS else "Экспорт дохода и прогноза"
+        path, _ = QFileDialog.getSaveFileName(
+            self, title, "products.csv" if kind == EXPORT_PRODUCTS else "income.csv",
+            "CSV (*.csv);;JSON Lines (*.jsonl);;Parquet (*.parquet)"
+        )
+        if not path:
+            return
+        
+        self.export_job_id += 1
+        self.export_job = ExportWorker(self.export_job_id, self.database, kind, path)
+        self.export_job.signals.progress.connect(self.on_export_progress)
+        self.export_job.signals.finished.connect(self.on_export_ready)
+        self.export_job.signals.failed.connect(self.on_export_failed)
+        self.export_progress = self.create_progress("Экспорт", f"{title}...", self.export_job)
+        QThreadPool.globalInstance().start(self.export_job)
+        
+    def on_export_progress(self, job_id, written):
+        """Отображение количества выгруженных строк"""
+        if job_id == self.export_job_id and self.export_progress is not None:
+            self.export_progress.setLabelText(f"Выгружено строк: {written}")
+            
+    def finish_export(self):
+        """Закрытие индикатора выгрузки"""
+        path = self.export_job.path
+        self.export_job = None
+        if self.export_progress is not None:
+            self.export_progress.canceled.disconnect()
+            self.export_progress.close()
+            self.export_progress = None
+        return path
+        
+    def on_export_ready(self, job_id, count):
+        """Итоги выгрузки"""
+        if job_id != self.export_job_id:
+            return
+        path = self.finish_export()
+        QMessageBox.information(self, "Экспорт", f"Выгружено строк: {count}\n{path}")
+        
+    def on_export_failed(self, job_id, message):
+        """Ошибка или отмена выгрузки"""
+        if job_id != self.export_job_id:
+            return
+        self.finish_export()
+        QMessageBox.warning(self, "Экспорт", message)
+        
+    def show_reorder(self):
+        """Окно "Дозаказ": продукты с рекомендуемым дозаказом по прогнозу спроса"""
+        from reorder_dialog import ReorderDialog
+        
+        if self.reorder_dialog is None:
+            self.reorder_dialog = ReorderDialog(self.cursor, self)
+            self.reorder_dialog.recalculate.connect(self.run_forecast)
+            self.reorder_dialog.set_running(self.forecast_job is not None)
+        else:
+            self.reorder_dialog.reload()
+        self.reorder_dialog.show()
+        self.reorder_dialog.raise_()
+        
+    def run_forecast(self):
+        """Фоновый расчет прогноза спроса по всем продуктам"""
+        if self.forecast_job is not None:
+            return
+        self.forecast_job_id += 1
+        self.forecast_job = ForecastWorker(self.forecast_job_id, self.database)
+        self.forecast_job.signals.progress.connect(self.on_forecast_progress)
+        self.forecast_job.signals.finished.connect(self.on_forecast_ready)
+        self.forecast_job.signals.failed.connect(self.on_forecast_failed)
+        self.forecast_progress = self.create_progress(
+            "Прогноз спроса", "Расчет прогноза спроса...", self.forecast_job
+        )
+        if self.reorder_dialog is not None:
+            self.reorder_dialog.set_running(True)
+        QThreadPool.globalInstance().start(self.forecast_job)
+        
+    def on_forecast_progress(self, job_id, done):
+        """Отображение количества рассчитанных продуктов"""
+        if job_id == self.forecast_job_id and self.forecast_progress is not None:
+            self.forecast_progress.setLabelText(f"Рассчитано продуктов: {done}")
+            
+    def finish_forecast(self):
+        """Закрытие индикатора расчета и обновление прогноза в таблице и окне "Дозаказ" """
+        self.forecast_job = None
+        if self.forecast_progress is not None:
+            self.forecast_progress.canceled.disconnect()
+            self.forecast_progress.close()
+            self.forecast_progress = None
+        # При отмене часть прогнозов уже записана
+        self.model.forecasts_changed()
+        if self.reorder_dialog is not None:
+            self.reorder_dialog.set_running(False)
+            self.reorder_dialog.reload()
+            
+    def on_forecast_ready(self, job_id, count):
+        """Итоги расчета прогноза"""
+        if job_id != self.forecast_job_id:
+            return
+        self.finish_forecast()
+        self.statusBar().showMessage(f"Прогноз спроса рассчитан. Продуктов: {count}")
+        
+    def on_forecast_failed(self, job_id, message):
+        """Ошибка или отмена расчета прогноза"""
+        if job_id != self.forecast_job_id:
+            return
+        self.finish_forecast()
+        QMessageBox.warning(self, "Прогноз спроса", message)
+        
+    def note_activity(self):
+        """Продукты изменены: обслуживание по расписанию откладывается до простоя"""
+        self.last_activity = time.monotonic()
+        if self.maintenance_job is not None and not self.maintenance_job.force:
+            self.maintenance_job.cancel()
+            
+    def on_maintenance_timer(self):
+        """Запуск обслуживания базы данных, если продукты давно не менялись"""
+        busy = (self.maintenance_job, self.import_job, self.forecast_job)
+        if (all(job is None for job in busy)
+                and time.monotonic() - self.last_activity >= MAINTENANCE_IDLE_SECONDS):
+            self.run_maintenance()
+            
+    def show_maintenance(self):
+        """Окно состояния и обслуживания базы данных"""
+        from maintenance_dialog import MaintenanceDialog
+        
+        if self.maintenance_dialog is None:
+            self.maintenance_dialog = MaintenanceDialog(self.conn, self.database.path, self)
+            self.maintenance_dialog.run_requested.connect(lambda: self.run_maintenance(force=True))
+        else:
+            self.maintenance_dialog.reload()
+        self.maintenance_dialog.set_running(
+            self.maintenance_job is not None and self.maintenance_job.force
         )
+        self.maintenance_dialog.show()
+        self.maintenance_dialog.raise_()
+        
+    def run_maintenance(self, force=False):
+        """Фоновое обслуживание базы данных (force - все задачи сейчас)"""
+        if self.maintenance_job is not None:
+            if not force or self.maintenance_job.force:
+                return
+            # Запуск из окна заменяет обслуживание по расписанию
+            self.maintenance_job.cancel()
+        self.maintenance_job_id += 1
+        self.maintenance_job = MaintenanceWorker(self.maintenance_job_id, self.database, force)
+        self.maintenance_job.signals.finished.connect(self.on_maintenance_ready)
+        self.maintenance_job.signals.failed.connect(self.on_maintenance_failed)
+        if force and self.maintenance_dialog is not None:
+            self.maintenance_dialog.set_running(True)
+        QThreadPool.globalInstance().start(self.maintenance_job)
+        
+    def finish_maintenance(self):
+        """Обновление окна состояния после обслуживания; возвращает, был ли запуск из окна"""
+        force = self.maintenance_job.force
+        self.maintenance_job = None
+        if self.maintenance_dialog is not None:
+            self.maintenance_dialog.set_running(False)
+            self.maintenance_dialog.reload()
+        return force
         
-        if ok and name:
-            self.cursor.execute(
-                "SELECT * FROM products WHERE name LIKE ?",
-                (f"%{name}%",)
+    def on_maintenance_ready(self, job_id, results):
+        """Итоги обслуживания; ошибки проверки целостности показываются всегда"""
+        if job_id != self.maintenance_job_id:
+            return
+        force = self.finish_maintenance()
+        problems = results.get(TASK_CHECK, "ok")
+        if problems != "ok":
+            QMessageBox.warning(
+                self, "Обслуживание базы данных",
+                f"Проверка целостности базы данных обнаружила ошибки:\n{problems}\n\n"
+                f"Сделайте резервную копию файла {self.database.path}"
             )
-            rows = self.cursor.fetchall()
+        elif force:
+            self.statusBar().showMessage("Обслуживание базы данных завершено")
             
-            self.table.setRowCount(0)
-            for row in rows:
-                row_position = self.table.rowCount()
-                self.table.insertRow(row_position)
-                
-                for col, value in enumerate(row):
-                    item = QTableWidgetItem(str(value))
-                    item.setFlags(item.flags() ^ Qt.ItemIsEditable)
-                    self.table.setItem(row_position, col, item)
+    def on_maintenance_failed(self, job_id, message):
+        """Ошибка или отмена обслуживания (по расписанию - без сообщения)"""
+        if job_id != self.maintenance_job_id:
+            return
+        if self.finish_maintenance():
+            QMessageBox.warning(self, "Обслуживание базы данных", message)
+        
+    def search_product(self):
+        """Поиск продукта"""
+        self.search_input.setFocus()
+        self.search_input.selectAll()
+        
+    def on_search_text_changed(self, text):
+        """Отложенный запуск поиска при вводе текста"""
+        if text.strip():
+            self.search_timer.start()
+        else:
+            self.show_all_products()
+            
+    def run_search(self):
+        """Запуск поиска в фоновом потоке"""
+        self.search_job_id += 1
+        self.search_job = SearchWorker(self.search_job_id, self.database, self.search_input.text())
+        self.search_job.signals.finished.connect(self.on_search_ready)
+        self.search_job.signals.failed.connect(self.on_search_failed)
+        QThreadPool.globalInstance().start(self.search_job)
+        
+    def on_search_ready(self, job_id, ids):
+        """Отображение результатов поиска"""
+        if job_id != self.search_job_id:
+            return
+        if ids:
+            self.model.set_filter(f"id IN ({', '.join('?' * len(ids))})", ids)
+        else:
+            self.model.set_filter("0")
+        self.model.refresh()
+        
+        if len(ids) >= SEARCH_LIMIT:
+            self.statusBar().showMessage(f"Показаны первые {SEARCH_LIMIT} найденных продуктов")
+        else:
+            self.statusBar().showMessage(f"Найдено продуктов: {len(ids)}")
+            
+    def on_search_failed(self, job_id, message):
+        """Ошибка поиска"""
+        if job_id == self.search_job_id:
+            self.statusBar().showMessage(f"Ошибка поиска: {message}")
                     
     def calculate_income_trend(self):
         """Расчет тренда дохода по месяцам"""
-        self.cursor.execute('''
-            SELECT strftime('%Y-%m', receipt_date) as month,
-                   SUM((sales_volume * price) - (purchase_volume * price * 0.8)) as income
-            FROM products
-            GROUP BY month
-            ORDER BY month
-        ''')
-        return self.cursor.fetchall()
+        return self.service.income_trend()
 
-    def predict_future_income(self, months=3):
+    def predict_future_income(self, months=FORECAST_HORIZON):
         """Прогнозирование дохода на следующие месяцы"""
-        data = self.calculate_income_trend()
-        if not data:
-            return []
-            
-        # Преобразование данных
-        dates = [datetime.strptime(row[0], '%Y-%m') for row in data]
-        incomes = [row[1] for row in data]
-        
-        # Преобразование дат в числовой формат
-        x = np.array([(d.year * 12 + d.month) for d in dates]).reshape(-1, 1)
-        y = np.array(incomes)
-        
-        # Обучение модели
-        model = LinearRegression()
-        model.fit(x, y)
-        
-        # Прогнозирование
-        predictions = []
-        last_date = dates[-1]
-        for i in range(1, months + 1):
-            next_month = last_date + timedelta(days=30*i)
-            x_pred = np.array([[next_month.year * 12 + next_month.month]])
-            y_pred = model.predict(x_pred)
-            predictions.append((next_month.strftime('%Y-%m'), max(0, y_pred[0])))
-            
-        return predictions
+        return self.service.forecast(months)['forecast']
 
+    @timed('calculate_discounts')
     def calculate_discounts(self):
         """Рассчет скидок для товаров, пролежавших более половины срока хранения"""
-        self.cursor.execute('''
-            SELECT id, name, price, receipt_date, storage_days, purchase_volume, sales_volume
-            FROM products
-            WHERE
-                julianday('now') - julianday(receipt_date) > storage_days / 2
-                AND purchase_volume > sales_volume
-        ''')
-        products = self.cursor.fetchall()
-        
-        discounted_products = []
-        for product in products:
-            product_id, name, price, receipt_date, storage_days, purchase_volume, sales_volume = product
-            
-            try:
-                # Рассчитываем количество дней в хранении
-                days_in_storage = (datetime.now() - datetime.strptime(receipt_date, '%Y-%m-%d')).days
-                
-                # Рассчитываем процент скидки на основе времени хранения
-                if days_in_storage > storage_days / 2:
-                    # Прогрессивная скидка: от 5% до 50% в зависимости от времени хранения
-                    progress = min(1.0, (days_in_storage - storage_days / 2) / (storage_days / 2))
-                    discount_percent = min(50, int(5 + progress * 45))  # От 5% до 50%
-                    
-                    discounted_price = price * (1 - discount_percent / 100)
-                    
-                    discounted_products.append({
-                        'id': product_id,
-                        'name': name,
-                        'original_price': price,
-                        'discounted_price': discounted_price,
-                        'discount_percent': discount_percent
-                    })
-            except ValueError:
-                # Если дата некорректна, пропускаем товар
-                continue
-            
-        return discounted_products
+        return self.service.calculate_discounts()
 
     def update_charts(self):
-        """Обновление графиков"""
-        # Clear and reinitialize figures
-        for fig in [self.figure1, self.figure2, self.figure3]:
-            fig.clf()
-            ax = fig.add_subplot(111)
-            ax.set_facecolor('#2D2D2D')
-            for spine in ax.spines.values():
-                spine.set_color('white')
+        """Запуск фонового пересчета данных для графиков"""
+        # Результат устаревшей задачи больше не нужен
+        if self.analytics_job is not None:
+            self.analytics_job.cancel()
         
-        # График тренда дохода
-        ax1 = self.figure1.add_subplot(111)
-        self.figure1.subplots_adjust(left=0.15, bottom=0.35, right=0.95, top=0.85)
-        income_data = self.calculate_income_trend()
-        plt.setp(ax1.get_xticklabels(), rotation=30, ha='right')
-        if income_data:
-            months = [row[0] for row in income_data]
-            incomes = [row[1] for row in income_data]
-            
-            ax1.plot(months, incomes, marker='o', color='#1f77b4')
-            ax1.set_title("Тренд дохода по месяцам", color='white')
-            ax1.set_ylabel("Доход", color='white')
-            ax1.tick_params(axis='x', rotation=45, colors='white')
-            ax1.tick_params(axis='y', colors='white')
-            
-            # Прогноз на следующие 3 месяца
-            predictions = self.predict_future_income()
-            if predictions:
-                pred_months = [row[0] for row in predictions]
-                pred_incomes = [row[1] for row in predictions]
-                ax1.plot(pred_months, pred_incomes, 'r--', marker='o', label='Прогноз')
-                ax1.legend(facecolor='#3A3A3A', edgecolor='white', labelcolor='white')
-        
-        # График самых продаваемых продуктов
-        ax2 = self.figure2.add_subplot(111)
-        self.figure2.subplots_adjust(left=0.15, bottom=0.4, right=0.95, top=0.85)
-        self.cursor.execute('''
-            SELECT name, sales_volume 
-            FROM products 
-            ORDER BY sales_volume DESC 
-            LIMIT 5
-        ''')
-        top_products = self.cursor.fetchall()
-        
-        if top_products:
-            names = [p[0] for p in top_products]
-            sales = [p[1] for p in top_products]
-            ax2.bar(names, sales, color='#1f77b4')
-            ax2.set_title("Топ 5 продаваемых продуктов", color='white', pad=20)
-            ax2.set_ylabel("Объем продаж (кг)", color='white')
-            ax2.tick_params(axis='x', rotation=30, colors='white')
-            ax2.tick_params(axis='y', colors='white')
-            ax2.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, _: f'{x:,.0f} кг'))
-            
-        # Круговая диаграмма распределения запасов
-        ax3 = self.figure3.add_subplot(111)
-        self.cursor.execute('''
-            SELECT name, purchase_volume - sales_volume 
-            FROM products 
-            WHERE purchase_volume - sales_volume > 0
-        ''')
-        stock = self.cursor.fetchall()
-        
-        if stock:
-            names = [s[0] for s in stock]
-            volumes = [s[1] for s in stock]
-            
-            ax3.pie(volumes, labels=names, autopct='%1.1f%%', 
-                   textprops={'color': 'white'})
-            ax3.set_title("Распределение запасов", color='white', pad=20)
+        if not self.charts_drawn and self.draw_cached_charts():
+            return
+        
+        self.analytics_job_id += 1
+        self.analytics_job = AnalyticsWorker(self.analytics_job_id, self.database, self.stock_group,
+                                             self.snapshot)
+        self.analytics_job.signals.finished.connect(self.on_analytics_ready)
+        self.analytics_job.signals.failed.connect(self.on_analytics_failed)
+        self.charts_dirty = False
+        self.analytics_started = time.perf_counter()
+        self.analytics_status.setText("Обновление данных...")
+        self.analytics_status.show()
+        QThreadPool.globalInstance().start(self.analytics_job)
+        
+    def draw_cached_charts(self):
+        """Графики из кэша при первом открытии вкладки после запуска
+        
+        Возвращает True, если кэш соответствует текущим данным и пересчет не
+        нужен; иначе графики из кэша остаются на экране до конца пересчета.
+        """
+        cached = analytics_cache.load_series(self.analytics_cache, self.stock_group)
+        if cached is None:
+            return False
+        seq, series = cached
+        self.draw_charts(series)
+        startup_trace.mark("графики из кэша")
+        if seq != current_seq(self.cursor):
+            return False
+        self.charts_dirty = False
+        return True
+        
+    def on_analytics_ready(self, job_id, result):
+        """Получение результатов фонового расчета"""
+        if job_id != self.analytics_job_id:
+            return
+        seq, series = result
+        analytics_cache.save_series(self.analytics_cache, seq, self.analytics_job.stock_group, series)
+        self.analytics_job = None
+        self.analytics_status.hide()
+        # Графики, данные которых не изменились (в том числе построенные из
+        # кэша), не перерисовываются
+        self.draw_charts(series)
+        # От запуска расчета до обновления графиков; отрисовка холстов - render_chart.*
+        instrumentation.record('update_charts', (time.perf_counter() - self.analytics_started) * 1000)
+        
+    def on_analytics_failed(self, job_id, message):
+        """Ошибка фонового расчета"""
+        if job_id != self.analytics_job_id:
+            return
+        self.analytics_job = None
+        self.charts_dirty = True
+        self.analytics_status.setText(f"Ошибка обновления графиков: {message}")
+        
+    def on_stock_group_changed(self):
+        """Смена группировки запасов: пересчет данных графиков"""
+        self.stock_group = self.stock_group_box.currentData()
+        self.update_charts()
+        
+    def on_stock_mode_changed(self):
+        """Круговая диаграмма или столбцы для распределения запасов"""
+        if self.stock_chart.set_mode(self.stock_mode_box.currentData()):
+            self.canvas3.draw_idle()
             
-        # Настройка цветов для темной темы
-        for ax in [ax1, ax2, ax3]:
-            ax.set_facecolor('#2D2D2D')
-            ax.spines['bottom'].set_color('white')
-            ax.spines['top'].set_color('white') 
-            ax.spines['right'].set_color('white')
-            ax.spines['left'].set_color('white')
-            plt.tight_layout()
+    def show_stock_details(self):
+        """Постраничный просмотр позиций, вошедших в "Прочее" """
+        from stock_dialog import StockDetailsDialog
+        
+        StockDetailsDialog(self.cursor, self.stock_group, self).exec()
+        
+    @timed('draw_charts')
+    def draw_charts(self, series):
+        """Отрисовка графиков по рассчитанным данным"""
+        # Перерисовываются только графики, данные которых изменились;
+        # неизменный холст Qt показывает из уже готового изображения
+        charts = [
+            (self.income_chart, self.canvas1, (series['income'], series['forecast'])),
+            (self.top_chart, self.canvas2, (series['top'],)),
+            (self.stock_chart, self.canvas3, (series['stock'],)),
+        ]
+        for chart, canvas, data in charts:
+            if chart.update(*data):
+                canvas.draw_idle()
+        self.charts_drawn = True
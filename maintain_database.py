@@ -0,0 +1,58 @@
+import argparse
+import sqlite3
+import sys
+
+from database import Database
+from maintenance import (
+    AUTO_VACUUM_TITLES, TASK_CHECK, TASK_TITLES, database_status, format_size, run_maintenance
+)
+
+
+def print_status(database):
+    status = database_status(database.conn, database.path)
+    print(f"Файл: {database.path}")
+    print(f"Размер: {format_size(status['size'])}, журнал WAL: {format_size(status['wal_size'])}")
+    print(f"Свободных страниц: {status['free_pages']} из {status['page_count']} "
+          f"({status['fragmentation']:.1%})")
+    print(f"Возврат свободных страниц: {AUTO_VACUUM_TITLES[status['auto_vacuum']]}")
+    for task, title in TASK_TITLES.items():
+        finished, duration, result = status['tasks'].get(task, ("не выполнялась", None, ""))
+        timing = f", {duration:.2f} с" if duration is not None else ""
+        print(f"{title}: {finished.replace('T', ' ')}{timing} {result}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Обслуживание базы данных магазина: статистика, свободные страницы и проверка"
+    )
+    parser.add_argument('--db', help="файл базы данных (по умолчанию store.db в директории приложения)")
+    parser.add_argument('--status', action='store_true', help="только показать состояние")
+    parser.add_argument('--vacuum', action='store_true',
+                        help="полная очистка VACUUM с переходом на возврат страниц по частям; "
+                             "блокирует запись, выполняйте при закрытой программе")
+    args = parser.parse_args()
+
+    database = Database(args.db)
+    try:
+        if args.vacuum:
+            print("Полная очистка...", file=sys.stderr)
+            database.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            database.conn.execute("VACUUM")
+        results = {} if args.status else run_maintenance(database.conn, force=True)
+        for task, result in results.items():
+            print(f"{TASK_TITLES[task]}: {result}", file=sys.stderr)
+        print_status(database)
+    except sqlite3.OperationalError as e:
+        print(f"Ошибка обслуживания: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("Обслуживание прервано", file=sys.stderr)
+        return 1
+    finally:
+        database.close()
+    # Проверка целостности обнаружила ошибки
+    return 2 if results.get(TASK_CHECK, "ok") != "ok" else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Обслуживание базы данных: статистика, свободные страницы и проверка
+
+При частом изменении и удалении продуктов в файле базы данных копятся
+свободные страницы, а статистика планировщика запросов устаревает.
+run_maintenance выполняет задачи, срок которых наступил:
+
+- TASK_PRUNE - удаление записей журнала изменений change_log старше
+  KEEP_DAYS дней раз в PRUNE_INTERVAL;
+- TASK_ANALYZE - ANALYZE раз в ANALYZE_INTERVAL (объем чтения ограничен
+  PRAGMA analysis_limit, см. database.WRITER_PRAGMAS);
+- TASK_VACUUM - возврат свободных страниц порциями PRAGMA incremental_vacuum
+  по VACUUM_SLICE_PAGES страниц с паузой между порциями, если база данных
+  создана с auto_vacuum = INCREMENTAL;
+- TASK_CHECK - PRAGMA quick_check раз в CHECK_INTERVAL (только чтение).
+
+Каждая порция записи - отдельная короткая транзакция, поэтому сохранение
+продукта ожидает не дольше одной порции. Последний запуск каждой задачи
+записывается в таблицу maintenance_log (migrations.py, версия 8).
+"""
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import instrumentation
+
+
+# Задачи обслуживания
+TASK_PRUNE = 'prune_changes'
+TASK_ANALYZE = 'analyze'
+TASK_VACUUM = 'vacuum'
+TASK_CHECK = 'quick_check'
+
+TASK_TITLES = {
+    TASK_PRUNE: "Очистка журнала изменений",
+    TASK_ANALYZE: "Статистика планировщика (ANALYZE)",
+    TASK_VACUUM: "Возврат свободных страниц",
+    TASK_CHECK: "Проверка целостности",
+}
+
+# Периодичность задач
+PRUNE_INTERVAL = timedelta(days=1)
+ANALYZE_INTERVAL = timedelta(hours=6)
+CHECK_INTERVAL = timedelta(days=1)
+
+# Записи журнала изменений старше этого срока удаляются (дней)
+KEEP_DAYS = 7
+
+# Страниц в одной порции incremental_vacuum и пауза между порциями (с)
+VACUUM_SLICE_PAGES = 256
+VACUUM_PAUSE = 0.05
+
+# Свободные страницы возвращаются, когда их не меньше этого количества
+VACUUM_MIN_FREE_PAGES = 64
+
+# Наибольшее количество ошибок в отчете quick_check
+CHECK_MAX_ERRORS = 10
+
+# Режимы PRAGMA auto_vacuum
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+# Подписи режимов auto_vacuum
+AUTO_VACUUM_TITLES = {
+    'none': "нет (только полная очистка VACUUM)",
+    'full': "автоматический",
+    'incremental': "по частям во время простоя",
+}
+
+
+def format_size(size):
+    """Размер в байтах для отображения"""
+    for unit in ("Б", "КБ", "МБ"):
+        if size < 1024:
+            return f"{size:,.0f} {unit}" if unit == "Б" else f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} ГБ"
+
+
+class MaintenanceCancelled(Exception):
+    """Обслуживание прервано (продолжится при следующем запуске)"""
+
+
+def _pragma(conn, name):
+    return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def last_runs(cursor):
+    """Последние запуски задач: {задача: (время окончания, длительность, результат)}"""
+    cursor.execute("SELECT task, finished_at, duration, result FROM maintenance_log")
+    return {task: tuple(values) for task, *values in cursor.fetchall()}
+
+
+def database_status(conn, path):
+    """Состояние файла базы данных path
+
+    Размеры в байтах; fragmentation - доля свободных страниц в файле.
+    """
+    page_count = _pragma(conn, "page_count")
+    free_pages = _pragma(conn, "freelist_count")
+    return {
+        'size': _file_size(path),
+        'wal_size': _file_size(path + '-wal'),
+        'page_size': _pragma(conn, "page_size"),
+        'page_count': page_count,
+        'free_pages': free_pages,
+        'fragmentation': free_pages / page_count if page_count else 0.0,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(_pragma(conn, "auto_vacuum"), 'none'),
+        'tasks': last_runs(conn.cursor()),
+    }
+
+
+def due_tasks(conn, now=None, force=False):
+    """Задачи, срок которых наступил (force - все применимые задачи)
+
+    Журнал изменений очищается первым, свободные страницы возвращаются после
+    ANALYZE, а проверка выполняется последней, так как читает весь файл.
+    """
+    now = now or datetime.now()
+    runs = last_runs(conn.cursor())
+
+    def due(task, interval):
+        finished = runs.get(task, (None,))[0]
+        return force or finished is None or datetime.fromisoformat(finished) + interval <= now
+
+    tasks = []
+    if due(TASK_PRUNE, PRUNE_INTERVAL):
+        tasks.append(TASK_PRUNE)
+    if due(TASK_ANALYZE, ANALYZE_INTERVAL):
+        tasks.append(TASK_ANALYZE)
+    if _pragma(conn, "auto_vacuum") == 2:
+        free_pages = _pragma(conn, "freelist_count")
+        if free_pages >= VACUUM_MIN_FREE_PAGES or (force and free_pages):
+            tasks.append(TASK_VACUUM)
+    if due(TASK_CHECK, CHECK_INTERVAL):
+        tasks.append(TASK_CHECK)
+    return tasks
+
+
+def prune_changes(conn, days=KEEP_DAYS):
+    """Удаление записей журнала изменений старше days дней; возвращает их количество
+
+    Рабочее место, не читавшее журнал дольше days дней, перечитывает
+    продукты целиком (sync.changes_since).
+    """
+    with conn:
+        cursor = conn.execute(
+            "DELETE FROM change_log WHERE changed_at < datetime('now', ?)", (f'-{days} days',)
+        )
+    return cursor.rowcount
+
+
+def analyze(conn):
+    """Обновление статистики планировщика запросов"""
+    conn.execute("ANALYZE")
+    return "ok"
+
+
+def incremental_vacuum(conn, is_cancelled=lambda: False):
+    """Возврат свободных страниц порциями; возвращает количество страниц
+
+    При отмене уже возвращенные страницы остаются возвращенными.
+    """
+    freed = 0
+    while not is_cancelled():
+        before = _pragma(conn, "freelist_count")
+        if not before:
+            break
+        # Прагма освобождает по одной странице на шаг, а execute выполняет
+        # только первый шаг; executescript выполняет порцию до конца и фиксирует
+        conn.executescript(f"PRAGMA incremental_vacuum({VACUUM_SLICE_PAGES})")
+        slice_freed = before - _pragma(conn, "freelist_count")
+        if slice_freed <= 0:
+            break
+        freed += slice_freed
+        # Пауза дает соединению главного окна получить блокировку записи
+        time.sleep(VACUUM_PAUSE)
+    # Страницы из журнала WAL переносятся в файл, если это не мешает чтению
+    conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    return freed
+
+
+def quick_check(conn):
+    """Проверка целостности: список ошибок (пустой, если ошибок нет)"""
+    rows = conn.execute(f"PRAGMA quick_check({CHECK_MAX_ERRORS})").fetchall()
+    return [message for message, in rows if message != 'ok']
+
+
+def run_task(conn, task, is_cancelled=lambda: False):
+    """Выполнение задачи task и запись в maintenance_log; возвращает результат"""
+    started = time.perf_counter()
+    with instrumentation.measure(f'maintenance.{task}'):
+        if task == TASK_PRUNE:
+            result = f"{prune_changes(conn)} зап."
+        elif task == TASK_ANALYZE:
+            result = analyze(conn)
+        elif task == TASK_VACUUM:
+            result = f"{incremental_vacuum(conn, is_cancelled)} стр."
+        else:
+            errors = quick_check(conn)
+            result = "; ".join(errors) if errors else "ok"
+    duration = time.perf_counter() - started
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO maintenance_log (task, finished_at, duration, result) "
+            "VALUES (?, ?, ?, ?)",
+            (task, datetime.now().isoformat(timespec='seconds'), duration, result)
+        )
+    return result
+
+
+def run_maintenance(conn, now=None, force=False, is_cancelled=lambda: False):
+    """Выполнение задач, срок которых наступил
+
+    conn - отдельное соединение для записи. Возвращает {задача: результат}.
+    При отмене (is_cancelled или прерывание запроса) выбрасывается
+    MaintenanceCancelled; выполненные задачи остаются в журнале.
+    """
+    results = {}
+    try:
+        for task in due_tasks(conn, now, force):
+            if is_cancelled():
+                raise MaintenanceCancelled()
+            results[task] = run_task(conn, task, is_cancelled)
+    except sqlite3.OperationalError:
+        if is_cancelled():
+            raise MaintenanceCancelled()
+        raise
+    return results
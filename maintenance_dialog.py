@@ -0,0 +1,89 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel,
+    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import Qt, Signal
+
+from maintenance import AUTO_VACUUM_TITLES, TASK_TITLES, database_status, format_size
+
+
+class MaintenanceDialog(QDialog):
+    """Состояние файла базы данных и последние запуски обслуживания (maintenance.py)"""
+
+    # Запрошено обслуживание всех задач сейчас
+    run_requested = Signal()
+
+    def __init__(self, conn, path, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        self.path = path
+
+        self.setWindowTitle("Обслуживание базы данных")
+        self.setMinimumSize(700, 400)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        # Состояние файла: подпись и значение
+        info = QGridLayout()
+        self.values = {}
+        for row, (key, title) in enumerate((
+            ('path', "Файл"),
+            ('size', "Размер файла"),
+            ('wal_size', "Журнал WAL"),
+            ('pages', "Страниц (свободных)"),
+            ('fragmentation', "Свободное место в файле"),
+            ('auto_vacuum', "Возврат свободных страниц"),
+        )):
+            value = QLabel()
+            value.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            info.addWidget(QLabel(f"{title}:"), row, 0)
+            info.addWidget(value, row, 1)
+            self.values[key] = value
+        info.setColumnStretch(1, 1)
+        layout.addLayout(info)
+
+        self.table = QTableWidget(len(TASK_TITLES), 4)
+        self.table.setHorizontalHeaderLabels(["Задача", "Последний запуск", "Длительность", "Результат"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.refresh_btn = QPushButton("Обновить")
+        self.refresh_btn.clicked.connect(self.reload)
+        self.run_btn = QPushButton("Обслужить сейчас")
+        self.run_btn.clicked.connect(self.run_requested)
+        buttons.addStretch()
+        buttons.addWidget(self.refresh_btn)
+        buttons.addWidget(self.run_btn)
+        layout.addLayout(buttons)
+
+        self.reload()
+
+    def reload(self):
+        """Чтение состояния базы данных и журнала обслуживания"""
+        status = database_status(self.conn, self.path)
+        self.values['path'].setText(self.path)
+        self.values['size'].setText(format_size(status['size']))
+        self.values['wal_size'].setText(format_size(status['wal_size']))
+        self.values['pages'].setText(
+            f"{status['page_count']:,} ({status['free_pages']:,}) по {format_size(status['page_size'])}"
+        )
+        self.values['fragmentation'].setText(
+            f"{status['fragmentation']:.1%} ({format_size(status['free_pages'] * status['page_size'])})"
+        )
+        self.values['auto_vacuum'].setText(AUTO_VACUUM_TITLES[status['auto_vacuum']])
+
+        for row, (task, title) in enumerate(TASK_TITLES.items()):
+            finished, duration, result = status['tasks'].get(task, ("не выполнялась", None, ""))
+            self.table.setItem(row, 0, QTableWidgetItem(title))
+            self.table.setItem(row, 1, QTableWidgetItem(finished.replace('T', ' ')))
+            item = QTableWidgetItem(f"{duration:.2f} с" if duration is not None else "")
+            item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.table.setItem(row, 2, item)
+            self.table.setItem(row, 3, QTableWidgetItem(result))
+
+    def set_running(self, running):
+        """Кнопка запуска недоступна, пока идет обслуживание"""
+        self.run_btn.setEnabled(not running)
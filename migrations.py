@@ -0,0 +1,342 @@
+# Нормализация текста для полнотекстового индекса: "ё" ищется как "е"
+# (регистр букв, в том числе кириллицы, учитывает токенизатор unicode61)
+def _fold(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+# Вклад движения товара в доход: выручка от продаж за вычетом закупочной
+# стоимости (80% цены); NULL в объемах или цене считается нулем
+def _income(sales, purchase, price):
+    return f"COALESCE(({sales}) * {price} - ({purchase}) * {price} * 0.8, 0)"
+
+
+def _month(column):
+    return f"strftime('%Y-%m', {column})"
+
+
+# Столбцы продукта (кроме id), копируемые в журнал изменений
+_PRODUCT_COLUMNS = [
+    ('name', 'TEXT'),
+    ('package', 'TEXT'),
+    ('receipt_date', 'TEXT'),
+    ('storage_days', 'INTEGER'),
+    ('purchase_volume', 'REAL'),
+    ('sales_volume', 'REAL'),
+    ('price', 'REAL'),
+]
+
+
+def _old_columns(prefix=''):
+    """Список столбцов журнала (old_name, ...) или значений old.name, ..."""
+    if prefix:
+        return ', '.join(f'{prefix}{field}' for field, _ in _PRODUCT_COLUMNS)
+    return ', '.join(f'old_{field}' for field, _ in _PRODUCT_COLUMNS)
+
+
+# Версия схемы хранится в PRAGMA user_version. Миграция с номером N
+# (N-й элемент списка) переводит базу данных с версии N-1 на версию N.
+# Существующие базы данных магазинов имеют версию 0 и обновляются на месте.
+MIGRATIONS = [
+    # 1. Исходная схема
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            package TEXT,
+            receipt_date TEXT,
+            storage_days INTEGER,
+            purchase_volume REAL,
+            sales_volume REAL,
+            price REAL
+        )
+        ''',
+    ],
+    # 2. Вычисляемые остаток и срок годности, индексы для аналитики
+    [
+        '''
+        ALTER TABLE products ADD COLUMN stock REAL
+            GENERATED ALWAYS AS (purchase_volume - sales_volume) VIRTUAL
+        ''',
+        '''
+        ALTER TABLE products ADD COLUMN expiry_date TEXT
+            GENERATED ALWAYS AS (date(receipt_date, '+' || storage_days || ' days')) VIRTUAL
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_products_sales_volume ON products(sales_volume)",
+        "CREATE INDEX IF NOT EXISTS idx_products_receipt_date ON products(receipt_date)",
+        "CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock)",
+        "CREATE INDEX IF NOT EXISTS idx_products_expiry_date ON products(expiry_date)",
+    ],
+    # 3. Полнотекстовый индекс по названию и упаковке с поиском по префиксу.
+    # Индекс без собственного содержимого (content=''), так как индексируется
+    # нормализованный текст; синхронизируется триггерами.
+    [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, package,
+            content='',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='1 2 3'
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, package)
+            VALUES (new.id, {_fold('new.name')}, {_fold('new.package')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, package)
+            VALUES ('delete', old.id, {_fold('old.name')}, {_fold('old.package')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, package ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, package)
+            VALUES ('delete', old.id, {_fold('old.name')}, {_fold('old.package')});
+            INSERT INTO products_fts(rowid, name, package)
+            VALUES (new.id, {_fold('new.name')}, {_fold('new.package')});
+        END
+        ''',
+        f'''
+        INSERT INTO products_fts(rowid, name, package)
+        SELECT id, {_fold('name')}, {_fold('package')} FROM products
+        ''',
+    ],
+    # 4. Журнал движения товаров и помесячные итоги дохода.
+    # Поступление продукта записывается датой поступления, изменение объемов
+    # закупки и продажи - разницей на дату изменения. Итоги по месяцам
+    # поддерживаются триггерами, поэтому график дохода читает одну строку на месяц.
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            movement_date TEXT,
+            kind TEXT NOT NULL,              -- 'receipt' или 'adjustment'
+            purchase_volume REAL,
+            sales_volume REAL,
+            price REAL,
+            income REAL NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_stock_movements_product ON stock_movements(product_id)",
+        '''
+        CREATE TABLE IF NOT EXISTS monthly_income (
+            month TEXT PRIMARY KEY,
+            income REAL NOT NULL,
+            movements INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        # Заполнение по существующим продуктам (до создания триггеров)
+        f'''
+        INSERT INTO stock_movements (
+            product_id, movement_date, kind, purchase_volume, sales_volume, price, income
+        )
+        SELECT id, receipt_date, 'receipt', purchase_volume, sales_volume, price,
+               {_income('sales_volume', 'purchase_volume', 'price')}
+        FROM products
+        ORDER BY id
+        ''',
+        f'''
+        INSERT INTO monthly_income (month, income, movements)
+        SELECT {_month('movement_date')} AS month, SUM(income), COUNT(*)
+        FROM stock_movements
+        WHERE month IS NOT NULL
+        GROUP BY month
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS stock_movements_insert AFTER INSERT ON stock_movements
+        WHEN {_month('new.movement_date')} IS NOT NULL BEGIN
+            INSERT INTO monthly_income (month, income, movements)
+            VALUES ({_month('new.movement_date')}, new.income, 1)
+            ON CONFLICT (month) DO UPDATE SET
+                income = income + excluded.income,
+                movements = movements + 1;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS stock_movements_delete AFTER DELETE ON stock_movements
+        WHEN {_month('old.movement_date')} IS NOT NULL BEGIN
+            UPDATE monthly_income SET
+                income = income - old.income,
+                movements = movements - 1
+            WHERE month = {_month('old.movement_date')};
+            DELETE FROM monthly_income
+            WHERE month = {_month('old.movement_date')} AND movements <= 0;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_movement_insert AFTER INSERT ON products BEGIN
+            INSERT INTO stock_movements (
+                product_id, movement_date, kind, purchase_volume, sales_volume, price, income
+            )
+            VALUES (
+                new.id, new.receipt_date, 'receipt',
+                new.purchase_volume, new.sales_volume, new.price,
+                {_income('new.sales_volume', 'new.purchase_volume', 'new.price')}
+            );
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_movement_update
+        AFTER UPDATE OF purchase_volume, sales_volume ON products
+        WHEN new.purchase_volume IS NOT old.purchase_volume
+            OR new.sales_volume IS NOT old.sales_volume BEGIN
+            INSERT INTO stock_movements (
+                product_id, movement_date, kind, purchase_volume, sales_volume, price, income
+            )
+            VALUES (
+                new.id, date('now', 'localtime'), 'adjustment',
+                new.purchase_volume - old.purchase_volume,
+                new.sales_volume - old.sales_volume,
+                new.price,
+                {_income('new.sales_volume - old.sales_volume',
+                         'new.purchase_volume - old.purchase_volume', 'new.price')}
+            );
+        END
+        ''',
+        # Исправленные дата поступления или цена переносят поступление в новый
+        # месяц с новой ценой, как при расчете дохода по продуктам. Строки
+        # stock_movements не изменяются, а заменяются (итоги месяцев
+        # поддерживают триггеры вставки и удаления): копия поступления с новыми
+        # датой и ценой вставляется, затем прежнее поступление удаляется
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_receipt_update
+        AFTER UPDATE OF receipt_date, price ON products
+        WHEN new.receipt_date IS NOT old.receipt_date
+            OR new.price IS NOT old.price BEGIN
+            INSERT INTO stock_movements (
+                product_id, movement_date, kind, purchase_volume, sales_volume, price, income
+            )
+            SELECT product_id, new.receipt_date, 'receipt', purchase_volume, sales_volume,
+                   new.price, {_income('sales_volume', 'purchase_volume', 'new.price')}
+            FROM stock_movements
+            WHERE product_id = new.id AND kind = 'receipt';
+            DELETE FROM stock_movements
+            WHERE product_id = new.id AND kind = 'receipt' AND id < (
+                SELECT MAX(id) FROM stock_movements WHERE product_id = new.id AND kind = 'receipt'
+            );
+        END
+        ''',
+        # Удаленный продукт не учитывается в доходе, как и до появления журнала
+        '''
+        CREATE TRIGGER IF NOT EXISTS products_movement_delete AFTER DELETE ON products BEGIN
+            DELETE FROM stock_movements WHERE product_id = old.id;
+        END
+        ''',
+    ],
+    # 5. Индекс для распределения запасов по видам упаковки
+    [
+        "CREATE INDEX IF NOT EXISTS idx_products_package_stock ON products(package, stock)",
+    ],
+    # 6. Журнал изменений продуктов для нескольких рабочих мест с одной базой
+    # данных. Каждое изменение получает номер seq (AUTOINCREMENT, номера не
+    # повторяются) и строку продукта до изменения, чтобы другие копии программы
+    # обновили только затронутые строки. row_version - номер последнего
+    # изменения продукта (0 - не изменялся после добавления), по нему
+    # обнаруживается одновременное редактирование.
+    [
+        "ALTER TABLE products ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0",
+        f'''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            change TEXT NOT NULL,            -- 'inserted', 'updated' или 'deleted'
+            changed_at TEXT NOT NULL DEFAULT (datetime('now')),
+            {', '.join(f'old_{field} {kind}' for field, kind in _PRODUCT_COLUMNS)}
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS products_change_insert AFTER INSERT ON products BEGIN
+            INSERT INTO change_log (product_id, change) VALUES (new.id, 'inserted');
+        END
+        ''',
+        # Изменение только row_version (в том числе из этих триггеров) не записывается
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_change_update AFTER UPDATE ON products
+        WHEN new.row_version IS old.row_version BEGIN
+            INSERT INTO change_log (product_id, change, {_old_columns()})
+            VALUES (new.id, 'updated', {_old_columns('old.')});
+            UPDATE products SET row_version = last_insert_rowid() WHERE id = new.id;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS products_change_delete AFTER DELETE ON products BEGIN
+            INSERT INTO change_log (product_id, change, {_old_columns()})
+            VALUES (old.id, 'deleted', {_old_columns('old.')});
+        END
+        ''',
+    ],
+    # 7. Прогноз спроса по продуктам (demand.py): рассчитывается пакетной
+    # задачей и хранится до следующего расчета
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS forecasts (
+            product_id INTEGER PRIMARY KEY,
+            daily_sales REAL NOT NULL,       -- ожидаемые продажи в день
+            projected_sales REAL NOT NULL,   -- продажи до окончания срока хранения
+            expected_waste REAL NOT NULL,    -- остаток, который не успеют продать
+            reorder_quantity REAL NOT NULL,  -- рекомендуемый объем дозаказа
+            forecast_date TEXT NOT NULL
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_forecasts_reorder ON forecasts(reorder_quantity, product_id)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS products_forecast_delete AFTER DELETE ON products BEGIN
+            DELETE FROM forecasts WHERE product_id = old.id;
+        END
+        ''',
+    ],
+    # 8. Журнал обслуживания базы данных (maintenance.py): последний запуск
+    # каждой задачи, общий для всех рабочих мест
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS maintenance_log (
+            task TEXT PRIMARY KEY,
+            finished_at TEXT NOT NULL,   -- время окончания (ISO, местное)
+            duration REAL NOT NULL,      -- длительность (с)
+            result TEXT NOT NULL
+        )
+        ''',
+    ],
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    """Текущая версия схемы базы данных"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Обновление схемы базы данных до версии target
+
+    Каждая миграция выполняется в отдельной транзакции вместе с изменением
+    user_version, поэтому прерванное обновление можно безопасно повторить.
+    Возвращает итоговую версию схемы.
+    """
+    version = schema_version(conn)
+    while version < target:
+        # IMMEDIATE блокирует запись другим копиям программы на время миграции
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Пока ждали блокировку, базу данных могла обновить другая копия
+            version = schema_version(conn)
+            if version >= target:
+                conn.rollback()
+                break
+            for step in MIGRATIONS[version]:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            version += 1
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return version
@@ -6,6 +6,8 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QDate
 from PySide6.QtGui import QIntValidator
 
+from products import validate_product, STORAGE_DAYS_RANGE, VOLUME_RANGE, PRICE_RANGE
+
 class ProductDialog(QDialog):
     def __init__(self, parent=None, product_data=None):
         super().__init__(parent)
@@ -35,27 +37,27 @@ class ProductDialog(QDialog):
         layout.addWidget(self.receipt_date)
         
         self.storage_days = QSpinBox()
-        self.storage_days.setRange(1, 365)
+        self.storage_days.setRange(*STORAGE_DAYS_RANGE)
         self.storage_days.setValue(30)
         layout.addWidget(QLabel("Срок хранения (дней):"))
         layout.addWidget(self.storage_days)
         
         self.purchase_volume = QDoubleSpinBox()
-        self.purchase_volume.setRange(0, 1000000)
+        self.purchase_volume.setRange(*VOLUME_RANGE)
         self.purchase_volume.setValue(0)
         self.purchase_volume.setPrefix("кг: ")
         layout.addWidget(QLabel("Объем закупки:"))
         layout.addWidget(self.purchase_volume)
         
         self.sales_volume = QDoubleSpinBox()
-        self.sales_volume.setRange(0, 1000000)
+        self.sales_volume.setRange(*VOLUME_RANGE)
         self.sales_volume.setValue(0)
         self.sales_volume.setPrefix("кг: ")
         layout.addWidget(QLabel("Объем продажи:"))
         layout.addWidget(self.sales_volume)
         
         self.price = QDoubleSpinBox()
-        self.price.setRange(0, 1000000)
+        self.price.setRange(*PRICE_RANGE)
         self.price.setValue(0)
         self.price.setPrefix("₽: ")
         layout.addWidget(QLabel("Цена:"))
@@ -102,14 +104,10 @@ class ProductDialog(QDialog):
         
     def validate_and_accept(self):
         """Валидация данных и закрытие формы"""
-        data = self.get_data()
-        
-        if not data['name']:
-            QMessageBox.warning(self, "Ошибка", "Название продукта не может быть пустым")
-            return
-            
-        if data['purchase_volume'] < data['sales_volume']:
-            QMessageBox.warning(self, "Ошибка", "Объем продажи не может превышать объем закупки")
+        # Те же правила применяются при импорте продуктов из файла
+        error = validate_product(self.get_data())
+        if error:
+            QMessageBox.warning(self, "Ошибка", error)
             return
             
         self.accept()
@@ -0,0 +1,406 @@
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor
+
+from discounts import discount_sql
+from instrumentation import timed
+from products import FIELDS, PRODUCT_INSERTED, PRODUCT_UPDATED
+
+
+# Заголовки колонок таблицы продуктов
+COLUMNS = [
+    "Код", "Название", "Упаковка", "Дата поступления",
+    "Срок хранения", "Объем закупки", "Объем продажи", "Цена", "Скидка",
+    "Продажи в день", "Дозаказ"
+]
+
+STORAGE_DAYS_COLUMN = 4
+PRICE_COLUMN = 7
+DISCOUNT_COLUMN = 8
+DAILY_SALES_COLUMN = 9
+REORDER_COLUMN = 10
+
+# Колонки прогноза спроса (таблица forecasts, demand.py): поле прогноза
+# читается вместе со строкой продукта после полей FIELDS
+FORECAST_FIELDS = {
+    DAILY_SALES_COLUMN: 'daily_sales',
+    REORDER_COLUMN: 'reorder_quantity',
+}
+
+# Цвет срока хранения продукта, который истек
+EXPIRED_COLOR = QColor('#F4A6A6')
+
+
+def _forecast_sql(field):
+    """Поле прогноза продукта (NULL, если прогноз не рассчитан)"""
+    return f"(SELECT {field} FROM forecasts WHERE product_id = products.id)"
+
+
+class ProductTableModel(QAbstractTableModel):
+    """Модель таблицы продуктов с постраничной загрузкой из SQLite"""
+
+    # Количество строк, загружаемых одним запросом
+    PAGE_SIZE = 200
+    # Максимальное количество страниц в кэше строк
+    MAX_CACHED_PAGES = 25
+
+    def __init__(self, conn, parent=None):
+        super().__init__(parent)
+        self.cursor = conn.cursor()
+
+        # Условие фильтрации (например, для поиска) и его параметры
+        self._condition = ''
+        self._params = ()
+
+        # Сортировка выполняется в SQL через ORDER BY
+        self._sort_column = 0
+        self._sort_order = Qt.AscendingOrder
+
+        # Всего строк по текущему условию и строк, уже показанных в представлении
+        self._total = 0
+        self._loaded = 0
+
+        # Кэш страниц: номер страницы -> список строк (LRU)
+        self._pages = OrderedDict()
+
+        # Скидки по id продукта и id продуктов с истекшим сроком хранения
+        self._discounts = {}
+        self._expired = set()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        return self._loaded < self._total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.PAGE_SIZE, self._total - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+
+        row = self._row(index.row())
+        if row is None:
+            return None
+
+        column = index.column()
+        discounted = self._discounts.get(row[0])
+
+        if role == Qt.DisplayRole:
+            if column in FORECAST_FIELDS:
+                value = row[len(FIELDS) + list(FORECAST_FIELDS).index(column)]
+                if value is None:
+                    return ""
+                return f"{value:.1f}" if column == DAILY_SALES_COLUMN else f"{value:g}"
+            if column == DISCOUNT_COLUMN:
+                return f"{discounted['discount_percent']}%" if discounted else "0%"
+            if column == PRICE_COLUMN and discounted:
+                return f"{discounted['discounted_price']:.2f} ₽"
+            return str(row[column])
+
+        if role == Qt.BackgroundRole:
+            if discounted and column in (PRICE_COLUMN, DISCOUNT_COLUMN):
+                return Qt.yellow
+            if column == STORAGE_DAYS_COLUMN and row[0] in self._expired:
+                return EXPIRED_COLOR
+            return None
+
+        if role == Qt.ToolTipRole:
+            if column in FORECAST_FIELDS and row[len(FIELDS)] is None:
+                return "Прогноз еще не рассчитан (Дозаказ - Пересчитать прогноз)"
+            if discounted and column == PRICE_COLUMN:
+                return (f"Скидка {discounted['discount_percent']}% "
+                        f"(было {discounted['original_price']} ₽)")
+            if column == STORAGE_DAYS_COLUMN and row[0] in self._expired:
+                return "Срок хранения истек"
+            return None
+
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """Сортировка средствами SQL"""
+        self._sort_column = column
+        self._sort_order = order
+        self.refresh()
+
+    def set_filter(self, condition='', params=()):
+        """Установка условия фильтрации строк (выражение для WHERE)"""
+        self._condition = condition
+        self._params = tuple(params)
+
+    def set_discounts(self, discounts):
+        """Установка скидок по id продукта"""
+        self._discounts = discounts
+
+    def discounts(self):
+        """Скидки по id продукта, используемые моделью"""
+        return self._discounts
+
+    def set_expired(self, expired):
+        """Установка множества id продуктов с истекшим сроком хранения"""
+        self._expired = expired
+
+    def products_changed(self, ids):
+        """Перерисовка загруженных строк продуктов, скидка или срок которых изменились"""
+        if not ids:
+            return
+        if self._sort_column == DISCOUNT_COLUMN:
+            # Изменение скидки меняет порядок строк
+            self.refresh()
+            return
+        for page_no, page in self._pages.items():
+            for offset, row in enumerate(page):
+                if row[0] in ids:
+                    pos = page_no * self.PAGE_SIZE + offset
+                    self.dataChanged.emit(self.index(pos, 0), self.index(pos, len(COLUMNS) - 1))
+
+    def forecasts_changed(self):
+        """Перерисовка загруженных строк после нового расчета прогноза спроса"""
+        if self._sort_column in FORECAST_FIELDS:
+            self.refresh()
+            return
+        self._pages.clear()
+        if self._loaded:
+            self.dataChanged.emit(self.index(0, 0), self.index(self._loaded - 1, len(COLUMNS) - 1))
+
+    def refresh(self):
+        """Перечитывание данных из базы данных"""
+        self.beginResetModel()
+        self._pages.clear()
+        self.cursor.execute(f"SELECT COUNT(*) FROM products WHERE {self._where()}", self._params)
+        self._total = self.cursor.fetchone()[0]
+        self._loaded = min(self.PAGE_SIZE, self._total)
+        self.endResetModel()
+
+    def product_id(self, row):
+        """Получение id продукта по номеру строки"""
+        data = self._row(row)
+        return data[0] if data else None
+
+    def _row(self, row):
+        """Получение строки из кэша с подгрузкой страницы при необходимости"""
+        if row < 0 or row >= self._loaded:
+            return None
+        page_no, offset = divmod(row, self.PAGE_SIZE)
+        page = self._pages.get(page_no)
+        if page is None:
+            page = self._fetch_page(page_no)
+            self._pages[page_no] = page
+            # Вытесняем давно не использованные страницы
+            while len(self._pages) > self.MAX_CACHED_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(page_no)
+        return page[offset] if offset < len(page) else None
+
+    def product_inserted(self, product_id):
+        """Вставка строки добавленного продукта без перезагрузки таблицы"""
+        new_row = self._fetch_product(product_id)
+        if new_row is None:
+            return
+        member, key = self._evaluate(new_row)
+        if member:
+            self._insert_at(self._position(key, product_id))
+
+    def product_updated(self, product_id, old_row=None):
+        """Обновление строки измененного продукта с учетом ее новой позиции"""
+        old_row = old_row or self._cached_row(product_id)
+        new_row = self._fetch_product(product_id)
+        if old_row is None or new_row is None:
+            # Прежнее положение строки неизвестно
+            self.refresh()
+            return
+
+        old_member, old_key = self._evaluate(old_row)
+        new_member, new_key = self._evaluate(new_row)
+        old_pos = self._position(old_key, product_id) if old_member else None
+        new_pos = self._position(new_key, product_id) if new_member else None
+
+        if old_pos is not None and new_pos is not None:
+            self._move(old_pos, new_pos)
+        elif old_pos is not None:
+            self._remove_at(old_pos)
+        elif new_pos is not None:
+            self._insert_at(new_pos)
+
+    def product_deleted(self, product_id, old_row=None):
+        """Удаление строки удаленного продукта без перезагрузки таблицы"""
+        old_row = old_row or self._cached_row(product_id)
+        if old_row is None or self._sort_column in FORECAST_FIELDS:
+            # Прогноз удаленного продукта уже удален триггером, и прежнее
+            # положение строки по нему не вычислить
+            self.refresh()
+            return
+        member, key = self._evaluate(old_row)
+        if member:
+            self._remove_at(self._position(key, product_id))
+
+    def apply_changes(self, changes):
+        """Построчное применение изменений других рабочих мест (sync.changes_since)
+
+        Позиции строк вычисляются по базе данных, где уже есть все изменения
+        списка, поэтому затем кэш страниц сбрасывается, а количество строк
+        сверяется с базой данных.
+        """
+        if self._sort_column == DISCOUNT_COLUMN:
+            # Позиция строки по скидке вычисляется просмотром всей таблицы:
+            # перечитать страницу быстрее
+            self.refresh()
+            return
+        for change, product_id, old_row in changes:
+            if change == PRODUCT_INSERTED:
+                self.product_inserted(product_id)
+            elif change == PRODUCT_UPDATED:
+                self.product_updated(product_id, old_row)
+            else:
+                self.product_deleted(product_id, old_row)
+
+        self.cursor.execute(f"SELECT COUNT(*) FROM products WHERE {self._where()}", self._params)
+        if self.cursor.fetchone()[0] != self._total:
+            # Пока изменения применялись, базу данных изменили еще раз
+            self.refresh()
+            return
+        self._pages.clear()
+        if self._loaded:
+            self.dataChanged.emit(self.index(0, 0), self.index(self._loaded - 1, len(COLUMNS) - 1))
+
+    def _insert_at(self, pos):
+        self._invalidate_from(pos)
+        if pos < self._loaded or self._loaded == self._total:
+            self.beginInsertRows(QModelIndex(), pos, pos)
+            self._total += 1
+            self._loaded += 1
+            self.endInsertRows()
+        else:
+            # Строка за пределами загруженной части появится при прокрутке
+            self._total += 1
+
+    def _remove_at(self, pos):
+        self._invalidate_from(pos)
+        if pos < self._loaded:
+            self.beginRemoveRows(QModelIndex(), pos, pos)
+            self._total -= 1
+            self._loaded -= 1
+            self.endRemoveRows()
+        else:
+            self._total -= 1
+
+    def _move(self, old_pos, new_pos):
+        self._invalidate_from(min(old_pos, new_pos))
+        if old_pos == new_pos:
+            if old_pos < self._loaded:
+                self.dataChanged.emit(self.index(old_pos, 0),
+                                      self.index(old_pos, len(COLUMNS) - 1))
+        elif old_pos < self._loaded and new_pos < self._loaded:
+            # Для перемещения вниз Qt ожидает позицию до удаления строки
+            destination = new_pos + 1 if new_pos > old_pos else new_pos
+            self.beginMoveRows(QModelIndex(), old_pos, old_pos, QModelIndex(), destination)
+            self.endMoveRows()
+        else:
+            self._remove_at(old_pos)
+            self._insert_at(new_pos)
+
+    def _invalidate_from(self, pos):
+        """Удаление из кэша страниц, начиная со страницы строки pos"""
+        first_page = pos // self.PAGE_SIZE
+        for page_no in [p for p in self._pages if p >= first_page]:
+            del self._pages[page_no]
+
+    def _cached_row(self, product_id):
+        for page in self._pages.values():
+            for row in page:
+                if row[0] == product_id:
+                    return row
+        return None
+
+    def _fetch_product(self, product_id):
+        self.cursor.execute(
+            f"SELECT {', '.join(FIELDS)} FROM products WHERE id = ?", (product_id,)
+        )
+        return self.cursor.fetchone()
+
+    def _evaluate(self, row):
+        """Проверка условия фильтра и вычисление ключа сортировки для строки
+
+        Строка подставляется вместо таблицы products через CTE, поэтому
+        условие и ключ вычисляются так же, как в запросах страниц.
+        """
+        self.cursor.execute(f'''
+            WITH products({', '.join(FIELDS)}) AS (VALUES ({', '.join('?' * len(FIELDS))}))
+            SELECT ({self._where()}), {self._order_expression()}
+            FROM products
+        ''', tuple(row[:len(FIELDS)]) + self._params)
+        member, key = self.cursor.fetchone()
+        return bool(member), key
+
+    def _position(self, key, product_id):
+        """Номер строки продукта в текущем порядке сортировки"""
+        expr = self._order_expression()
+        if self._sort_order == Qt.AscendingOrder:
+            # NULL при сортировке по возрастанию идет первым
+            before = f"((? IS NOT NULL AND ({expr} IS NULL OR {expr} < ?)) OR ({expr} IS ? AND id < ?))"
+        else:
+            before = f"((? IS NULL AND {expr} IS NOT NULL) OR {expr} > ? OR ({expr} IS ? AND id > ?))"
+        self.cursor.execute(f'''
+            SELECT COUNT(*) FROM products
+            WHERE ({self._where()}) AND id != ? AND {before}
+        ''', self._params + (product_id, key, key, key, product_id))
+        return self.cursor.fetchone()[0]
+
+    def _where(self):
+        return self._condition or '1'
+
+    def _order_expression(self):
+        if self._sort_column == DISCOUNT_COLUMN:
+            # Скидка не хранится в базе данных и сортируется по той же формуле в SQL
+            return discount_sql()
+        if self._sort_column in FORECAST_FIELDS:
+            return _forecast_sql(FORECAST_FIELDS[self._sort_column])
+        return FIELDS[self._sort_column]
+
+    @timed('table.fetch_page')
+    def _fetch_page(self, page_no):
+        """Загрузка одной страницы строк из базы данных"""
+        direction = 'ASC' if self._sort_order == Qt.AscendingOrder else 'DESC'
+        field = self._order_expression()
+        order_by = f"{field} {direction}" if field == 'id' else f"{field} {direction}, id {direction}"
+        forecast = ', '.join(_forecast_sql(name) for name in FORECAST_FIELDS.values())
+        self.cursor.execute(f'''
+            SELECT {', '.join(FIELDS)}, {forecast}
+            FROM products
+            WHERE {self._where()}
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+        ''', self._params + (self.PAGE_SIZE, page_no * self.PAGE_SIZE))
+        return self.cursor.fetchall()
@@ -0,0 +1,312 @@
+from datetime import date
+
+from instrumentation import timed
+
+
+# Поля таблицы products в порядке столбцов
+FIELDS = [
+    'id', 'name', 'package', 'receipt_date',
+    'storage_days', 'purchase_volume', 'sales_volume', 'price'
+]
+
+# Поля, заполняемые из формы продукта
+DATA_FIELDS = FIELDS[1:]
+
+# Количество продуктов, читаемых одним запросом в групповых операциях
+QUERY_BATCH = 500
+
+# Строки других таблиц, которые триггеры удаляют вместе с продуктом
+# (migrations.py, версии 4 и 7); delete_many сохраняет их для restore_many
+RELATED_TABLES = {
+    'stock_movements': [
+        'id', 'product_id', 'movement_date', 'kind',
+        'purchase_volume', 'sales_volume', 'price', 'income'
+    ],
+    'forecasts': [
+        'product_id', 'daily_sales', 'projected_sales', 'expected_waste',
+        'reorder_quantity', 'forecast_date'
+    ],
+}
+
+# Допустимые значения полей (те же ограничения действуют в форме продукта)
+STORAGE_DAYS_RANGE = (1, 365)
+VOLUME_RANGE = (0, 1000000)
+PRICE_RANGE = (0, 1000000)
+
+# Виды изменений, о которых оповещаются подписчики (те же значения
+# записываются в журнал изменений change_log)
+PRODUCT_INSERTED = 'inserted'
+PRODUCT_UPDATED = 'updated'
+PRODUCT_DELETED = 'deleted'
+
+
+class ConflictError(Exception):
+    """Продукт изменен другим рабочим местом после чтения"""
+
+
+def validate_product(data):
+    """Проверка данных продукта; возвращает текст ошибки или None"""
+    if not data['name']:
+        return "Название продукта не может быть пустым"
+
+    try:
+        date.fromisoformat(data['receipt_date'])
+    except (TypeError, ValueError):
+        return "Некорректная дата поступления"
+
+    checks = [
+        ('storage_days', STORAGE_DAYS_RANGE, "Срок хранения"),
+        ('purchase_volume', VOLUME_RANGE, "Объем закупки"),
+        ('sales_volume', VOLUME_RANGE, "Объем продажи"),
+        ('price', PRICE_RANGE, "Цена"),
+    ]
+    for field, (low, high), title in checks:
+        if not low <= data[field] <= high:
+            return f"{title}: значение должно быть в диапазоне от {low} до {high}"
+
+    if data['purchase_volume'] < data['sales_volume']:
+        return "Объем продажи не может превышать объем закупки"
+
+    return None
+
+
+class ProductRepository:
+    """Запись продуктов в базу данных с оповещением об изменениях
+
+    Подписчики получают вид изменения, id продукта и строку продукта до
+    изменения (None при добавлении), чтобы обновить только затронутые данные.
+    Групповые операции оповещают подписчиков subscribe_many один раз списком
+    таких троек. last_changes - номера в журнале change_log изменений
+    последней операции, выполненной через этот репозиторий.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self._listeners = []
+        self._batch_listeners = []
+        self.last_changes = range(0)
+
+    def subscribe(self, callback):
+        """Подписка на изменения: callback(change, product_id, old_row)"""
+        self._listeners.append(callback)
+
+    def subscribe_many(self, callback):
+        """Подписка на групповые изменения: callback([(change, product_id, old_row), ...])"""
+        self._batch_listeners.append(callback)
+
+    def get_row(self, product_id):
+        """Строка продукта в порядке FIELDS или None"""
+        self.cursor.execute(
+            f"SELECT {', '.join(FIELDS)} FROM products WHERE id = ?", (product_id,)
+        )
+        return self.cursor.fetchone()
+
+    def get(self, product_id):
+        """Данные продукта в виде словаря для формы вместе с row_version или None"""
+        self.cursor.execute(
+            f"SELECT {', '.join(FIELDS)}, row_version FROM products WHERE id = ?", (product_id,)
+        )
+        row = self.cursor.fetchone()
+        return dict(zip(FIELDS + ['row_version'], row)) if row else None
+
+    def get_rows(self, ids):
+        """Строки продуктов ids вместе с row_version: {id: (строка в порядке FIELDS, row_version)}"""
+        ids = list(ids)
+        rows = {}
+        for start in range(0, len(ids), QUERY_BATCH):
+            batch = ids[start:start + QUERY_BATCH]
+            self.cursor.execute(f'''
+                SELECT {', '.join(FIELDS)}, row_version
+                FROM products WHERE id IN ({', '.join('?' * len(batch))})
+            ''', batch)
+            for *row, row_version in self.cursor.fetchall():
+                rows[row[0]] = (tuple(row), row_version)
+        return rows
+
+    @timed('product.add')
+    def add(self, data):
+        """Добавление продукта, возвращает id новой записи"""
+        self.cursor.execute(f'''
+            INSERT INTO products ({', '.join(DATA_FIELDS)})
+            VALUES ({', '.join('?' * len(DATA_FIELDS))})
+        ''', tuple(data[field] for field in DATA_FIELDS))
+        product_id = self.cursor.lastrowid
+        self._commit(1)
+        self._notify(PRODUCT_INSERTED, product_id, None)
+        return product_id
+
+    @timed('product.update')
+    def update(self, product_id, data, row_version=None):
+        """Изменение продукта, возвращает id измененной записи
+
+        Если задан row_version (из get), продукт изменяется, только если с тех
+        пор его не изменили; иначе - ConflictError. Если продукта нет, возвращает None.
+        """
+        condition, params = 'id = ?', (product_id,)
+        if row_version is not None:
+            condition, params = 'id = ? AND row_version = ?', (product_id, row_version)
+
+        # Строка до изменения читается в той же транзакции
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            old_row = self.get_row(product_id)
+            if old_row is None:
+                self.conn.rollback()
+                return None
+            self.cursor.execute(f'''
+                UPDATE products SET
+                    {', '.join(f'{field} = ?' for field in DATA_FIELDS)}
+                WHERE {condition}
+            ''', tuple(data[field] for field in DATA_FIELDS) + params)
+            if self.cursor.rowcount == 0:
+                raise ConflictError(f"Продукт {product_id} изменен на другом рабочем месте")
+            self._commit(self.cursor.rowcount)
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._notify(PRODUCT_UPDATED, product_id, old_row)
+        return product_id
+
+    @timed('product.delete')
+    def delete(self, product_id):
+        """Удаление продукта, возвращает id удаленной записи (None, если продукта нет)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            old_row = self.get_row(product_id)
+            if old_row is None:
+                self.conn.rollback()
+                return None
+            self.cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            self._commit(self.cursor.rowcount)
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._notify(PRODUCT_DELETED, product_id, old_row)
+        return product_id
+
+    @timed('product.update_many')
+    def update_many(self, field, values, row_versions=None):
+        """Изменение поля field нескольких продуктов одним executemany в одной транзакции
+
+        values - {id продукта: новое значение}. Если задан row_versions
+        ({id: row_version}), продукты, измененные с тех пор, пропускаются.
+        Возвращает {id: новый row_version} измененных продуктов и их строки
+        до изменения {id: строка}.
+        """
+        if field not in DATA_FIELDS:
+            raise ValueError(f"Неизвестное поле продукта: {field}")
+        sql = f"UPDATE products SET {field} = ? WHERE id = ?"
+        if row_versions is None:
+            params = [(value, product_id) for product_id, value in values.items()]
+        else:
+            sql += " AND row_version = ?"
+            params = [(value, product_id, row_versions[product_id])
+                      for product_id, value in values.items()]
+
+        # Строки до изменения и новые версии читаются в той же транзакции
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            old_rows = self.get_rows(values)
+            self.cursor.executemany(sql, params)
+            first = self._commit(self.cursor.rowcount, commit=False)
+            versions = {
+                product_id: row_version
+                for product_id, (_, row_version) in self.get_rows(values).items()
+                if row_version >= first
+            }
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        old_rows = {product_id: old_rows[product_id][0] for product_id in versions}
+        self._notify_many([(PRODUCT_UPDATED, product_id, row) for product_id, row in old_rows.items()])
+        return versions, old_rows
+
+    @timed('product.delete_many')
+    def delete_many(self, ids):
+        """Удаление нескольких продуктов в одной транзакции
+
+        Возвращает строки удаленных продуктов и их строки из RELATED_TABLES
+        ({таблица: строки}), удаленные триггерами, - для restore_many.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [row for row, _ in self.get_rows(ids).values()]
+            related = self._related_rows([row[0] for row in rows])
+            self.cursor.executemany("DELETE FROM products WHERE id = ?", [(row[0],) for row in rows])
+            self._commit(self.cursor.rowcount)
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._notify_many([(PRODUCT_DELETED, row[0], row) for row in rows])
+        return rows, related
+
+    @timed('product.restore_many')
+    def restore_many(self, rows, related=None):
+        """Восстановление удаленных продуктов с прежними id (результат delete_many)
+
+        Движения запасов и прогнозы related возвращаются вместо движения
+        поступления, которое триггер записывает при добавлении продукта,
+        поэтому доход по месяцам становится прежним.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.cursor.executemany(f'''
+                INSERT INTO products ({', '.join(FIELDS)})
+                VALUES ({', '.join('?' * len(FIELDS))})
+            ''', rows)
+            changes = self.cursor.rowcount
+            if related is not None:
+                self.cursor.executemany(
+                    "DELETE FROM stock_movements WHERE product_id = ?", [(row[0],) for row in rows]
+                )
+                for table, fields in RELATED_TABLES.items():
+                    self.cursor.executemany(f'''
+                        INSERT INTO {table} ({', '.join(fields)})
+                        VALUES ({', '.join('?' * len(fields))})
+                    ''', related[table])
+            self._commit(changes)
+        except Exception:
+            self.conn.rollback()
+            raise
+        self._notify_many([(PRODUCT_INSERTED, row[0], None) for row in rows])
+
+    def _related_rows(self, ids):
+        """Строки RELATED_TABLES продуктов ids: {таблица: строки}"""
+        related = {table: [] for table in RELATED_TABLES}
+        for start in range(0, len(ids), QUERY_BATCH):
+            batch = ids[start:start + QUERY_BATCH]
+            for table, fields in RELATED_TABLES.items():
+                self.cursor.execute(f'''
+                    SELECT {', '.join(fields)} FROM {table}
+                    WHERE product_id IN ({', '.join('?' * len(batch))})
+                ''', batch)
+                related[table].extend(self.cursor.fetchall())
+        return related
+
+    def _commit(self, changes, commit=True):
+        """Фиксация транзакции с учетом номеров changes ее записей в журнале
+
+        Номера читаются до фиксации: пока транзакция записи открыта, другие
+        рабочие места не могут добавить свои изменения в журнал, поэтому
+        изменения транзакции - последние changes номеров. Возвращает первый из них.
+        """
+        self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+        row = self.cursor.fetchone()
+        last = row[0] if row else 0
+        self.last_changes = range(last - changes + 1, last + 1)
+        if commit:
+            self.conn.commit()
+        return last - changes + 1
+
+    def _notify(self, change, product_id, old_row):
+        for callback in self._listeners:
+            callback(change, product_id, old_row)
+
+    def _notify_many(self, changes):
+        if not changes:
+            return
+        for callback in self._batch_listeners:
+            callback(changes)
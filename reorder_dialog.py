@@ -0,0 +1,117 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import Qt, Signal
+
+from demand import REORDER_COVER_DAYS, forecast_date, reorder_count, reorder_page
+
+
+class ReorderDialog(QDialog):
+    """Продукты с рекомендуемым дозаказом по прогнозу спроса (demand.py)"""
+
+    PAGE_SIZE = 100
+    # Формат остатка, продаж в день, продаж до конца срока, непроданного и дозаказа
+    FORMATS = ["{:,.1f}"] * 4 + ["{:,.0f}"]
+
+    # Запрошен новый расчет прогноза
+    recalculate = Signal()
+
+    def __init__(self, cursor, parent=None):
+        super().__init__(parent)
+        self.cursor = cursor
+
+        self.setWindowTitle("Дозаказ")
+        self.setMinimumSize(900, 600)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        header = QHBoxLayout()
+        self.date_label = QLabel()
+        self.recalculate_btn = QPushButton("Пересчитать прогноз")
+        self.recalculate_btn.clicked.connect(self.recalculate)
+        header.addWidget(self.date_label, 1)
+        header.addWidget(self.recalculate_btn)
+        layout.addLayout(header)
+
+        self.table = QTableWidget(0, 7)
+        self.table.setHorizontalHeaderLabels([
+            "Название", "Упаковка", "Остаток", "Продажи в день",
+            "Продажи до конца срока", "Не будет продано", "Дозаказ"
+        ])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        navigation = QHBoxLayout()
+        self.prev_btn = QPushButton("Назад")
+        self.prev_btn.clicked.connect(self.show_previous)
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.next_btn = QPushButton("Далее")
+        self.next_btn.clicked.connect(self.show_next)
+        navigation.addWidget(self.prev_btn)
+        navigation.addWidget(self.page_label)
+        navigation.addWidget(self.next_btn)
+        layout.addLayout(navigation)
+
+        self.reload()
+
+    def reload(self):
+        """Чтение прогноза с первой страницы (после нового расчета)"""
+        date = forecast_date(self.cursor)
+        if date:
+            self.date_label.setText(
+                f"Прогноз от {date}. Дозаказ рассчитан на {REORDER_COVER_DAYS} дней продаж "
+                f"(не больше срока хранения)"
+            )
+        else:
+            self.date_label.setText("Прогноз еще не рассчитан")
+        self.total = reorder_count(self.cursor)
+        # Страницы читаются по ключу (дозаказ, id) последней строки предыдущей
+        self.starts = [None]
+        self.rows = []
+        self.load_page()
+
+    def load_page(self):
+        """Загрузка текущей страницы"""
+        self.rows = reorder_page(self.cursor, self.starts[-1], self.PAGE_SIZE)
+
+        self.table.setRowCount(len(self.rows))
+        for i, (_, name, package, *values) in enumerate(self.rows):
+            self.table.setItem(i, 0, QTableWidgetItem(name))
+            self.table.setItem(i, 1, QTableWidgetItem(package or ""))
+            for column, (value, fmt) in enumerate(zip(values, self.FORMATS), 2):
+                item = QTableWidgetItem(fmt.format(value) if value is not None else "")
+                item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(i, column, item)
+
+        first = (len(self.starts) - 1) * self.PAGE_SIZE
+        if self.rows:
+            self.page_label.setText(f"{first + 1}–{first + len(self.rows)} из {self.total}")
+        else:
+            self.page_label.setText("Нет продуктов для дозаказа")
+        self.prev_btn.setEnabled(len(self.starts) > 1)
+        self.next_btn.setEnabled(first + len(self.rows) < self.total)
+
+    def set_running(self, running):
+        """Кнопка пересчета недоступна, пока идет расчет"""
+        self.recalculate_btn.setEnabled(not running)
+
+    @staticmethod
+    def row_key(row):
+        """Ключ строки для чтения следующей страницы: (дозаказ, id)"""
+        return (row[-1], row[0])
+
+    def show_next(self):
+        """Следующая страница"""
+        if self.next_btn.isEnabled():
+            self.starts.append(self.row_key(self.rows[-1]))
+            self.load_page()
+
+    def show_previous(self):
+        """Предыдущая страница"""
+        if len(self.starts) > 1:
+            self.starts.pop()
+            self.load_page()
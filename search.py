@@ -0,0 +1,32 @@
+import re
+
+
+# Максимальное количество результатов поиска
+SEARCH_LIMIT = 500
+
+_WORD = re.compile(r'\w+')
+
+
+def build_match_query(text):
+    """Запрос FTS5 по введенному тексту: все слова как префиксы
+
+    Возвращает None, если в тексте нет слов.
+    """
+    text = text.replace('ё', 'е').replace('Ё', 'Е')
+    words = _WORD.findall(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_ids(cursor, text, limit=SEARCH_LIMIT):
+    """id продуктов, название или упаковка которых содержит слова, начинающиеся с введенных"""
+    query = build_match_query(text)
+    if query is None:
+        return []
+    cursor.execute('''
+        SELECT rowid FROM products_fts
+        WHERE products_fts MATCH ?
+        LIMIT ?
+    ''', (query, limit))
+    return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,334 @@
+"""Операции магазина без графического интерфейса
+
+StoreService объединяет запись продуктов (ProductRepository), расчет скидок,
+поиск, доход и прогноз; методы чтения - в базовом классе StoreReader.
+Используется главным окном и HTTP API (api_server.py). Чтение выполняется через пул соединений Database.reader(),
+поэтому методы чтения можно вызывать из нескольких потоков одновременно;
+запись - через одно соединение под блокировкой.
+"""
+import math
+import threading
+
+from analytics import (
+    FORECAST_HORIZON, STOCK_BY_PRODUCT, STOCK_BY_PACKAGE,
+    calculate_income_trend, predict_future_income, collect_series
+)
+from discounts import calculate_discounts, discount_sql
+from exporter import PRODUCT_COLUMNS
+from products import (
+    DATA_FIELDS, FIELDS, PRICE_RANGE, STORAGE_DAYS_RANGE,
+    ConflictError, ProductRepository, validate_product
+)
+from search import SEARCH_LIMIT, search_ids
+
+
+# Размер страницы списка продуктов по умолчанию и наибольший
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Наибольшие LIMIT + OFFSET: параметры SQLite - 64-битные целые
+MAX_OFFSET = 2 ** 63 - 1
+
+# Поля строки продукта в ответах (как в выгрузке продуктов) и номер его
+# последнего изменения для update_product
+PRODUCT_FIELDS = [name for name, _ in PRODUCT_COLUMNS] + ['row_version']
+
+# Поля строки списка продуктов со скидкой
+DISCOUNT_FIELDS = ['id', 'name', 'original_price', 'discount_percent',
+                   'discounted_price', 'expiry_date']
+
+# Сортировка списка: поля продукта, остаток, срок годности и скидка
+SORT_FIELDS = FIELDS + ['stock', 'expiry_date', 'discount_percent']
+
+# Приведение значений продукта из запроса к типам полей
+FIELD_TYPES = {
+    'name': str,
+    'package': str,
+    'receipt_date': str,
+    'storage_days': int,
+    'purchase_volume': float,
+    'sales_volume': float,
+    'price': float,
+}
+
+
+class NotFoundError(LookupError):
+    """Продукт не найден"""
+
+
+class ValidationError(ValueError):
+    """Некорректные данные или параметры запроса"""
+
+
+def product_data(values):
+    """Данные продукта из словаря запроса с проверкой как в форме продукта"""
+    if not isinstance(values, dict):
+        raise ValidationError("Ожидался объект с полями продукта")
+    missing = [field for field in DATA_FIELDS if field not in values and field != 'package']
+    if missing:
+        raise ValidationError(f"Нет полей: {', '.join(missing)}")
+
+    data = {}
+    for field in DATA_FIELDS:
+        value = values.get(field)
+        if field == 'package' and value is None:
+            value = ''
+        kind = FIELD_TYPES[field]
+        if isinstance(value, float) and not math.isfinite(value):
+            raise ValidationError(f"Поле {field}: ожидалось конечное число")
+        if kind is int and isinstance(value, float) and value != int(value):
+            raise ValidationError(f"Поле {field}: ожидалось целое число")
+        if kind is not str and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            raise ValidationError(f"Поле {field}: ожидалось число")
+        if kind is str and not isinstance(value, str):
+            raise ValidationError(f"Поле {field}: ожидалась строка")
+        try:
+            data[field] = kind(value).strip() if kind is str else kind(value)
+        except OverflowError:
+            # Целое JSON, не представимое float
+            raise ValidationError(f"Поле {field}: значение вне допустимого диапазона")
+
+    error = validate_product(data)
+    if error:
+        raise ValidationError(error)
+    return data
+
+
+def page_bounds(page, page_size):
+    """Проверка номера и размера страницы; возвращает (LIMIT, OFFSET)"""
+    if page < 0:
+        raise ValidationError("Номер страницы не может быть отрицательным")
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValidationError(f"Размер страницы должен быть от 1 до {MAX_PAGE_SIZE}")
+    if (page + 1) * page_size > MAX_OFFSET:
+        raise ValidationError("Слишком большой номер страницы")
+    return page_size, page * page_size
+
+
+class StoreReader:
+    """Продукты, скидки и аналитика магазина (только чтение)
+
+    database - database.Database или database.ReadOnlyDatabase: все запросы
+    выполняются через пул соединений database.reader().
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def list_products(self, page=0, page_size=PAGE_SIZE, sort='id', descending=False,
+                      query=None, today=None):
+        """Страница продуктов со скидками
+
+        query - текст поиска по названию и упаковке (не более SEARCH_LIMIT
+        найденных продуктов). Возвращает словарь: page, page_size, total, items.
+        """
+        limit, offset = page_bounds(page, page_size)
+        total, items = self.product_rows(limit, offset, sort, descending, query, today)
+        return {'page': page, 'page_size': page_size, 'total': total, 'items': items}
+
+    def product_rows(self, limit, offset=0, sort='id', descending=False, query=None, today=None):
+        """Продукты со скидками (без ограничения размера страницы): (всего, строки)
+
+        Строки - словари с полями PRODUCT_FIELDS в порядке сортировки sort;
+        при равенстве - по id в том же направлении.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValidationError(f"Сортировка возможна по полям: {', '.join(SORT_FIELDS)}")
+        direction = 'DESC' if descending else 'ASC'
+        order_by = 'id' if sort == 'id' else f"{sort} {direction}, id"
+
+        with self.database.reader() as conn:
+            cursor = conn.cursor()
+            condition, params = '1', ()
+            if query is not None and query.strip():
+                ids = search_ids(cursor, query)
+                condition = f"id IN ({', '.join('?' * len(ids))})" if ids else '0'
+                params = tuple(ids)
+
+            cursor.execute(f"SELECT COUNT(*) FROM products WHERE {condition}", params)
+            total = cursor.fetchone()[0]
+            cursor.execute(f'''
+                SELECT {self._product_columns()}
+                FROM (SELECT *, {discount_sql(today)} AS discount_percent
+                      FROM products WHERE {condition})
+                ORDER BY {order_by} {direction}
+                LIMIT ? OFFSET ?
+            ''', params + (limit, offset))
+            items = [dict(zip(PRODUCT_FIELDS, row)) for row in cursor.fetchall()]
+        return total, items
+
+    def get_product(self, product_id, today=None):
+        """Продукт со скидкой; NotFoundError, если его нет"""
+        with self.database.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {self._product_columns()}
+                FROM (SELECT *, {discount_sql(today)} AS discount_percent
+                      FROM products WHERE id = ?)
+            ''', (product_id,))
+            row = cursor.fetchone()
+        if row is None:
+            raise NotFoundError(f"Продукт {product_id} не найден")
+        return dict(zip(PRODUCT_FIELDS, row))
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """id продуктов, найденных по названию или упаковке"""
+        with self.database.reader() as conn:
+            return search_ids(conn.cursor(), text, limit)
+
+    def discounts(self, page=0, page_size=PAGE_SIZE, today=None):
+        """Страница продуктов со скидкой (по убыванию скидки)"""
+        limit, offset = page_bounds(page, page_size)
+        total, items = self.discount_rows(limit, offset, today)
+        return {'page': page, 'page_size': page_size, 'total': total, 'items': items}
+
+    def discount_rows(self, limit, offset=0, today=None):
+        """Продукты со скидкой по убыванию скидки, затем по id: (всего, строки)"""
+        percent = discount_sql(today)
+        with self.database.reader() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT COUNT(*) FROM products WHERE {percent} > 0")
+            total = cursor.fetchone()[0]
+            cursor.execute(f'''
+                SELECT id, name, price, discount_percent,
+                       ROUND(price * (1 - discount_percent / 100.0), 2), expiry_date
+                FROM (SELECT *, {percent} AS discount_percent FROM products)
+                WHERE discount_percent > 0
+                ORDER BY discount_percent DESC, id
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+            items = [dict(zip(DISCOUNT_FIELDS, row)) for row in cursor.fetchall()]
+        return total, items
+
+    def calculate_discounts(self, today=None):
+        """Скидки всех продуктов: {id продукта: данные о скидке}"""
+        with self.database.reader() as conn:
+            return calculate_discounts(conn.cursor(), today)
+
+    def income_trend(self):
+        """Доход по месяцам: список пар (месяц, доход)"""
+        with self.database.reader() as conn:
+            return calculate_income_trend(conn.cursor())
+
+    def forecast(self, months=FORECAST_HORIZON):
+        """Доход по месяцам и прогноз на months месяцев"""
+        income = self.income_trend()
+        return {'income': income, 'forecast': predict_future_income(income, months)}
+
+    def analytics(self, stock_group=STOCK_BY_PRODUCT):
+        """Данные графиков вкладки "Аналитика" """
+        if stock_group not in (STOCK_BY_PRODUCT, STOCK_BY_PACKAGE):
+            raise ValidationError(f"Группировка запасов: {STOCK_BY_PRODUCT} или {STOCK_BY_PACKAGE}")
+        with self.database.reader() as conn:
+            return collect_series(conn, stock_group=stock_group)
+
+    @staticmethod
+    def _product_columns():
+        return f'''
+            {', '.join(FIELDS)}, stock, expiry_date,
+            discount_percent, ROUND(price * (1 - discount_percent / 100.0), 2), row_version
+        '''
+
+
+class StoreService(StoreReader):
+    """Продукты, скидки и аналитика магазина
+
+    conn - соединение для записи; если не задано, открывается отдельное
+    (database.connect()) и закрывается в close().
+    """
+
+    def __init__(self, database, conn=None):
+        super().__init__(database)
+        self._own_conn = conn is None
+        self.conn = conn or database.connect()
+        self.products = ProductRepository(self.conn)
+        self._write_lock = threading.Lock()
+
+    def close(self):
+        if self._own_conn:
+            self.conn.close()
+
+    # Запись
+
+    def add_product(self, values):
+        """Добавление продукта; возвращает id новой записи"""
+        data = product_data(values)
+        with self._write_lock:
+            return self.products.add(data)
+
+    def update_product(self, product_id, values, row_version=None):
+        """Изменение продукта; NotFoundError, если его нет
+
+        Если задан row_version, а продукт с тех пор изменили, - ConflictError.
+        """
+        data = product_data(values)
+        if row_version is not None and (isinstance(row_version, bool)
+                                        or not isinstance(row_version, int)):
+            raise ValidationError("Поле row_version: ожидалось целое число")
+        with self._write_lock:
+            updated_id = self.products.update(product_id, data, row_version)
+        if updated_id is None:
+            raise NotFoundError(f"Продукт {product_id} не найден")
+        return updated_id
+
+    def delete_product(self, product_id):
+        """Удаление продукта; NotFoundError, если его нет"""
+        with self._write_lock:
+            deleted_id = self.products.delete(product_id)
+        if deleted_id is None:
+            raise NotFoundError(f"Продукт {product_id} не найден")
+        return deleted_id
+
+    # Групповые операции
+
+    def new_prices(self, ids, percent=None, price=None):
+        """Новые цены продуктов ids: изменение на percent процентов или цена price
+
+        Возвращает {id: новая цена} и {id: row_version} для update_products.
+        """
+        return self._new_values(ids, 'price', PRICE_RANGE, "Цена", lambda row: (
+            round((row[FIELDS.index('price')] or 0) * (1 + percent / 100), 2)
+            if percent is not None else price
+        ))
+
+    def new_storage_days(self, ids, days):
+        """Новый срок хранения продуктов ids (значения для update_products)"""
+        return self._new_values(ids, 'storage_days', STORAGE_DAYS_RANGE, "Срок хранения",
+                                lambda row: days)
+
+    def update_products(self, field, values, row_versions=None):
+        """Изменение поля field нескольких продуктов одной транзакцией
+
+        Продукты, row_version которых не совпадает с row_versions, пропускаются.
+        Возвращает {id: новый row_version} и {id: строка до изменения}
+        измененных продуктов.
+        """
+        with self._write_lock:
+            return self.products.update_many(field, values, row_versions)
+
+    def delete_products(self, ids):
+        """Удаление нескольких продуктов одной транзакцией
+
+        Возвращает их строки и связанные строки для restore_products.
+        """
+        with self._write_lock:
+            return self.products.delete_many(ids)
+
+    def restore_products(self, rows, related=None):
+        """Восстановление продуктов, удаленных delete_products"""
+        with self._write_lock:
+            self.products.restore_many(rows, related)
+
+    def _new_values(self, ids, field, value_range, title, value):
+        rows = self.products.get_rows(ids)
+        if not rows:
+            raise NotFoundError("Выбранные продукты не найдены")
+        values = {product_id: value(row) for product_id, (row, _) in rows.items()}
+        low, high = value_range
+        invalid = [product_id for product_id, new in values.items() if not low <= new <= high]
+        if invalid:
+            raise ValidationError(
+                f"{title}: значение должно быть в диапазоне от {low} до {high} "
+                f"(продуктов вне диапазона: {len(invalid)})"
+            )
+        return values, {product_id: row_version for product_id, (_, row_version) in rows.items()}
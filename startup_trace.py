@@ -0,0 +1,78 @@
+"""Замер времени запуска приложения
+
+Включается переменной окружения STORE_STARTUP_TRACE=1 (или true, yes, on).
+Отметки времени от импорта этого модуля записываются в startup.log в
+директории приложения и дублируются в stderr, если он доступен (в собранном
+приложении его нет).
+"""
+import os
+import sys
+import time
+
+from PySide6.QtCore import QObject, QEvent
+
+
+# Значения переменной окружения, включающие замер
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+ENABLED = os.environ.get('STORE_STARTUP_TRACE', '').strip().lower() in TRUE_VALUES
+LOG_NAME = 'startup.log'
+
+_start = time.perf_counter()
+_last = _start
+_log_path = None
+# Строки, записанные до того, как стала известна директория журнала
+_pending = []
+
+
+def set_log_dir(path):
+    """Установка директории для файла журнала"""
+    global _log_path
+    _log_path = os.path.join(path, LOG_NAME)
+    if _pending:
+        _write(_pending)
+        _pending.clear()
+
+
+def mark(label):
+    """Отметка этапа запуска: время с начала и с предыдущей отметки"""
+    global _last
+    if not ENABLED:
+        return
+    now = time.perf_counter()
+    line = (f"[startup] {(now - _start) * 1000:9.1f} мс "
+            f"(+{(now - _last) * 1000:7.1f} мс)  {label}")
+    _last = now
+
+    if sys.stderr is not None:
+        print(line, file=sys.stderr)
+    if _log_path:
+        _write([line])
+    else:
+        _pending.append(line)
+
+
+def _write(lines):
+    with open(_log_path, 'a', encoding='utf-8') as log:
+        log.writelines(line + '\n' for line in lines)
+
+
+class _FirstPaintFilter(QObject):
+    """Фильтр событий, отмечающий первую отрисовку виджета"""
+
+    def __init__(self, label, parent):
+        super().__init__(parent)
+        self.label = label
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            mark(self.label)
+            self.deleteLater()
+        return False
+
+
+def watch_first_paint(widget, label):
+    """Отметка момента первой отрисовки виджета"""
+    if ENABLED:
+        widget.installEventFilter(_FirstPaintFilter(label, widget))
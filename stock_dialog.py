@@ -0,0 +1,91 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+    QPushButton, QTableWidget, QTableWidgetItem, QHeaderView
+)
+from PySide6.QtCore import Qt
+
+from analytics import (
+    STOCK_TOP_N, STOCK_BY_PACKAGE, stock_page, stock_item_count
+)
+
+class StockDetailsDialog(QDialog):
+    """Постраничный просмотр позиций, вошедших в "Прочее" на графике запасов"""
+
+    PAGE_SIZE = 100
+
+    def __init__(self, cursor, group_by, parent=None):
+        super().__init__(parent)
+        self.cursor = cursor
+        self.group_by = group_by
+        
+        self.setWindowTitle("Распределение запасов: остальные позиции")
+        self.setMinimumSize(500, 600)
+        
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        
+        self.table = QTableWidget(0, 2)
+        title = "Упаковка" if group_by == STOCK_BY_PACKAGE else "Название"
+        self.table.setHorizontalHeaderLabels([title, "Остаток (кг)"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+        
+        navigation = QHBoxLayout()
+        self.prev_btn = QPushButton("Назад")
+        self.prev_btn.clicked.connect(self.show_previous)
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.next_btn = QPushButton("Далее")
+        self.next_btn.clicked.connect(self.show_next)
+        navigation.addWidget(self.prev_btn)
+        navigation.addWidget(self.page_label)
+        navigation.addWidget(self.next_btn)
+        layout.addLayout(navigation)
+        
+        # Страницы читаются по ключу последней позиции предыдущей страницы;
+        # первая страница начинается после позиций, показанных на графике
+        self.total = max(0, stock_item_count(cursor, group_by) - STOCK_TOP_N)
+        top = stock_page(cursor, limit=STOCK_TOP_N, group_by=group_by)
+        self.starts = [self.row_key(top[-1]) if len(top) == STOCK_TOP_N else None]
+        self.rows = []
+        self.load_page()
+        
+    @staticmethod
+    def row_key(row):
+        """Ключ позиции для чтения следующей страницы: (остаток, ключ)"""
+        key, _, stock = row
+        return (stock, key)
+        
+    def load_page(self):
+        """Загрузка текущей страницы"""
+        self.rows = []
+        if self.total:
+            self.rows = stock_page(self.cursor, self.starts[-1], self.PAGE_SIZE, self.group_by)
+        
+        self.table.setRowCount(len(self.rows))
+        for i, (_, label, stock) in enumerate(self.rows):
+            self.table.setItem(i, 0, QTableWidgetItem(str(label)))
+            item = QTableWidgetItem(f"{stock:,.1f}")
+            item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+            self.table.setItem(i, 1, item)
+        
+        first = (len(self.starts) - 1) * self.PAGE_SIZE
+        if self.rows:
+            self.page_label.setText(f"{first + 1}–{first + len(self.rows)} из {self.total}")
+        else:
+            self.page_label.setText("Нет позиций")
+        self.prev_btn.setEnabled(len(self.starts) > 1)
+        self.next_btn.setEnabled(first + len(self.rows) < self.total)
+        
+    def show_next(self):
+        """Следующая страница"""
+        if self.next_btn.isEnabled():
+            self.starts.append(self.row_key(self.rows[-1]))
+            self.load_page()
+            
+    def show_previous(self):
+        """Предыдущая страница"""
+        if len(self.starts) > 1:
+            self.starts.pop()
+            self.load_page()
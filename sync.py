@@ -0,0 +1,157 @@
+"""Изменения продуктов, сделанные другими рабочими местами с той же базой данных
+
+Триггеры записывают каждое изменение продукта в журнал change_log
+(migrations.py, версия 6). Каждая копия программы помнит номер последнего
+прочитанного изменения и читает только более поздние, поэтому таблица
+обновляется построчно, без полной перезагрузки.
+
+О записи в базу данных сообщает QFileSystemWatcher (изменение файла WAL);
+такие уведомления поддерживаются не всеми файловыми системами, поэтому база
+данных дополнительно проверяется по таймеру. Проверка дешевая: журнал читается,
+только если изменился PRAGMA data_version, то есть другое соединение
+зафиксировало транзакцию.
+"""
+import os
+
+from PySide6.QtCore import QObject, QFileSystemWatcher, QTimer, Signal
+
+from products import PRODUCT_INSERTED, PRODUCT_UPDATED, PRODUCT_DELETED
+
+
+# Период проверки базы данных по таймеру (мс)
+POLL_INTERVAL = 2000
+
+# Задержка после изменения файла (мс): серия записей читается один раз
+WATCH_DELAY = 100
+
+# Если изменений больше, таблица перечитывается целиком: обновление одной
+# строки занимает 15-25 мс на 100 тыс. продуктов
+PATCH_LIMIT = 20
+
+def current_seq(cursor):
+    """Номер последнего изменения в журнале (0, если изменений не было)"""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def changes_since(cursor, seq, limit=PATCH_LIMIT, skip=()):
+    """Изменения продуктов с номерами больше seq
+
+    Несколько изменений одного продукта объединяются в одно: вид итогового
+    изменения и строка продукта до первого из них. Изменения с номерами из
+    skip (сделанные этим рабочим местом) пропускаются.
+
+    Возвращает (номер последнего прочитанного изменения, список троек
+    (вид, id продукта, строка до изменения или None)). Вместо списка
+    возвращается None, если изменений больше limit или часть журнала уже
+    удалена: тогда данные нужно перечитать целиком.
+    """
+    cursor.execute('''
+        SELECT seq, change, product_id, old_name, old_package, old_receipt_date,
+               old_storage_days, old_purchase_volume, old_sales_volume, old_price
+        FROM change_log
+        WHERE seq > ?
+        ORDER BY seq
+        LIMIT ?
+    ''', (seq, limit + len(skip) + 1))
+    rows = cursor.fetchall()
+    if not rows:
+        return seq, []
+    last = rows[-1][0]
+    if rows[0][0] > seq + 1 or len(rows) > limit + len(skip):
+        return current_seq(cursor), None
+
+    # id продукта -> [вид первого изменения, строка до него, вид последнего]
+    products = {}
+    for change_seq, change, product_id, *old in rows:
+        if change_seq in skip:
+            continue
+        entry = products.get(product_id)
+        if entry is None:
+            old_row = None if change == PRODUCT_INSERTED else (product_id, *old)
+            products[product_id] = [change, old_row, change]
+        else:
+            entry[2] = change
+
+    changes = []
+    for product_id, (first, old_row, last_change) in products.items():
+        # Продукт существовал до изменений, если первое из них - не добавление
+        # (удаленный продукт можно восстановить с прежним id, отменив удаление),
+        # и существует после них, если последнее - не удаление
+        if first == PRODUCT_INSERTED:
+            if last_change != PRODUCT_DELETED:
+                changes.append((PRODUCT_INSERTED, product_id, None))
+        elif last_change == PRODUCT_DELETED:
+            changes.append((PRODUCT_DELETED, product_id, old_row))
+        else:
+            changes.append((PRODUCT_UPDATED, product_id, old_row))
+    if len(changes) > limit:
+        return last, None
+    return last, changes
+
+
+class ChangeWatcher(QObject):
+    """Оповещение об изменениях продуктов, сделанных другими рабочими местами
+
+    Сигнал changed передает список троек (вид, id продукта, строка до
+    изменения) или None, если данные нужно перечитать целиком.
+    """
+
+    changed = Signal(object)
+
+    def __init__(self, conn, path, parent=None):
+        super().__init__(parent)
+        self.cursor = conn.cursor()
+        self.paths = [path, path + '-wal']
+        self.last_seq = current_seq(self.cursor)
+        # Номера изменений этого рабочего места, еще не прочитанные из журнала
+        self._own = set()
+        self._data_version = self._read_data_version()
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_file_changed)
+        self._watch()
+
+        self.delay = QTimer(self)
+        self.delay.setSingleShot(True)
+        self.delay.setInterval(WATCH_DELAY)
+        self.delay.timeout.connect(self.poll)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(POLL_INTERVAL)
+        self.timer.timeout.connect(self.poll)
+        self.timer.start()
+
+    def poll(self):
+        """Чтение журнала, если другое соединение изменило базу данных"""
+        data_version = self._read_data_version()
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self.check()
+
+    def check(self):
+        """Чтение новых изменений из журнала и оповещение о них"""
+        self.last_seq, changes = changes_since(self.cursor, self.last_seq, skip=self._own)
+        self._own = {seq for seq in self._own if seq > self.last_seq}
+        if changes is None or changes:
+            self.changed.emit(changes)
+
+    def local_change(self, seqs):
+        """Изменения этого рабочего места (номера seqs в журнале) уже применены"""
+        self._own.update(seq for seq in seqs if seq > self.last_seq)
+
+    def _read_data_version(self):
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0]
+
+    def _watch(self):
+        watched = set(self.watcher.files())
+        missing = [path for path in self.paths if path not in watched and os.path.exists(path)]
+        if missing:
+            self.watcher.addPaths(missing)
+
+    def _on_file_changed(self, path):
+        # После удаления или замены файла наблюдение за ним прекращается
+        self._watch()
+        self.delay.start()
@@ -0,0 +1,279 @@
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+import instrumentation
+from analytics import STOCK_BY_PRODUCT, Cancelled, collect_series
+from catalog_snapshot import CatalogSnapshot
+from demand import ForecastCancelled, run_forecasts
+from exporter import ExportCancelled, export_income, export_products
+from importer import ImportCancelled, import_products
+from maintenance import MaintenanceCancelled, run_maintenance
+from search import search_ids
+from sync import current_seq
+
+
+# Виды выгрузки ExportWorker
+EXPORT_PRODUCTS = 'products'
+EXPORT_INCOME = 'income'
+
+
+class WorkerSignals(QObject):
+    """Сигналы фоновой задачи (QRunnable не может объявлять сигналы сам)"""
+
+    # id задачи и результат
+    finished = Signal(int, object)
+    # id задачи и текст ошибки
+    failed = Signal(int, str)
+    # id задачи и количество обработанных элементов
+    progress = Signal(int, int)
+
+
+class AnalyticsWorker(QRunnable):
+    """Фоновый расчет данных для графиков вкладки "Аналитика"
+
+    Результат - пара (номер последнего изменения продуктов, ряды данных).
+    """
+
+    def __init__(self, job_id, database, stock_group=STOCK_BY_PRODUCT, snapshot=None):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.stock_group = stock_group
+        self.snapshot = snapshot
+        self.signals = WorkerSignals()
+
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def cancel(self):
+        """Отмена задачи: прерывает выполняющийся запрос"""
+        self._cancelled.set()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def run(self):
+        if self._cancelled.is_set():
+            return
+        try:
+            with self.database.reader() as conn:
+                with self._lock:
+                    self._conn = conn
+                try:
+                    # Номер изменения читается до расчета: если продукты изменят
+                    # во время расчета, кэш с этим номером будет перепроверен
+                    seq = current_seq(conn.cursor())
+                    with instrumentation.measure('collect_series'):
+                        series = collect_series(conn, self._cancelled.is_set, self.stock_group,
+                                                self.snapshot)
+                finally:
+                    with self._lock:
+                        self._conn = None
+        except Cancelled:
+            return
+        except Exception as e:
+            if not self._cancelled.is_set():
+                self.signals.failed.emit(self.job_id, str(e))
+            return
+
+        if not self._cancelled.is_set():
+            self.signals.finished.emit(self.job_id, (seq, series))
+
+
+class SearchWorker(QRunnable):
+    """Фоновый поиск продуктов по полнотекстовому индексу"""
+
+    def __init__(self, job_id, database, text):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.text = text
+        self.signals = WorkerSignals()
+
+    def run(self):
+        try:
+            with self.database.reader() as conn, instrumentation.measure('search'):
+                ids = search_ids(conn.cursor(), self.text)
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, ids)
+
+
+class SnapshotWorker(QRunnable):
+    """Фоновая загрузка снимка каталога (catalog_snapshot.CatalogSnapshot)"""
+
+    def __init__(self, job_id, database):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.signals = WorkerSignals()
+
+    def run(self):
+        snapshot = CatalogSnapshot()
+        try:
+            with self.database.reader() as conn:
+                snapshot.load(conn.cursor())
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, snapshot)
+
+
+class ImportWorker(QRunnable):
+    """Фоновый импорт продуктов из файла поставки"""
+
+    def __init__(self, job_id, database, path):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.path = path
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Отмена импорта: транзакция будет откачена после текущего пакета"""
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            conn = self.database.connect()
+            try:
+                result = import_products(
+                    conn, self.path,
+                    progress=lambda n: self.signals.progress.emit(self.job_id, n),
+                    is_cancelled=self._cancelled.is_set
+                )
+            finally:
+                conn.close()
+        except ImportCancelled:
+            self.signals.failed.emit(self.job_id, "Импорт отменен, изменения не сохранены")
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, result)
+
+
+class ForecastWorker(QRunnable):
+    """Фоновый расчет прогноза спроса по продуктам (demand.run_forecasts)"""
+
+    def __init__(self, job_id, database):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Отмена расчета: задания пула, еще не начатые, отменяются"""
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            conn = self.database.connect()
+            try:
+                with instrumentation.measure('run_forecasts'):
+                    count = run_forecasts(
+                        conn, self.database.path,
+                        progress=lambda n: self.signals.progress.emit(self.job_id, n),
+                        is_cancelled=self._cancelled.is_set
+                    )
+            finally:
+                conn.close()
+        except ForecastCancelled:
+            self.signals.failed.emit(self.job_id, "Расчет прогноза отменен")
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, count)
+
+
+class MaintenanceWorker(QRunnable):
+    """Фоновое обслуживание базы данных (maintenance.run_maintenance)
+
+    force - выполнить все задачи, не дожидаясь их срока.
+    """
+
+    def __init__(self, job_id, database, force=False):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.force = force
+        self.signals = WorkerSignals()
+
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def cancel(self):
+        """Отмена обслуживания: прерывает выполняющийся запрос"""
+        self._cancelled.set()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def run(self):
+        try:
+            # Главное окно ждет finished или failed и до этого не запускает
+            # новое обслуживание, поэтому отмена до запуска тоже сообщается
+            if self._cancelled.is_set():
+                raise MaintenanceCancelled()
+            conn = self.database.connect()
+            with self._lock:
+                self._conn = conn
+            try:
+                results = run_maintenance(conn, force=self.force,
+                                          is_cancelled=self._cancelled.is_set)
+            finally:
+                with self._lock:
+                    self._conn = None
+                conn.close()
+        except MaintenanceCancelled:
+            self.signals.failed.emit(self.job_id, "Обслуживание базы данных прервано")
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, results)
+
+
+class ExportWorker(QRunnable):
+    """Фоновая выгрузка данных в файл
+
+    kind: EXPORT_PRODUCTS - продукты со скидками, EXPORT_INCOME - доход по
+    месяцам и прогноз.
+    """
+
+    def __init__(self, job_id, database, kind, path):
+        super().__init__()
+        self.job_id = job_id
+        self.database = database
+        self.kind = kind
+        self.path = path
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Отмена выгрузки после текущей порции строк"""
+        self._cancelled.set()
+
+    def run(self):
+        export = export_products if self.kind == EXPORT_PRODUCTS else export_income
+        try:
+            with self.database.reader() as conn:
+                count = export(
+                    conn, self.path,
+                    progress=lambda n: self.signals.progress.emit(self.job_id, n),
+                    is_cancelled=self._cancelled.is_set
+                )
+        except ExportCancelled:
+            self.signals.failed.emit(self.job_id, "Выгрузка отменена")
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, str(e))
+            return
+        self.signals.finished.emit(self.job_id, count)